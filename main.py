@@ -1,9 +1,18 @@
 """
 Entry point for the application.
+
+Without arguments it opens the GUI; with arguments it runs the headless
+command line (see src/core/cli.py), which never loads Qt.
 """
-import src.ui.app as app
+import sys
+
 
 def main():
+    if len(sys.argv) > 1:
+        from src.core.cli import main as cli_main
+        sys.exit(cli_main(sys.argv[1:]))
+
+    import src.ui.app as app
     app_instance = app.MainApp([])
 
     app_instance.run_app()
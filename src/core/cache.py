@@ -0,0 +1,121 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+class ResultCache:
+    """
+    Persistent, content-addressed cache of singlepoint results.
+
+    Entries are keyed by a hash of the structure (atomic numbers plus the
+    geometry rounded to `tolerance` Bohr), the method, the charge/spin settings
+    and the tblite version. Scalars live in an SQLite index and arrays in one
+    .npz blob per entry; the least recently used entries are evicted once the
+    blobs exceed `max_bytes`.
+    """
+
+    def __init__(self, directory: Path, max_bytes: int = 2 * 1024**3, tolerance: float = 1e-5):
+        self.directory = Path(directory)
+        self.blobs_dir = self.directory / "blobs"
+        self.blobs_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.tolerance = tolerance
+        self.hits = 0
+        self.misses = 0
+
+        # Several pool workers share the same database
+        self.db = sqlite3.connect(self.directory / "index.sqlite", timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            " key TEXT PRIMARY KEY,"
+            " scalars TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS entries_lru ON entries (last_access)")
+        self.db.commit()
+
+    def key(self, numbers, positions, method: str = "GFN2-xTB", charge: float = 0, uhf: int = 0) -> str:
+        import tblite.interface as tb
+
+        digest = hashlib.sha256()
+        digest.update(np.asarray(numbers, dtype=np.int64).tobytes())
+        grid = np.round(np.asarray(positions, dtype=float) / self.tolerance).astype(np.int64)
+        digest.update(grid.tobytes())
+        digest.update(repr((method, float(charge), int(uhf), tb.library.get_version())).encode())
+        return digest.hexdigest()
+
+    def _blob(self, key: str) -> Path:
+        return self.blobs_dir / f"{key}.npz"
+
+    def get(self, key: str) -> dict | None:
+        row = self.db.execute("SELECT scalars FROM entries WHERE key = ?", (key,)).fetchone()
+        blob = self._blob(key)
+        if row is None or not blob.exists():
+            self.misses += 1
+            return None
+
+        data = json.loads(row[0])
+        with np.load(blob) as arrays:
+            data.update({name: arrays[name] for name in arrays.files})
+
+        self.db.execute("UPDATE entries SET last_access = ? WHERE key = ?", (time.time(), key))
+        self.db.commit()
+        self.hits += 1
+        return data
+
+    def put(self, key: str, data: dict) -> None:
+        # numpy scalars (np.bool_, np.float64...) become plain Python values;
+        # serializing first means a bad value never leaves an orphan blob
+        scalars = {k: v.item() if isinstance(v, np.generic) else v
+                   for k, v in data.items() if not isinstance(v, np.ndarray)}
+        arrays = {k: v for k, v in data.items() if isinstance(v, np.ndarray)}
+        encoded = json.dumps(scalars)
+
+        # Write the blob under a temporary name so readers never see half a file
+        blob = self._blob(key)
+        tmp = blob.with_name(f"{key}.{os.getpid()}.tmp.npz")
+        np.savez(tmp, **arrays)
+        os.replace(tmp, blob)
+
+        self.db.execute(
+            "INSERT OR REPLACE INTO entries (key, scalars, size, last_access) VALUES (?, ?, ?, ?)",
+            (key, encoded, blob.stat().st_size, time.time()),
+        )
+        self.db.commit()
+        self.evict()
+
+    def evict(self) -> None:
+        """
+        Removes least recently used entries until the cache fits in `max_bytes`.
+        """
+        total = self.db.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+
+        for key, size in self.db.execute("SELECT key, size FROM entries ORDER BY last_access").fetchall():
+            self._blob(key).unlink(missing_ok=True)
+            self.db.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+        self.db.commit()
+
+
+_open_caches: dict[Path, ResultCache] = {}
+
+
+def open_cache(directory: Path) -> ResultCache:
+    """
+    Returns this process's ResultCache for `directory`, opening it on first use.
+    """
+    directory = Path(directory)
+    if directory not in _open_caches:
+        _open_caches[directory] = ResultCache(directory)
+    return _open_caches[directory]
@@ -0,0 +1,461 @@
+"""
+Headless command line entry point (``python main.py <command> ...``).
+
+    ingest       sync the dataset catalog and write the structure map
+    singlepoint  tblite singlepoints of .xyz files, folders or zips
+    optimize     same, optimizing each geometry first
+    extract      run xtb over the structure map and extract HOMO/LUMO
+    analyze      gap table and plots from the extracted levels
+    dos          DOS/PDOS curves of the structure map (store + plots)
+    frontier     near-gap levels of stored Hamiltonians (sparse shift-invert)
+    serve        hand out structures to workers on other nodes
+    work         pull structures from a `serve` coordinator and run them
+
+Only argparse and the standard library are imported up front: Qt, numpy,
+pandas, matplotlib and tblite are imported inside the command that needs
+them, so `--help` and argument errors return right away even when the CLI
+is launched thousands of times from a job array.
+"""
+import argparse
+import csv
+import sys
+from pathlib import Path
+
+# Columns of the singlepoint/optimize table, in order
+RECORD_FIELDS = ("name", "energy", "homo", "lumo", "gap", "verdict", "dipole",
+                 "conductance", "scf_iterations", "cached", "duration", "peak_rss")
+OPT_FIELDS = ("opt_steps", "opt_converged")
+# h_*: levels of the stored Hamiltonian, not the singlepoint's orbital energies
+FRONTIER_FIELDS = ("name", "orbitals", "density", "h_homo", "h_lumo", "h_gap", "h_levels",
+                   "factorizations", "duration", "max_error", "scf_offset", "scf_spread",
+                   "scf_gap_deviation")
+
+# Same as libs.paths.MATRIX_DIR, which isn't imported up front (it creates folders)
+_MATRIX_DIR = Path(__file__).resolve().parent / "matrices"
+
+
+def _add_filters(parser: argparse.ArgumentParser) -> None:
+    group = parser.add_argument_group("filters")
+    group.add_argument("--dopant", help="only this dopant (e.g. N, pure)")
+    group.add_argument("--size", dest="size_nm", type=float, help="only this flake size (nm)")
+    group.add_argument("--min-size", type=float, help="smallest flake size (nm)")
+    group.add_argument("--max-size", type=float, help="largest flake size (nm)")
+    group.add_argument("--percent", type=float, help="only this doping percentage")
+
+
+def _filters(args, *extra: str) -> dict:
+    keys = ("dopant", "size_nm", "min_size", "max_size", "percent") + extra
+    return {k: getattr(args, k) for k in keys if getattr(args, k, None) is not None}
+
+
+def collect_sources(paths: list, **filters) -> list:
+    """
+    Expands .xyz files, folders of .xyz and zips into a list of structures
+    (Path or ZipMember). With filters, folders and zips go through the
+    catalog and only the matching structures are kept.
+    """
+    from src.core.libs.ingest import list_zip_members
+
+    files = []
+    catalog = None
+    try:
+        for path in map(Path, paths):
+            if path.is_file() and path.suffix.lower() != ".zip":
+                files.append(path)
+            elif filters:
+                if catalog is None:
+                    from src.core.libs.catalog import Catalog
+                    from src.core.libs.paths import CATALOG_DB
+                    catalog = Catalog(CATALOG_DB)
+                catalog.sync(path)
+                files.extend(entry.source for entry in catalog.query(path, **filters))
+            elif path.suffix.lower() == ".zip":
+                files.extend(list_zip_members(path))
+            elif path.is_dir():
+                files.extend(sorted(path.glob("*.xyz")))
+            else:
+                raise FileNotFoundError(path)
+    finally:
+        if catalog is not None:
+            catalog.close()
+    return files
+
+
+def _evaluate_all(files: list, workers: int, options: dict):
+    """
+    Yields (file, record or None, error or None) as structures finish. With
+    warm starts each family runs as one task, so it stays on one worker.
+    """
+    from src.core.process import evaluate_family, evaluate_file, warm_start_families
+
+    if options.get("warm_start"):
+        tasks = [[files[i] for i in family] for family in warm_start_families(files)]
+    else:
+        tasks = [[file] for file in files]
+
+    if workers <= 1:
+        for file in (file for task in tasks for file in task):
+            try:
+                yield file, evaluate_file(file, **options), None
+            except Exception as e:
+                yield file, None, e
+        return
+
+    from concurrent.futures import as_completed
+    from src.core.parallel import make_executor
+
+    with make_executor(workers) as pool:
+        futures = {pool.submit(evaluate_family, task, **options): task for task in tasks}
+        for future in as_completed(futures):
+            task = futures[future]
+            try:
+                outcomes = future.result()
+            except Exception as e:
+                # The worker itself died: the whole family is lost
+                outcomes = [(None, e)] * len(task)
+            for file, (record, error) in zip(task, outcomes):
+                yield file, record, error
+
+
+def cmd_evaluate(args) -> int:
+    files = collect_sources(args.sources, **_filters(args))
+    if not files:
+        print("No structures found", file=sys.stderr)
+        return 1
+
+    options = {"optimize": getattr(args, "level", None)}
+    if args.cache:
+        from src.core.libs.paths import CACHE_DIR
+        options["cache_dir"] = args.cache_dir or CACHE_DIR
+    if args.save_matrices:
+        options["matrix_dir"] = args.save_matrices
+    if args.transport:
+        options["transport"] = True
+    if (args.warm_start or args.measure_warm_start) and options["optimize"] is None:
+        options["warm_start"] = True
+        options["measure_warm_start"] = args.measure_warm_start
+    if args.trace:
+        from src.core.libs import trace
+        trace.enable(args.trace)
+
+    from src.core.parallel import available_memory, suggest_workers
+
+    free_memory = available_memory()
+    fields = RECORD_FIELDS + (OPT_FIELDS if options["optimize"] else ())
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    max_peak = 0
+    guessed = saved = 0
+    try:
+        writer = csv.DictWriter(out, fields, extrasaction="ignore")
+        writer.writeheader()
+        for file, record, error in _evaluate_all(files, args.workers, options):
+            if error is not None:
+                failed += 1
+                print(f"{file.name}: {error}", file=sys.stderr)
+                continue
+            if args.trace:
+                trace.merge(record.pop("trace", []))
+            writer.writerow({"name": file.name, **record})
+            out.flush()
+            if not record["cached"]:
+                max_peak = max(max_peak, record["peak_rss"] or 0)
+                guessed += bool(record.get("scf_guess"))
+                saved += record.get("scf_saved") or 0
+            if args.xyz_dir and "positions" in record:
+                _write_optimized(args.xyz_dir, file, record)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.trace:
+        print(f"Trace written to {trace.export()}", file=sys.stderr)
+    if options.get("warm_start"):
+        print(f"Warm start: {guessed} structures started from a related result"
+              + (f", {saved} SCF iterations saved" if options["measure_warm_start"] else ""),
+              file=sys.stderr)
+    if max_peak:
+        print(f"Peak memory {max_peak / 2**20:.0f} MB per structure: "
+              f"-j {suggest_workers(max_peak, free_memory)} fits in memory", file=sys.stderr)
+    if failed:
+        print(f"{failed} of {len(files)} structures failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def _write_optimized(directory: Path, file, record: dict) -> None:
+    from src.core.xyz import format_xyz, read_structure
+
+    directory.mkdir(parents=True, exist_ok=True)
+    numbers = read_structure(file).numbers
+    comment = f"{file.name} optimized energy={record['energy']:.10f}"
+    (directory / Path(file.name).name).write_text(
+        format_xyz(numbers, record["positions"], comment), encoding="utf-8")
+
+
+def cmd_ingest(args) -> int:
+    from src.core.scripts import mapper
+
+    mapper.main(args.source, **_filters(args, "element"))
+    return 0
+
+
+def cmd_extract(args) -> int:
+    from src.core.scripts import normalizer
+
+    normalizer.main(args.cores, args.threads, args.incremental, **_filters(args))
+    return 0
+
+
+def cmd_analyze(args) -> int:
+    from src.core.scripts import analyze_gaps
+
+    analyze_gaps.main(args.workers, facets=not args.no_facets)
+    return 0
+
+
+def cmd_serve(args) -> int:
+    from src.core import distributed
+
+    files = collect_sources(args.sources, **_filters(args))
+    if not files:
+        print("No structures found", file=sys.stderr)
+        return 1
+
+    fields = RECORD_FIELDS + (OPT_FIELDS if args.level else ()) + ("worker",)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    failed = []
+    try:
+        writer = csv.DictWriter(out, fields, extrasaction="ignore")
+        writer.writeheader()
+
+        def on_result(name, record, error):
+            if error is not None:
+                failed.append(name)
+                print(f"{name}: {error}", file=sys.stderr)
+                return
+            writer.writerow({"name": name, **record})
+            out.flush()
+
+        print(f"Serving {len(files)} structures on port {args.port}", file=sys.stderr)
+        distributed.run_coordinator(
+            files, ("", args.port), args.authkey, args.backend,
+            {"optimize": args.level, "transport": args.transport},
+            args.lease, args.max_attempts, on_result)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if failed:
+        print(f"{len(failed)} of {len(files)} structures failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+def cmd_work(args) -> int:
+    from src.core import distributed
+
+    done = distributed.run_workers(distributed.parse_address(args.address), args.authkey,
+                                   args.workers, args.threads, args.connect_timeout)
+    print(f"{done} structures completed", file=sys.stderr)
+    return 0
+
+
+def cmd_dos(args) -> int:
+    from src.core.scripts import dos
+
+    cache_dir = None
+    if not args.no_cache:
+        from src.core.libs.paths import CACHE_DIR
+        cache_dir = CACHE_DIR
+    dos.main(args.workers, args.width, args.kind, cache_dir, not args.no_plots, **_filters(args))
+    return 0
+
+
+def cmd_frontier(args) -> int:
+    import time
+    from src.core import frontier
+    from src.core.matrices import MatrixStore
+
+    if not (args.store / "catalog.sqlite").exists():
+        print(f"No matrix store in {args.store} (singlepoint --save-matrices)", file=sys.stderr)
+        return 1
+    needed = ('hamiltonian-matrix', 'overlap-matrix', 'density-matrix')
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    failed = 0
+    with MatrixStore(args.store) as store:
+        stored = store.structures()
+        # A bare stem selects every entry of it (one per source and method)
+        names = [match for name in args.structures
+                 for match in ([name] if name in stored else
+                               [s for s in stored if s.rsplit("-", 1)[0] == name] or [name])] or stored
+        try:
+            writer = csv.DictWriter(out, FRONTIER_FIELDS)
+            writer.writeheader()
+            for name in names:
+                if not store.has(name, needed):
+                    failed += 1
+                    print(f"{name}: missing {', '.join(needed)}", file=sys.stderr)
+                    continue
+                H, S, P = (store.get(name, prop) for prop in needed)
+                if H.ndim == 3:
+                    failed += 1
+                    print(f"{name}: spin-polarized, skipped", file=sys.stderr)
+                    continue
+                start = time.perf_counter()
+                try:
+                    result = frontier.frontier_orbitals(
+                        H, S, frontier.electron_count(P, S), args.states, args.cutoff)
+                except (RuntimeError, ValueError) as e:
+                    failed += 1
+                    print(f"{name}: {e}", file=sys.stderr)
+                    continue
+                duration = time.perf_counter() - start
+                density = frontier.sparsify(H, args.cutoff).nnz / H.size
+                max_error = scf = None
+                if args.check:
+                    max_error = frontier.check_dense(H, S, result)
+                    if store.has(name, ('orbital-energies',)):
+                        scf = frontier.check_scf(result, store.get(name, 'orbital-energies'))
+                    else:
+                        print(f"{name}: no stored orbital-energies to check against", file=sys.stderr)
+                writer.writerow({
+                    "name": name, "orbitals": H.shape[0], "density": round(density, 4),
+                    "h_homo": result.homo, "h_lumo": result.lumo, "h_gap": result.gap,
+                    "h_levels": " ".join(f"{e:.6f}" for e in result.energies),
+                    "factorizations": result.factorizations, "duration": round(duration, 3),
+                    "max_error": max_error,
+                    "scf_offset": scf and scf.offset, "scf_spread": scf and scf.spread,
+                    "scf_gap_deviation": scf and scf.gap_deviation,
+                })
+                out.flush()
+        finally:
+            if out is not sys.stdout:
+                out.close()
+
+    if failed:
+        print(f"{failed} of {len(names)} structures failed", file=sys.stderr)
+    return 1 if failed else 0
+
+
+class _Version(argparse.Action):
+    # tblite is only loaded if the version is actually asked for
+    def __init__(self, option_strings, dest, **kwargs):
+        super().__init__(option_strings, dest, nargs=0, help="print the tblite version and exit")
+
+    def __call__(self, parser, namespace, values, option_string=None):
+        import tblite.interface as tb
+        print("tblite", ".".join(map(str, tb.library.get_version())))
+        parser.exit()
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description=__doc__.split("\n\n")[0].strip(),
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--version", action=_Version)
+    commands = parser.add_subparsers(dest="command", required=True, metavar="command")
+
+    ingest = commands.add_parser("ingest", help="sync the catalog and write the structure map")
+    ingest.add_argument("source", type=Path, nargs="?",
+                        help="dataset zip or folder (default: the dataset folder)")
+    _add_filters(ingest)
+    ingest.add_argument("--element", help="only structures containing this element")
+    ingest.set_defaults(func=cmd_ingest)
+
+    for name, help_text in (("singlepoint", "tblite singlepoints"),
+                            ("optimize", "tblite geometry optimizations")):
+        sub = commands.add_parser(name, help=help_text)
+        sub.add_argument("sources", nargs="+", help=".xyz files, folders of .xyz or zips")
+        sub.add_argument("-o", "--output", type=Path, help="CSV file (default: stdout)")
+        sub.add_argument("-j", "--workers", type=int, default=1, help="worker processes (default 1)")
+        sub.add_argument("--cache", action="store_true", help="use the persistent result cache")
+        sub.add_argument("--cache-dir", type=Path, help="cache folder (implies --cache)")
+        sub.add_argument("--trace", type=Path, help="write a Chrome trace of the run here")
+        sub.add_argument("--transport", action="store_true",
+                         help="add the NEGF Landauer conductance (conductance column)")
+        sub.add_argument("--save-matrices", type=Path, nargs="?", const=_MATRIX_DIR, metavar="DIR",
+                         help="store H, S, C and P of every structure (default src/core/matrices)")
+        if name == "optimize":
+            sub.add_argument("--level", default="normal", help="convergence level (default normal)")
+            sub.add_argument("--xyz-dir", type=Path, help="write the optimized geometries here")
+            sub.set_defaults(warm_start=False, measure_warm_start=False)
+        else:
+            sub.add_argument("--warm-start", action="store_true",
+                             help="start each SCF from a structure with the same atoms")
+            sub.add_argument("--measure-warm-start", action="store_true",
+                             help="warm start, also running the cold SCF to count the cycles saved")
+            sub.set_defaults(xyz_dir=None)
+        _add_filters(sub)
+        sub.set_defaults(func=cmd_evaluate)
+
+    extract = commands.add_parser("extract", help="run xtb on the structure map and extract levels")
+    extract.add_argument("--cores", type=int, help="total cores for xtb (default: all)")
+    extract.add_argument("--threads", type=int, default=1, help="threads per xtb job (default 1)")
+    extract.add_argument("--incremental", action="store_true",
+                         help="only recompute new or modified structures")
+    _add_filters(extract)
+    extract.set_defaults(func=cmd_extract)
+
+    analyze = commands.add_parser("analyze", help="gap table and plots")
+    analyze.add_argument("-j", "--workers", type=int, help="plot worker processes")
+    analyze.add_argument("--no-facets", action="store_true", help="skip per-dopant/per-size plots")
+    analyze.set_defaults(func=cmd_analyze)
+
+    dos = commands.add_parser("dos", help="DOS and PDOS of every structure in the map")
+    dos.add_argument("-j", "--workers", type=int, help="worker processes (default: all cores)")
+    dos.add_argument("--width", type=float, default=0.1, help="broadening in eV (default 0.1)")
+    dos.add_argument("--kind", choices=("gaussian", "lorentzian"), default="gaussian")
+    dos.add_argument("--no-cache", action="store_true", help="don't use the result cache")
+    dos.add_argument("--no-plots", action="store_true", help="only write the store")
+    _add_filters(dos)
+    dos.set_defaults(func=cmd_dos)
+
+    near_gap = commands.add_parser("frontier",
+                                   help="HOMO/LUMO from stored matrices with a sparse eigensolver")
+    near_gap.add_argument("structures", nargs="*", help="stored names or file stems (default: all stored)")
+    near_gap.add_argument("--store", type=Path, default=_MATRIX_DIR,
+                          help="matrix store folder (default src/core/matrices)")
+    near_gap.add_argument("-o", "--output", type=Path, help="CSV file (default: stdout)")
+    near_gap.add_argument("-k", "--states", type=int, default=8,
+                          help="levels around the gap (default 8)")
+    near_gap.add_argument("--cutoff", type=float, default=1e-6,
+                          help="drop matrix elements below this (default 1e-6)")
+    near_gap.add_argument("--check", action="store_true",
+                          help="compare with the dense solution (up to 3000 orbitals) and report"
+                               " the offset from the SCF orbital energies (scf_* columns)")
+    near_gap.set_defaults(func=cmd_frontier)
+
+    serve = commands.add_parser("serve", help="coordinate a sweep over several nodes")
+    serve.add_argument("sources", nargs="+", help=".xyz files, folders of .xyz or zips")
+    serve.add_argument("-o", "--output", type=Path, help="CSV file (default: stdout)")
+    serve.add_argument("--port", type=int, default=50123, help="TCP port (default 50123)")
+    serve.add_argument("--authkey", help="shared secret (default: $XTB_AUTHKEY)")
+    serve.add_argument("--backend", choices=("tblite", "xtb"), default="tblite")
+    serve.add_argument("--level", help="optimize with tblite at this level first")
+    serve.add_argument("--transport", action="store_true", help="add the NEGF conductance (tblite)")
+    serve.add_argument("--lease", type=float, default=600.0,
+                       help="seconds before an unresponsive worker's task is re-sent (default 600)")
+    serve.add_argument("--max-attempts", type=int, default=3,
+                       help="tries per structure (default 3)")
+    _add_filters(serve)
+    serve.set_defaults(func=cmd_serve)
+
+    work = commands.add_parser("work", help="run structures from a coordinator")
+    work.add_argument("address", help="coordinator host:port")
+    work.add_argument("--authkey", help="shared secret (default: $XTB_AUTHKEY)")
+    work.add_argument("-j", "--workers", type=int, default=1, help="worker processes (default 1)")
+    work.add_argument("--threads", type=int, default=1, help="threads per worker (default 1)")
+    work.add_argument("--connect-timeout", type=float, default=60.0,
+                      help="seconds to wait for the coordinator (default 60)")
+    work.set_defaults(func=cmd_work)
+
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    if getattr(args, "cache_dir", None) is not None:
+        args.cache = True
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
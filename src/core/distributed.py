@@ -0,0 +1,332 @@
+"""
+Coordinator/worker mode for spreading a sweep over several machines.
+
+The coordinator owns a TaskQueue with one task per structure and serves it
+through a multiprocessing manager (TCP + authkey). Workers on any node
+connect, lease a task, run tblite or xtb on it and push the record back.
+A lease that is not renewed or completed within `lease_seconds` (the worker
+died, the node went down...) goes back to the queue, up to `max_attempts`
+times per structure.
+
+Workers get the XYZ text from the coordinator, so nodes need no shared
+filesystem. Everything works on localhost, e.g.
+
+    python main.py serve dataset --authkey secret -o gaps.csv
+    python main.py work localhost:50123 --authkey secret -j 4
+"""
+import os
+import socket
+import tempfile
+import threading
+import time
+from collections import deque
+from multiprocessing.managers import BaseManager
+from pathlib import Path
+
+from src.core.libs.ingest import ZipMember, read_zip_member
+
+DEFAULT_PORT = 50123
+AUTHKEY_ENV = "XTB_AUTHKEY"
+LEASE_SECONDS = 600.0
+MAX_ATTEMPTS = 3
+BACKENDS = ("tblite", "xtb")
+
+
+class TaskQueue:
+    """
+    Tasks, leases and results of one sweep. Lives in the manager's server
+    process; its public methods are what workers call through the proxy.
+    """
+
+    def __init__(self, sources: list, settings: dict, lease_seconds: float = LEASE_SECONDS,
+                 max_attempts: int = MAX_ATTEMPTS):
+        self.sources = list(sources)
+        self.settings_ = dict(settings, lease_seconds=lease_seconds)
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+
+        self.pending = deque(range(len(self.sources)))
+        self.leases = {}        # task id -> (worker, deadline)
+        self.attempts = [0] * len(self.sources)
+        self.finished_ids = set()
+        self.results = []       # (name, record, error) not yet taken
+        self.lock = threading.Lock()
+
+    def _reclaim(self, now: float) -> None:
+        # Expired leases go back to the queue (or fail for good)
+        for task_id, (worker, deadline) in list(self.leases.items()):
+            if deadline < now:
+                del self.leases[task_id]
+                self._retry(task_id, f"lease expired on {worker}")
+
+    def _retry(self, task_id: int, error: str) -> None:
+        if self.attempts[task_id] < self.max_attempts:
+            self.pending.append(task_id)
+        else:
+            self.finished_ids.add(task_id)
+            self.results.append((self.sources[task_id].name, None, error))
+
+    # --- worker side -----------------------------------------------------
+
+    def settings(self) -> dict:
+        return self.settings_
+
+    def lease(self, worker: str):
+        """
+        Next task as (task id, file name, xyz text), or None if there is
+        nothing to hand out right now.
+        """
+        with self.lock:
+            self._reclaim(time.monotonic())
+            if not self.pending:
+                return None
+            task_id = self.pending.popleft()
+            self.attempts[task_id] += 1
+            self.leases[task_id] = (worker, time.monotonic() + self.lease_seconds)
+        source = self.sources[task_id]
+        if isinstance(source, ZipMember):
+            text = read_zip_member(source)
+        else:
+            text = Path(source).read_text(errors="ignore")
+        return task_id, source.name, text
+
+    def renew(self, worker: str, task_id: int) -> bool:
+        """
+        Extends the lease; False if the task was already taken away.
+        """
+        with self.lock:
+            lease = self.leases.get(task_id)
+            if lease is None or lease[0] != worker:
+                return False
+            self.leases[task_id] = (worker, time.monotonic() + self.lease_seconds)
+            return True
+
+    def complete(self, worker: str, task_id: int, record: dict) -> bool:
+        """
+        Stores the record. A task finished twice (a re-dispatched lease
+        whose first worker was only slow) keeps the first result.
+        """
+        with self.lock:
+            if task_id in self.finished_ids:
+                return False
+            self.leases.pop(task_id, None)
+            if task_id in self.pending:
+                self.pending.remove(task_id)
+            self.finished_ids.add(task_id)
+            self.results.append((self.sources[task_id].name, dict(record, worker=worker), None))
+            return True
+
+    def fail(self, worker: str, task_id: int, error: str) -> None:
+        with self.lock:
+            if task_id in self.finished_ids or self.leases.get(task_id, (None,))[0] != worker:
+                return
+            del self.leases[task_id]
+            self._retry(task_id, f"{worker}: {error}")
+
+    def finished(self) -> bool:
+        with self.lock:
+            return len(self.finished_ids) == len(self.sources)
+
+    # --- coordinator side ------------------------------------------------
+
+    def take_results(self) -> list:
+        with self.lock:
+            self._reclaim(time.monotonic())
+            results, self.results = self.results, []
+            return results
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {"total": len(self.sources), "pending": len(self.pending),
+                    "leased": len(self.leases), "finished": len(self.finished_ids)}
+
+
+class QueueManager(BaseManager):
+    pass
+
+
+_queue = None
+
+
+def _init_queue(sources, settings, lease_seconds, max_attempts):
+    # Runs in the manager's server process
+    global _queue
+    _queue = TaskQueue(sources, settings, lease_seconds, max_attempts)
+
+
+def _served_queue():
+    return _queue
+
+
+QueueManager.register("get_queue", callable=_served_queue)
+
+
+def parse_address(text: str) -> tuple:
+    host, _, port = text.rpartition(":")
+    if not host:
+        return text, DEFAULT_PORT
+    return host, int(port)
+
+
+def resolve_authkey(authkey: str | bytes | None) -> bytes:
+    authkey = authkey or os.environ.get(AUTHKEY_ENV)
+    if not authkey:
+        raise ValueError(f"An authkey is required (--authkey or ${AUTHKEY_ENV})")
+    return authkey.encode() if isinstance(authkey, str) else authkey
+
+
+# --- coordinator -----------------------------------------------------------
+
+def run_coordinator(sources: list, address: tuple = ("", DEFAULT_PORT), authkey=None,
+                    backend: str = "tblite", options: dict | None = None,
+                    lease_seconds: float = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS,
+                    on_result=None, poll: float = 0.5) -> dict:
+    """
+    Serves `sources` (Paths or ZipMembers) until every structure has a
+    result or ran out of attempts. `options` are passed to the backend
+    (evaluate_file keywords for tblite). on_result(name, record, error) is
+    called in this process as results arrive. Returns the final stats.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}, expected one of {BACKENDS}")
+    settings = {"backend": backend, "options": options or {}}
+    manager = QueueManager(address, resolve_authkey(authkey))
+    manager.start(_init_queue, (sources, settings, lease_seconds, max_attempts))
+    try:
+        queue = manager.get_queue()
+        while True:
+            done = queue.finished()
+            for result in queue.take_results():
+                if on_result is not None:
+                    on_result(*result)
+            if done:
+                return queue.stats()
+            time.sleep(poll)
+    finally:
+        manager.shutdown()
+
+
+# --- workers ---------------------------------------------------------------
+
+def _connect(address: tuple, authkey: bytes, timeout: float):
+    # Job arrays may start workers before the coordinator is listening
+    deadline = time.monotonic() + timeout
+    while True:
+        manager = QueueManager(address, authkey)
+        try:
+            manager.connect()
+            return manager.get_queue()
+        except ConnectionRefusedError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(1.0)
+
+
+class _Heartbeat(threading.Thread):
+    """
+    Renews the lease of the task in progress every lease_seconds / 3, on a
+    connection of its own (proxies are not shared between threads).
+    """
+
+    def __init__(self, address, authkey, worker: str, interval: float):
+        super().__init__(daemon=True)
+        self.address, self.authkey = address, authkey
+        self.worker = worker
+        self.interval = interval
+        self.task_id = None
+        self.stop_event = threading.Event()
+
+    def run(self):
+        queue = _connect(self.address, self.authkey, 0)
+        while not self.stop_event.wait(self.interval):
+            task_id = self.task_id
+            if task_id is not None:
+                try:
+                    queue.renew(self.worker, task_id)
+                except (EOFError, OSError):
+                    return
+
+
+def _run_task(name: str, text: str, settings: dict, threads: int) -> dict:
+    with tempfile.TemporaryDirectory() as tmp:
+        xyz = Path(tmp) / name
+        xyz.write_text(text, encoding="utf-8")
+
+        if settings["backend"] == "tblite":
+            from src.core.process import evaluate_file
+            return evaluate_file(xyz, **settings["options"])
+
+        from src.core.libs.xtb import run_xtb_structure, extract_levels_from_dir
+        from src.core.process import classify_gap
+
+        start = time.perf_counter()
+        outdir = Path(tmp) / xyz.stem
+        outdir.mkdir()
+        if not run_xtb_structure(xyz, outdir, threads):
+            raise RuntimeError("xtb optimization produced no xtbopt.xyz")
+        homo, lumo, gap = extract_levels_from_dir(outdir)
+        return {"homo": homo, "lumo": lumo, "gap": gap, "verdict": classify_gap(gap),
+                "duration": time.perf_counter() - start}
+
+
+def run_worker(address: tuple, authkey=None, worker: str | None = None, threads: int = 1,
+               connect_timeout: float = 60.0, poll: float = 1.0) -> int:
+    """
+    Pulls and runs tasks until the coordinator has nothing left (or goes
+    away). Returns the number of structures this worker completed.
+    """
+    authkey = resolve_authkey(authkey)
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = _connect(address, authkey, connect_timeout)
+    settings = queue.settings()
+
+    heartbeat = _Heartbeat(address, authkey, worker, settings["lease_seconds"] / 3)
+    heartbeat.start()
+    done = 0
+    try:
+        while True:
+            try:
+                task = queue.lease(worker)
+                if task is None:
+                    if queue.finished():
+                        break
+                    # Everything is leased: wait in case a lease expires
+                    time.sleep(poll)
+                    continue
+                task_id, name, text = task
+                heartbeat.task_id = task_id
+                try:
+                    record = _run_task(name, text, settings, threads)
+                except Exception as e:
+                    queue.fail(worker, task_id, f"{type(e).__name__}: {e}")
+                    continue
+                finally:
+                    heartbeat.task_id = None
+                record.pop("trace", None)
+                done += queue.complete(worker, task_id, record)
+            except (EOFError, ConnectionError):
+                # Coordinator finished and shut down
+                break
+    finally:
+        heartbeat.stop_event.set()
+    return done
+
+
+def run_workers(address: tuple, authkey=None, workers: int = 1, threads: int = 1,
+                connect_timeout: float = 60.0) -> int:
+    """
+    Runs `workers` run_worker loops on this node, each in its own process
+    pinned to `threads` threads (see make_executor).
+    """
+    from src.core.parallel import make_executor
+
+    authkey = resolve_authkey(authkey)
+    if workers <= 1:
+        return run_worker(address, authkey, threads=threads, connect_timeout=connect_timeout)
+
+    host = socket.gethostname()
+    with make_executor(workers, threads) as pool:
+        futures = [pool.submit(run_worker, address, authkey, f"{host}:{os.getpid()}-{i}",
+                               threads, connect_timeout)
+                   for i in range(workers)]
+        return sum(f.result() for f in futures)
@@ -0,0 +1,223 @@
+from pathlib import Path
+from typing import Iterable, Iterator
+from zipfile import ZipFile, ZIP_DEFLATED
+import argparse
+
+import numpy as np
+
+from src.core.xyz import BOHR_PER_ANGSTROM, SYMBOLS, Structure, format_xyz
+
+# Geometry in Angstrom
+CC_BOND = 1.42
+CH_BOND = 1.09
+LATTICE = CC_BOND * np.sqrt(3.0)
+
+DOPANTS = ("B", "N", "O", "P", "S")
+SHAPES = ("hexagonal", "rectangular")
+
+# Honeycomb lattice: A sites at i*a1 + j*a2, B sites shifted by DELTA
+_A1 = np.array([LATTICE, 0.0])
+_A2 = np.array([LATTICE / 2, LATTICE * np.sqrt(3.0) / 2])
+_DELTA = (_A1 + _A2) / 3
+
+
+def _inside(points: np.ndarray, shape: str, size: float, aspect: float) -> np.ndarray:
+    if shape == "hexagonal":
+        # Zigzag-edged hexagon, `size` across flats
+        angles = np.radians([30.0, 90.0, 150.0])
+        normals = np.stack([np.cos(angles), np.sin(angles)], axis=1)
+        return (np.abs(points @ normals.T) <= size / 2).all(axis=1)
+    if shape == "rectangular":
+        # Zigzag edges along x, armchair edges along y
+        return (np.abs(points[:, 0]) <= size / 2) & (np.abs(points[:, 1]) <= size * aspect / 2)
+    raise ValueError(f"Unknown flake shape: {shape!r} (expected one of {SHAPES})")
+
+
+def graphene_flake(size_nm: float, shape: str = "rectangular", aspect: float = 1.0) -> Structure:
+    """
+    Planar, hydrogen-saturated graphene flake about `size_nm` across.
+
+    Carbons are cut from the honeycomb lattice, atoms left with a single C
+    neighbour are pruned, and every two-coordinated edge carbon gets one H
+    along its missing bond. `aspect` is height / width for rectangular flakes.
+    """
+    size = size_nm * 10.0
+    m = int(np.ceil(size * max(1.0, aspect) / LATTICE)) + 2
+    i, j = np.meshgrid(np.arange(-m, m + 1), np.arange(-m, m + 1), indexing="ij")
+    # Centre the cut on a ring so hexagons come out symmetric
+    sites_a = i[..., None] * _A1 + j[..., None] * _A2 + _DELTA
+    sites_b = sites_a + _DELTA
+
+    grid = i.shape
+    occ_a = _inside(sites_a.reshape(-1, 2), shape, size, aspect).reshape(grid)
+    occ_b = _inside(sites_b.reshape(-1, 2), shape, size, aspect).reshape(grid)
+
+    # A(i,j) bonds to B(i,j), B(i-1,j), B(i,j-1); the grid border is always empty
+    def neighbours(occ_a, occ_b):
+        n_a = occ_b.astype(int) + np.roll(occ_b, 1, axis=0) + np.roll(occ_b, 1, axis=1)
+        n_b = occ_a.astype(int) + np.roll(occ_a, -1, axis=0) + np.roll(occ_a, -1, axis=1)
+        return n_a, n_b
+
+    while True:
+        n_a, n_b = neighbours(occ_a, occ_b)
+        keep_a, keep_b = occ_a & (n_a >= 2), occ_b & (n_b >= 2)
+        if (keep_a == occ_a).all() and (keep_b == occ_b).all():
+            break
+        occ_a, occ_b = keep_a, keep_b
+
+    carbons = np.concatenate([sites_a[occ_a], sites_b[occ_b]])
+
+    # One H per edge carbon, along the bond to the missing neighbour
+    hydrogens = []
+    bonds_a = ((occ_b, _DELTA), (np.roll(occ_b, 1, axis=0), _DELTA - _A1), (np.roll(occ_b, 1, axis=1), _DELTA - _A2))
+    bonds_b = ((occ_a, -_DELTA), (np.roll(occ_a, -1, axis=0), _A1 - _DELTA), (np.roll(occ_a, -1, axis=1), _A2 - _DELTA))
+    for occ, sites, n, bonds in ((occ_a, sites_a, n_a, bonds_a), (occ_b, sites_b, n_b, bonds_b)):
+        edge = occ & (n == 2)
+        for bonded, vector in bonds:
+            missing = edge & ~bonded
+            hydrogens.append(sites[missing] + vector * (CH_BOND / CC_BOND))
+    hydrogens = np.concatenate(hydrogens)
+
+    positions = np.zeros((len(carbons) + len(hydrogens), 3))
+    positions[:, :2] = np.concatenate([carbons, hydrogens])
+    numbers = np.array([6] * len(carbons) + [1] * len(hydrogens), dtype=np.int64)
+    return Structure(flake_name(size_nm), numbers, positions * BOHR_PER_ANGSTROM)
+
+
+def flake_name(size_nm: float, dopant: str = "pure", count: int = 0, percent: float = 0.0) -> str:
+    """
+    File stem in the dataset convention understood by parse_structure_name,
+    e.g. "3nm-12Ndoped-4percent" or "2nm-0pure-0percent".
+    """
+    if dopant == "pure":
+        return f"{size_nm:g}nm-0pure-0percent"
+    return f"{size_nm:g}nm-{count}{dopant}doped-{percent:g}percent"
+
+
+def interior_carbons(flake: Structure) -> np.ndarray:
+    """
+    Indices of the carbons that carry no hydrogen (three-coordinated).
+    """
+    carbons = np.flatnonzero(flake.numbers == 6)
+    hydrogens = flake.positions[flake.numbers == 1]
+    distances = np.linalg.norm(flake.positions[carbons, None] - hydrogens[None], axis=-1)
+    return carbons[distances.min(axis=1) > 1.5 * CH_BOND * BOHR_PER_ANGSTROM]
+
+
+def dope(flake: Structure, dopant: str, count: int | None = None, percent: float | None = None,
+         rng: np.random.Generator | None = None, sites: np.ndarray | None = None) -> Structure:
+    """
+    Substitutes `count` carbons (or `percent` % of them) by `dopant`, picked at
+    random among the interior carbons. Pass `sites` (from interior_carbons)
+    when doping the same flake many times.
+    """
+    if dopant not in DOPANTS:
+        raise ValueError(f"Unsupported dopant: {dopant!r} (expected one of {DOPANTS})")
+    if (count is None) == (percent is None):
+        raise ValueError("Give exactly one of count or percent")
+
+    rng = rng or np.random.default_rng()
+    numbers = flake.numbers.copy()
+    ncarbons = int((numbers == 6).sum())
+    if count is None:
+        count = max(1, int(round(percent / 100 * ncarbons)))
+    else:
+        percent = round(100 * count / ncarbons, 1)
+
+    # Edge carbons carry the hydrogens; keep the dopants inside the flake
+    if sites is None:
+        sites = interior_carbons(flake)
+    if count > len(sites):
+        raise ValueError(f"{flake.name}: only {len(sites)} interior sites for {count} {dopant} dopants")
+
+    numbers[rng.choice(sites, size=count, replace=False)] = SYMBOLS.index(dopant) + 1
+    size_nm = float(flake.name.split("nm", 1)[0])
+    return Structure(flake_name(size_nm, dopant, count, percent), numbers, flake.positions)
+
+
+def generate(sizes: Iterable[float], dopants: Iterable[str] = DOPANTS, percents: Iterable[float] = (1.5, 3, 5, 7),
+             variants: int = 1, shape: str = "rectangular", seed: int | None = 0) -> Iterator[Structure]:
+    """
+    Pure and doped flakes for every size x dopant x percent, with `variants`
+    random dopant placements each. The pristine flake of each size is built
+    once and reused for all its doped copies.
+    """
+    rng = np.random.default_rng(seed)
+    dopants, percents = list(dopants), list(percents)
+    for size_nm in sizes:
+        flake = graphene_flake(size_nm, shape)
+        sites = interior_carbons(flake)
+        yield flake
+        for dopant in dopants:
+            for percent in percents:
+                for v in range(variants):
+                    doped = dope(flake, dopant, percent=percent, rng=rng, sites=sites)
+                    if variants > 1:
+                        # parse_structure_name ignores the extra "-v<n>" token
+                        doped = doped._replace(name=f"{doped.name}-v{v}")
+                    yield doped
+
+
+def _xyz_texts(structures: Iterable[Structure]) -> Iterator[tuple]:
+    """
+    (name, XYZ text) per structure. Doped copies share their flake's geometry,
+    so its coordinate columns are formatted once and only the symbols change.
+    """
+    positions = coords = None
+    for s in structures:
+        if s.positions is not positions:
+            positions = s.positions
+            coords = format_xyz(np.ones(len(positions), dtype=int), positions).splitlines()[2:]
+            coords = [line[2:] for line in coords]
+        atoms = "\n".join(f"{SYMBOLS[z - 1]:2s}{line}" for z, line in zip(s.numbers, coords))
+        yield s.name, f"{len(s.numbers)}\n{s.name}\n{atoms}\n"
+
+
+def write_directory(structures: Iterable[Structure], directory: Path) -> int:
+    """
+    Writes one .xyz per structure into `directory`. Returns how many.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    n = 0
+    for name, text in _xyz_texts(structures):
+        (directory / f"{name}.xyz").write_text(text, encoding="utf-8")
+        n += 1
+    return n
+
+
+def write_zip(structures: Iterable[Structure], zip_path: Path) -> int:
+    """
+    Packs the structures into a zip laid out like the shipped dataset
+    (everything under a folder named after the archive). Returns how many.
+    """
+    zip_path = Path(zip_path)
+    n = 0
+    with ZipFile(zip_path, "w", compression=ZIP_DEFLATED) as zf:
+        for name, text in _xyz_texts(structures):
+            zf.writestr(f"{zip_path.stem}/{name}.xyz", text)
+            n += 1
+    return n
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generates doped graphene flakes for load testing")
+    parser.add_argument("output", type=Path, help=".zip archive or directory to write")
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 1.5, 2])
+    parser.add_argument("--dopants", nargs="+", choices=DOPANTS, default=list(DOPANTS))
+    parser.add_argument("--percents", type=float, nargs="+", default=[1.5, 3, 5, 7])
+    parser.add_argument("--variants", type=int, default=1, help="random dopant placements per combination")
+    parser.add_argument("--shape", choices=SHAPES, default="rectangular")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    structures = generate(args.sizes, args.dopants, args.percents, args.variants, args.shape, args.seed)
+    if args.output.suffix.lower() == ".zip":
+        n = write_zip(structures, args.output)
+    else:
+        n = write_directory(structures, args.output)
+    print(f"{n} structures written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from src.core.process import HARTREE_TO_EV
+from src.core.transport import electron_count
+
+# Matrix elements below this (Hartree for H, plain for S) are dropped
+CUTOFF = 1e-6
+# Frontier orbitals returned around the mid-gap
+FRONTIER_STATES = 8
+# Bisection of the mid-gap stops once the bracket is this narrow (Hartree)
+BISECTION_TOL = 1e-6
+# Largest system the dense check is run on
+DENSE_LIMIT = 3000
+
+
+class FrontierResult(NamedTuple):
+    energies: np.ndarray  # (k,) eV, ascending
+    indices: np.ndarray   # (k,) position of each level in the full spectrum
+    vectors: np.ndarray   # (norbitals, k) S-orthonormal coefficients
+    homo: float           # eV
+    lumo: float
+    gap: float
+    sigma: float          # shift the last factorization used, eV
+    factorizations: int   # sparse LU factorizations spent locating the gap
+
+
+class ScfComparison(NamedTuple):
+    offset: float         # mean shift of the levels of H from the SCF ones, eV
+    spread: float         # largest deviation left after removing `offset`, eV
+    gap_deviation: float  # gap of H minus the SCF gap, eV
+
+
+def sparsify(matrix, cutoff: float = CUTOFF):
+    """
+    CSR copy of a dense symmetric matrix without the elements whose
+    magnitude is below `cutoff`. The mask is symmetrized so the result stays
+    exactly symmetric.
+    """
+    import scipy.sparse as sp
+
+    matrix = np.asarray(matrix, dtype=float)
+    keep = np.abs(matrix) >= cutoff
+    keep |= keep.T
+    rows, cols = np.nonzero(keep)
+    return sp.csr_matrix((matrix[rows, cols], (rows, cols)), shape=matrix.shape)
+
+
+def occupied_count(electrons: float) -> int:
+    # Same convention as process.frontier_levels: the HOMO holds the odd electron
+    return (int(round(electrons)) + 1) // 2
+
+
+def count_below(H, S, sigma: float) -> int:
+    """
+    Number of generalized eigenvalues of (H, S) below `sigma`, by Sylvester's
+    law of inertia: the negative pivots of a symmetric factorization of
+    H - sigma S. SuperLU in symmetric mode with diagonal pivoting applies the
+    same permutation to rows and columns, so U = D L^T and diag(U) carries
+    the inertia; if it had to pivot off the diagonal the count would be
+    meaningless and RuntimeError is raised.
+    """
+    from scipy.sparse.linalg import splu
+
+    lu = splu((H - sigma * S).tocsc(), permc_spec="MMD_AT_PLUS_A", diag_pivot_thresh=0.0,
+              options={"SymmetricMode": True})
+    if not np.array_equal(lu.perm_r, lu.perm_c):
+        raise RuntimeError(f"Off-diagonal pivoting at sigma={sigma}, inertia unavailable")
+    return int(np.count_nonzero(lu.U.diagonal() < 0))
+
+
+def locate_gap(H, S, occupied: int, tol: float = BISECTION_TOL) -> tuple[float, int, int]:
+    """
+    Bisects for a shift with exactly `occupied` levels below it, i.e. one
+    inside the HOMO-LUMO gap. Returns (sigma, levels below sigma,
+    factorizations); with a gap narrower than `tol` the count may be off by
+    the (near) degenerate frontier levels.
+    """
+    # Valence levels of xTB Hamiltonians sit well inside [-2, 1] Hartree;
+    # the bracket is widened only if they don't
+    low, high = -2.0, 1.0
+    below_low, below_high = count_below(H, S, low), count_below(H, S, high)
+    factorizations = 2
+    while below_low > occupied or below_high < occupied:
+        width = high - low
+        if below_low > occupied:
+            low, below_low = low - width, count_below(H, S, low - width)
+        else:
+            high, below_high = high + width, count_below(H, S, high + width)
+        factorizations += 1
+    for sigma, below in ((low, below_low), (high, below_high)):
+        if below == occupied:
+            return sigma, below, factorizations
+
+    while True:
+        sigma = 0.5 * (low + high)
+        below = count_below(H, S, sigma)
+        factorizations += 1
+        if below == occupied or high - low < tol:
+            return sigma, below, factorizations
+        if below < occupied:
+            low = sigma
+        else:
+            high = sigma
+
+
+def frontier_orbitals(H, S, electrons: float, k: int = FRONTIER_STATES, cutoff: float = CUTOFF,
+                      tol: float = BISECTION_TOL) -> FrontierResult:
+    """
+    The `k` orbitals closest to the mid-gap of (H, S) without a dense
+    diagonalization. H (Hartree) and S may be dense, memory-mapped (see
+    MatrixStore) or scipy sparse; dense input is sparsified with `cutoff`.
+
+    A few sparse LU factorizations of H - sigma S (see count_below) locate a
+    shift inside the gap, then ARPACK in shift-invert mode returns the k/2
+    levels right below and right above it, which always include the HOMO
+    and the LUMO. Cost and memory follow the fill-in of the factorization
+    rather than n^3 / n^2.
+
+    The levels are those of the H given. tblite's exported hamiltonian-matrix
+    is not the Fock matrix of its reported orbital energies: its spectrum
+    sits 0.4-1.1 eV lower and, depending on the structure, the gap can be
+    off by tenths of an eV too (see check_scf), so don't read them as the
+    structure's HOMO/LUMO.
+    """
+    import scipy.sparse as sp
+    from scipy.sparse.linalg import eigsh
+
+    if np.ndim(H) == 3:
+        raise ValueError("Spin-polarized Hamiltonians are not supported, pass one channel")
+    H = H.tocsr() if sp.issparse(H) else sparsify(H, cutoff)
+    S = S.tocsr() if sp.issparse(S) else sparsify(S, cutoff)
+    n = H.shape[0]
+    occupied = occupied_count(electrons)
+    if not 0 < occupied < n:
+        raise ValueError(f"{occupied} occupied orbitals out of {n}: no HOMO-LUMO gap")
+    k = min(max(k, 2), n - 1)
+
+    sigma, below, factorizations = locate_gap(H, S, occupied, tol)
+    values, vectors = eigsh(H, k, M=S, sigma=sigma, which='BE')
+    order = np.argsort(values)
+    values, vectors = values[order], vectors[:, order]
+
+    indices = below - np.count_nonzero(values < sigma) + np.arange(k)
+    homo = np.flatnonzero(indices == occupied - 1)
+    if len(homo) == 0 or homo[0] + 1 >= k:
+        raise RuntimeError(f"Frontier orbitals not found around sigma={sigma:.6f} Hartree")
+    energies = values * HARTREE_TO_EV
+    homo, lumo = energies[homo[0]], energies[homo[0] + 1]
+    return FrontierResult(energies, indices, vectors, float(homo), float(lumo), float(lumo - homo),
+                          float(sigma * HARTREE_TO_EV), factorizations)
+
+
+def dense_levels(H, S, indices) -> np.ndarray:
+    """
+    Reference levels (eV) of the dense generalized eigenproblem at `indices`.
+    """
+    from scipy.linalg import eigh
+
+    indices = np.asarray(indices)
+    values = eigh(np.asarray(H, dtype=float), np.asarray(S, dtype=float), eigvals_only=True,
+                  subset_by_index=(int(indices.min()), int(indices.max())))
+    return values[indices - indices.min()] * HARTREE_TO_EV
+
+
+def check_dense(H, S, result: FrontierResult, limit: int = DENSE_LIMIT) -> float | None:
+    """
+    Largest deviation (eV) of the sparse frontier levels from the dense
+    solution of the unsparsified matrices; None above `limit` orbitals,
+    where the dense path is what this module avoids.
+    """
+    if np.shape(H)[-1] > limit:
+        return None
+    return float(np.max(np.abs(result.energies - dense_levels(H, S, result.indices))))
+
+
+def check_scf(result: FrontierResult, orbital_energies) -> ScfComparison:
+    """
+    How the frontier levels compare with the SCF orbital energies (Hartree,
+    as tblite reports them) at the same positions of the spectrum. Only the
+    shift-free `spread` and `gap_deviation` say whether H has the shape of
+    the SCF spectrum; over the dataset they range from ~0 to several tenths
+    of an eV, so this is a report, not a pass/fail test.
+    """
+    reference = np.asarray(orbital_energies)[result.indices] * HARTREE_TO_EV
+    difference = result.energies - reference
+    offset = float(np.mean(difference))
+    homo = int(np.flatnonzero(result.energies == result.homo)[0])
+    scf_gap = reference[homo + 1] - reference[homo]
+    return ScfComparison(offset, float(np.max(np.abs(difference - offset))), float(result.gap - scf_gap))
@@ -0,0 +1,272 @@
+# libs/catalog.py
+import hashlib
+import json
+import sqlite3
+from collections import Counter
+from datetime import datetime
+from pathlib import Path, PurePosixPath
+from zipfile import ZipFile
+
+from .filename_parser import parse_structure_name
+from .ingest import ZipMember, _is_structure
+
+_COLUMNS = (
+    "archive", "path", "name", "size_nm", "dopant", "dopant_count", "percent",
+    "natoms", "composition", "content_hash", "mtime", "bytes",
+)
+
+
+def composition(text: str) -> Counter:
+    """
+    Cuenta de átomos por elemento del primer frame de un XYZ. ValueError si
+    el texto no es un XYZ (vacío, sin número de átomos, frame incompleto).
+    """
+    lines = text.splitlines()
+    try:
+        natoms = int(lines[0])
+    except (IndexError, ValueError):
+        raise ValueError("no empieza con el número de átomos") from None
+    atoms = [line.split() for line in lines[2:2 + natoms]]
+    if len(atoms) < natoms or not all(atoms):
+        raise ValueError(f"frame incompleto ({natoms} átomos declarados)")
+    return Counter(atom[0].rstrip("0123456789").capitalize() for atom in atoms)
+
+
+class CatalogEntry(dict):
+    """
+    Fila del catálogo ({columna: valor}) que sabe de dónde leer su estructura.
+    """
+
+    @property
+    def source(self) -> Path | ZipMember:
+        if self["archive"]:
+            return ZipMember(Path(self["archive"]), self["path"])
+        return Path(self["path"])
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self["name"]).stem
+
+
+class Catalog:
+    """
+    Índice persistente (SQLite) de las estructuras del dataset.
+
+    Guarda por estructura los metadatos del nombre (tamaño, dopante,
+    cantidad, porcentaje), el número de átomos y la composición, y la huella
+    del contenido con su mtime. sync_directory/sync_zip solo vuelven a leer
+    los archivos nuevos o que cambiaron, así que un dataset grande ya
+    catalogado no se recorre entero en cada corrida.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.db = sqlite3.connect(self.path, timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS structures ("
+            " archive TEXT NOT NULL,"
+            " path TEXT NOT NULL,"
+            " name TEXT NOT NULL,"
+            " size_nm REAL,"
+            " dopant TEXT NOT NULL,"
+            " dopant_count INTEGER NOT NULL,"
+            " percent REAL NOT NULL,"
+            " natoms INTEGER NOT NULL,"
+            " composition TEXT NOT NULL,"
+            " content_hash TEXT NOT NULL,"
+            " mtime REAL NOT NULL,"
+            " bytes INTEGER NOT NULL,"
+            " PRIMARY KEY (archive, path))"
+        )
+        # consultas típicas: "dopante X con tamaño >= Y", "tamaño Y", "% Z"
+        self.db.execute("CREATE INDEX IF NOT EXISTS structures_dopant_size ON structures (dopant, size_nm)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS structures_size ON structures (size_nm)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS structures_percent ON structures (percent)")
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- sincronización --------------------------------------------------
+
+    def _known(self, archive: str) -> dict:
+        rows = self.db.execute(
+            "SELECT path, content_hash, mtime, bytes FROM structures WHERE archive = ?", (archive,)
+        )
+        return {path: (content_hash, mtime, size) for path, content_hash, mtime, size in rows}
+
+    def _upsert(self, archive: str, path: str, name: str, text: str,
+                content_hash: str, mtime: float, size: int) -> bool:
+        """
+        Guarda (o reemplaza) la fila de una estructura. Un archivo que no se
+        puede leer como XYZ se avisa y se saca del catálogo, sin cortar la
+        sincronización del resto; devuelve False en ese caso.
+        """
+        size_nm, dopant, dopant_count, percent = parse_structure_name(name)
+        try:
+            counts = composition(text)
+        except ValueError as e:
+            print(f"  ⚠ {archive + ':' if archive else ''}{path}: {e}, se omite.")
+            self._forget(archive, [path])
+            return False
+        self.db.execute(
+            f"INSERT OR REPLACE INTO structures ({', '.join(_COLUMNS)}) "
+            f"VALUES ({', '.join('?' * len(_COLUMNS))})",
+            (archive, path, name, size_nm, dopant, dopant_count, percent,
+             sum(counts.values()), json.dumps(dict(sorted(counts.items()))),
+             content_hash, mtime, size),
+        )
+        return True
+
+    def _forget(self, archive: str, paths) -> None:
+        self.db.executemany(
+            "DELETE FROM structures WHERE archive = ? AND path = ?",
+            [(archive, p) for p in paths],
+        )
+
+    def sync_directory(self, directory: Path, suffix: str = ".xyz") -> tuple:
+        """
+        Pone al día las estructuras sueltas de `directory`. Un archivo con el
+        mismo mtime y tamaño no se lee; si cambió, se rehashea y solo se
+        reparsea si el contenido es distinto. Devuelve (nuevos, actualizados,
+        borrados).
+        """
+        known = self._known("")
+        prefix = str(Path(directory))
+        # solo las filas de esta carpeta, no las de otras sincronizadas antes
+        known = {p: v for p, v in known.items() if str(Path(p).parent) == prefix}
+        added = updated = 0
+        seen = set()
+
+        for file in sorted(Path(directory).glob(f"*{suffix}")):
+            path = str(file)
+            seen.add(path)
+            stat = file.stat()
+            entry = known.get(path)
+            if entry is not None and entry[1] == stat.st_mtime and entry[2] == stat.st_size:
+                continue
+
+            data = file.read_bytes()
+            content_hash = hashlib.sha256(data).hexdigest()
+            if entry is not None and entry[0] == content_hash:
+                # tocado pero igual: solo se actualiza el mtime
+                self.db.execute(
+                    "UPDATE structures SET mtime = ?, bytes = ? WHERE archive = '' AND path = ?",
+                    (stat.st_mtime, stat.st_size, path),
+                )
+                continue
+
+            if not self._upsert("", path, file.name, data.decode("utf-8", errors="ignore"),
+                                content_hash, stat.st_mtime, stat.st_size):
+                continue
+            added, updated = (added + 1, updated) if entry is None else (added, updated + 1)
+
+        removed = known.keys() - seen
+        self._forget("", removed)
+        self.db.commit()
+        return added, updated, len(removed)
+
+    def sync_zip(self, zip_path: Path, suffix: str = ".xyz") -> tuple:
+        """
+        Como sync_directory para un zip. La huella es el CRC32 + tamaño del
+        directorio central, así que los miembros sin cambios no se
+        descomprimen.
+        """
+        archive = str(zip_path)
+        known = self._known(archive)
+        added = updated = 0
+        seen = set()
+
+        with ZipFile(zip_path) as zf:
+            for info in zf.infolist():
+                if not _is_structure(info, suffix):
+                    continue
+                seen.add(info.filename)
+                content_hash = f"crc32:{info.CRC:08x}:{info.file_size}"
+                entry = known.get(info.filename)
+                if entry is not None and entry[0] == content_hash:
+                    continue
+
+                with zf.open(info) as f:
+                    text = f.read().decode("utf-8", errors="ignore")
+                mtime = datetime(*info.date_time).timestamp()
+                if not self._upsert(archive, info.filename, PurePosixPath(info.filename).name, text,
+                                    content_hash, mtime, info.file_size):
+                    continue
+                added, updated = (added + 1, updated) if entry is None else (added, updated + 1)
+
+        removed = known.keys() - seen
+        self._forget(archive, removed)
+        self.db.commit()
+        return added, updated, len(removed)
+
+    def sync(self, source: Path) -> tuple:
+        """
+        sync_zip o sync_directory según `source`.
+        """
+        source = Path(source)
+        if source.suffix.lower() == ".zip":
+            return self.sync_zip(source)
+        return self.sync_directory(source)
+
+    # --- consultas -------------------------------------------------------
+
+    def query(self, source: Path | None = None, size_nm: float | None = None,
+              dopant: str | None = None, percent: float | None = None,
+              min_size: float | None = None, max_size: float | None = None,
+              element: str | None = None) -> list:
+        """
+        Estructuras que cumplen todos los filtros dados, ordenadas por nombre.
+        `source` restringe a un zip o carpeta; `element` a las que contienen
+        ese elemento. Ej.: query(dopant="N", min_size=1.5).
+        """
+        where, params = [], []
+        if source is not None:
+            source = Path(source)
+            if source.suffix.lower() == ".zip":
+                where.append("archive = ?")
+                params.append(str(source))
+            else:
+                where.append("archive = '' AND path LIKE ?")
+                params.append(str(source / "%"))
+        # rangos y no igualdad exacta (floats), pero usando los índices
+        if size_nm is not None:
+            where.append("size_nm BETWEEN ? AND ?")
+            params += [size_nm - 1e-6, size_nm + 1e-6]
+        if min_size is not None:
+            where.append("size_nm >= ?")
+            params.append(min_size)
+        if max_size is not None:
+            where.append("size_nm <= ?")
+            params.append(max_size)
+        if dopant is not None:
+            where.append("dopant = ?")
+            params.append(dopant)
+        if percent is not None:
+            where.append("percent BETWEEN ? AND ?")
+            params += [percent - 1e-6, percent + 1e-6]
+        if element is not None:
+            where.append("composition LIKE ?")
+            params.append(f'%"{element}":%')
+
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM structures"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY name"
+
+        entries = []
+        for row in self.db.execute(sql, params):
+            entry = CatalogEntry(zip(_COLUMNS, row))
+            entry["composition"] = json.loads(entry["composition"])
+            entries.append(entry)
+        return entries
+
+    def __len__(self) -> int:
+        return self.db.execute("SELECT COUNT(*) FROM structures").fetchone()[0]
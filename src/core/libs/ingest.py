@@ -0,0 +1,87 @@
+# libs/ingest.py
+from functools import lru_cache
+from pathlib import Path, PurePosixPath
+from typing import Iterator, List, NamedTuple, Tuple
+from zipfile import ZipFile, ZipInfo
+
+
+class ZipMember(NamedTuple):
+    """
+    Referencia a un archivo dentro de un zip, sin extraerlo.
+    Se serializa barato (ruta + nombre), así que puede mandarse a un worker.
+    """
+    archive: Path
+    member: str
+
+    @property
+    def name(self) -> str:
+        return PurePosixPath(self.member).name
+
+    @property
+    def stem(self) -> str:
+        return PurePosixPath(self.member).stem
+
+
+def _is_structure(info: ZipInfo, suffix: str) -> bool:
+    # fuera carpetas y la basura de macOS (__MACOSX/, ._archivo)
+    path = PurePosixPath(info.filename)
+    return (
+        not info.is_dir()
+        and path.suffix.lower() == suffix
+        and "__MACOSX" not in path.parts
+        and not path.name.startswith("._")
+    )
+
+
+def list_zip_members(zip_file: Path, suffix: str = ".xyz") -> List[ZipMember]:
+    """
+    Lista las estructuras de un zip leyendo solo el directorio central.
+    """
+    with ZipFile(zip_file) as zf:
+        return [
+            ZipMember(Path(zip_file), info.filename)
+            for info in zf.infolist()
+            if _is_structure(info, suffix)
+        ]
+
+
+def iter_zip_xyz(zip_file: Path, suffix: str = ".xyz") -> Iterator[Tuple[str, str]]:
+    """
+    Recorre el zip una sola vez y va devolviendo (nombre, texto) de cada
+    estructura, descomprimiendo en memoria con zf.open.
+    """
+    with ZipFile(zip_file) as zf:
+        for info in zf.infolist():
+            if not _is_structure(info, suffix):
+                continue
+            with zf.open(info) as f:
+                yield PurePosixPath(info.filename).name, f.read().decode("utf-8", errors="ignore")
+
+
+def _open_zip(zip_file: Path) -> ZipFile:
+    # un ZipFile abierto por proceso: reabrirlo por miembro reparsearía
+    # el directorio central entero cada vez. La clave incluye mtime y
+    # tamaño para que un zip reemplazado en disco se vuelva a abrir.
+    stat = Path(zip_file).stat()
+    return _open_zip_version(Path(zip_file), stat.st_mtime_ns, stat.st_size)
+
+
+@lru_cache(maxsize=8)
+def _open_zip_version(zip_file: Path, mtime_ns: int, size: int) -> ZipFile:
+    return ZipFile(zip_file)
+
+
+def read_zip_member(member: ZipMember) -> str:
+    """
+    Lee el texto de un miembro del zip (acceso aleatorio, sin extraer).
+    """
+    with _open_zip(member.archive).open(member.member) as f:
+        return f.read().decode("utf-8", errors="ignore")
+
+
+def member_fingerprint(member: ZipMember) -> str:
+    """
+    Huella del contenido a partir del CRC32 y tamaño del zip, sin descomprimir.
+    """
+    info = _open_zip(member.archive).getinfo(member.member)
+    return f"crc32:{info.CRC:08x}:{info.file_size}"
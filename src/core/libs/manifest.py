@@ -0,0 +1,82 @@
+# libs/manifest.py
+import hashlib
+import json
+import os
+from pathlib import Path
+
+
+def file_hash(path: Path) -> str:
+    """
+    SHA-256 del contenido de un archivo.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def outputs_complete(outdir: Path) -> bool:
+    """
+    True si la estructura tiene xtbopt.xyz y un xtb_sp.out que terminó bien.
+    """
+    sp_out = outdir / "xtb_sp.out"
+    if not (outdir / "xtbopt.xyz").exists() or not sp_out.exists():
+        return False
+
+    # xtb escribe "normal termination of xtb" al final del output
+    with open(sp_out, "rb") as f:
+        f.seek(max(0, sp_out.stat().st_size - 4096))
+        return b"normal termination" in f.read()
+
+
+class Manifest:
+    """
+    Registro de qué estructuras ya están calculadas y con qué entradas.
+
+    Guarda, por id de estructura, el hash del .xyz de entrada y los niveles
+    extraídos. Si cambia la huella (versión de xtb, flags) todas las entradas
+    dejan de ser válidas.
+    """
+
+    def __init__(self, path: Path, fingerprint: dict):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries = {}
+
+        if path.exists():
+            with open(path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("fingerprint") == fingerprint:
+                self.entries = data.get("structures", {})
+
+    def is_valid(self, struct_id: str, input_hash: str, outdir: Path) -> bool:
+        entry = self.entries.get(struct_id)
+        return (
+            entry is not None
+            and entry["input_hash"] == input_hash
+            and outputs_complete(outdir)
+        )
+
+    def levels(self, struct_id: str):
+        """
+        Devuelve (HOMO_eV, LUMO_eV, GAP_eV) guardados para la estructura.
+        """
+        entry = self.entries[struct_id]
+        return entry["HOMO_eV"], entry["LUMO_eV"], entry["GAP_eV"]
+
+    def record(self, struct_id: str, input_hash: str, homo, lumo, gap) -> None:
+        self.entries[struct_id] = {
+            "input_hash": input_hash,
+            "HOMO_eV": homo,
+            "LUMO_eV": lumo,
+            "GAP_eV": gap,
+        }
+        self.save()
+
+    def save(self) -> None:
+        # escritura atómica: un crash a mitad no deja el manifest corrupto
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "structures": self.entries}, f, indent=1)
+        os.replace(tmp, self.path)
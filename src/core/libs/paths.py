@@ -5,7 +5,6 @@ ROOT = Path(__file__).resolve().parents[1]
 
 
 # Inputs
-TMP_ROOT = ROOT / "tmp_zip"
 DATASET_ZIP = ROOT / "dataset2.zip"
 
 
@@ -17,9 +16,21 @@ RESULTS_DIR = ROOT / "results"
 RESULTS_DIR.mkdir(exist_ok=True)
 STRUCT_CSV = RESULTS_DIR / "structures.csv"
 LEVELS_CSV  = RESULTS_DIR / "xtb_levels.csv"
+MANIFEST_JSON = RESULTS_DIR / "manifest.json"
+STRUCT_STORE = RESULTS_DIR / "structures.store"
+LEVELS_STORE = RESULTS_DIR / "xtb_levels.store"
+DOS_STORE = RESULTS_DIR / "dos.store"
 
 # Plots
 PLOTS_DIR = ROOT / "plots"
 PLOTS_DIR.mkdir(exist_ok=True)
+DOS_PLOTS_DIR = PLOTS_DIR / "dos"
 
+# Cache
+CACHE_DIR = ROOT / "cache"
 
+# Saved Hamiltonian/overlap/coefficient/density matrices (MatrixStore)
+MATRIX_DIR = ROOT / "matrices"
+
+# Catalog of the dataset structures (metadata + content hashes)
+CATALOG_DB = ROOT / "catalog.sqlite"
@@ -0,0 +1,255 @@
+# libs/store.py
+import json
+import os
+import shutil
+from pathlib import Path
+
+import numpy as np
+
+# tipos de columna -> dtype en disco
+_DTYPES = {"float": np.float64, "int": np.int64, "category": np.int32}
+
+STRUCT_SCHEMA = {
+    "id": "str",
+    "filename": "str",
+    "archive": "str",
+    "path": "str",
+    "size_nm": "float",
+    "dopant": "category",
+    "dopant_count": "int",
+    "percent": "float",
+}
+
+LEVELS_SCHEMA = {
+    "id": "str",
+    "size_nm": "float",
+    "dopant": "category",
+    "dopant_count": "int",
+    "percent": "float",
+    "HOMO_eV": "float",
+    "LUMO_eV": "float",
+    "GAP_eV": "float",
+}
+
+# las curvas (grid.npy, total.npy, partial.npy) van en el mismo directorio,
+# una fila por estructura en el mismo orden
+DOS_SCHEMA = {
+    "id": "str",
+    "size_nm": "float",
+    "dopant": "category",
+    "dopant_count": "int",
+    "percent": "float",
+    "HOMO_eV": "float",
+    "LUMO_eV": "float",
+    "fermi_eV": "float",
+}
+
+
+class ResultsStore:
+    """
+    Almacén columnar en disco, una fila por estructura.
+
+    Cada columna es un archivo binario al que se le va agregando al final
+    (float/int/category como arrays NumPy crudos; str como blob UTF-8 + offsets),
+    así que cada registro queda guardado en cuanto se llama a append() y un
+    crash no pierde lo ya escrito. Leer es un np.fromfile por columna.
+
+    Tipos: "float" (None -> NaN), "int", "category" (códigos int32 +
+    lista de categorías) y "str".
+    """
+
+    def __init__(self, directory: Path, schema: dict | None = None):
+        self.directory = Path(directory)
+        schema_file = self.directory / "schema.json"
+
+        if schema_file.exists():
+            with open(schema_file, "r", encoding="utf-8") as f:
+                self.schema = json.load(f)
+            if schema is not None and schema != self.schema:
+                raise ValueError(f"{self.directory} tiene otro esquema: {self.schema}")
+        elif schema is not None:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.schema = dict(schema)
+            with open(schema_file, "w", encoding="utf-8") as f:
+                json.dump(self.schema, f, indent=1)
+        else:
+            raise FileNotFoundError(f"No existe el almacén {self.directory}")
+
+        self.categories = {
+            col: self._load_categories(col)
+            for col, kind in self.schema.items() if kind == "category"
+        }
+        self._handles = {}
+
+    @classmethod
+    def create(cls, directory: Path, schema: dict) -> "ResultsStore":
+        """
+        Crea un almacén vacío, borrando uno anterior si existía.
+        """
+        directory = Path(directory)
+        if directory.exists():
+            shutil.rmtree(directory)
+        return cls(directory, schema)
+
+    @staticmethod
+    def exists(directory: Path) -> bool:
+        return (Path(directory) / "schema.json").exists()
+
+    # --- escritura -------------------------------------------------------
+
+    def _file(self, col: str, suffix: str) -> Path:
+        return self.directory / f"{col}{suffix}"
+
+    def _load_categories(self, col: str) -> list:
+        path = self._file(col, ".cats.json")
+        if not path.exists():
+            return []
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+    def _handle(self, col: str, suffix: str = ".bin"):
+        key = col + suffix
+        if key not in self._handles:
+            self._handles[key] = open(self._file(col, suffix), "ab")
+        return self._handles[key]
+
+    def _code(self, col: str, value) -> int:
+        cats = self.categories[col]
+        value = str(value)
+        if value not in cats:
+            cats.append(value)
+            # la lista se reescribe antes de usar el código nuevo
+            path = self._file(col, ".cats.json")
+            tmp = path.with_suffix(".tmp")
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(cats, f)
+            os.replace(tmp, path)
+        return cats.index(value)
+
+    def append(self, record: dict) -> None:
+        """
+        Agrega una fila y la deja escrita en disco inmediatamente.
+        """
+        for col, kind in self.schema.items():
+            value = record.get(col)
+            if kind == "str":
+                data = ("" if value is None else str(value)).encode("utf-8")
+                blob = self._handle(col)
+                blob.write(data)
+                blob.flush()
+                offsets = self._handle(col, ".off")
+                offsets.write(np.int64(blob.tell()).tobytes())
+                offsets.flush()
+                continue
+
+            if kind == "category":
+                value = self._code(col, value)
+            elif kind == "float":
+                value = np.nan if value is None else float(value)
+            else:
+                value = 0 if value is None else int(value)
+            handle = self._handle(col)
+            handle.write(np.asarray(value, dtype=_DTYPES[kind]).tobytes())
+            handle.flush()
+
+    def close(self) -> None:
+        for handle in self._handles.values():
+            handle.close()
+        self._handles = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # --- lectura ---------------------------------------------------------
+
+    def _raw(self, col: str) -> np.ndarray:
+        kind = self.schema[col]
+        suffix = ".off" if kind == "str" else ".bin"
+        path = self._file(col, suffix)
+        if not path.exists():
+            return np.empty(0, dtype=np.int64 if kind == "str" else _DTYPES[kind])
+        return np.fromfile(path, dtype=np.int64 if kind == "str" else _DTYPES[kind])
+
+    def __len__(self) -> int:
+        # una fila a medio escribir (crash) no cuenta
+        return min((len(self._raw(col)) for col in self.schema), default=0)
+
+    def _decode(self, col: str, raw: np.ndarray, rows: np.ndarray | None) -> np.ndarray:
+        kind = self.schema[col]
+        if kind == "category":
+            cats = np.asarray(self._load_categories(col), dtype=object)
+            codes = raw if rows is None else raw[rows]
+            return cats[codes] if len(cats) else codes.astype(object)
+        if kind != "str":
+            return raw if rows is None else raw[rows]
+
+        with open(self._file(col, ".bin"), "rb") as f:
+            blob = f.read()
+        ends = raw
+        starts = np.concatenate(([0], ends[:-1]))
+        index = range(len(ends)) if rows is None else rows
+        return np.array([blob[starts[i]:ends[i]].decode("utf-8") for i in index], dtype=object)
+
+    def load(self, columns: list | None = None) -> dict:
+        """
+        Devuelve {columna: array}. Las categorías se devuelven como sus valores.
+        """
+        return self.query(columns=columns)
+
+    def query(self, columns: list | None = None, size_nm: float | None = None,
+              dopant: str | None = None, percent: float | None = None,
+              min_size: float | None = None, max_size: float | None = None) -> dict:
+        """
+        Filtra por tamaño/dopante/porcentaje sobre las columnas tipadas
+        (sin decodificar strings ni armar DataFrames) y devuelve
+        {columna: array} solo con las filas que cumplen.
+        """
+        n = len(self)
+        mask = np.ones(n, dtype=bool)
+        if size_nm is not None:
+            mask &= np.isclose(self._raw("size_nm")[:n], size_nm)
+        if min_size is not None:
+            mask &= self._raw("size_nm")[:n] >= min_size
+        if max_size is not None:
+            mask &= self._raw("size_nm")[:n] <= max_size
+        if percent is not None:
+            mask &= np.isclose(self._raw("percent")[:n], percent)
+        if dopant is not None:
+            cats = self._load_categories("dopant")
+            code = cats.index(dopant) if dopant in cats else -1
+            mask &= self._raw("dopant")[:n] == code
+
+        rows = None if mask.all() else np.flatnonzero(mask)
+        return {
+            col: self._decode(col, self._raw(col)[:n], rows)
+            for col in (columns or list(self.schema))
+        }
+
+    def to_frame(self, columns: list | None = None, **filters):
+        """
+        DataFrame de pandas con las columnas "category" como Categorical.
+        """
+        import pandas as pd
+
+        data = self.query(columns=columns, **filters)
+        frame = pd.DataFrame(data)
+        for col in frame.columns:
+            if self.schema[col] == "category":
+                frame[col] = pd.Categorical(frame[col], categories=self._load_categories(col))
+        return frame
+
+    def export_csv(self, path: Path) -> None:
+        """
+        Copia en CSV (para abrir a mano), generada desde el almacén.
+        """
+        import csv
+
+        data = self.load()
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(self.schema.keys())
+            for row in zip(*(data[col] for col in self.schema)):
+                writer.writerow(["" if isinstance(v, float) and np.isnan(v) else v for v in row])
@@ -0,0 +1,138 @@
+# libs/trace.py
+"""
+Instrumentación liviana: tramos (spans) con tiempo de inicio y duración,
+exportables como Chrome trace (chrome://tracing o https://ui.perfetto.dev).
+
+Desactivada por defecto; span() devuelve entonces siempre el mismo objeto
+vacío y no mide nada. Se activa con enable() o con la variable de entorno
+XTB_TRACE=<archivo.json>, que también heredan los procesos worker.
+"""
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+TRACE_ENV = "XTB_TRACE"
+
+_events = []
+_lock = threading.Lock()
+_enabled = bool(os.environ.get(TRACE_ENV))
+
+
+def _now_us() -> float:
+    # reloj de pared: los eventos de distintos procesos quedan alineados
+    return time.time_ns() / 1000
+
+
+class Span:
+    __slots__ = ("name", "args", "start")
+
+    def __init__(self, name: str, args: dict):
+        self.name = name
+        self.args = args
+        self.start = 0.0
+
+    def set(self, **args) -> None:
+        """
+        Agrega datos al tramo (ciclos SCF, átomos...), visibles en el trace.
+        """
+        self.args.update(args)
+
+    def __enter__(self):
+        self.start = _now_us()
+        return self
+
+    def __exit__(self, *exc):
+        end = _now_us()
+        event = {
+            "name": self.name, "ph": "X", "ts": self.start, "dur": end - self.start,
+            "pid": os.getpid(), "tid": threading.get_ident(),
+        }
+        if self.args:
+            event["args"] = self.args
+        with _lock:
+            _events.append(event)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def set(self, **args) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+def span(name: str, **args):
+    """
+    Context manager que registra un tramo `name`:
+
+        with span("scf", natoms=n) as s:
+            ...
+            s.set(iterations=k)
+    """
+    if not _enabled:
+        return _NULL_SPAN
+    return Span(name, args)
+
+
+def is_enabled() -> bool:
+    return _enabled
+
+
+def enable(path: Path | None = None) -> None:
+    """
+    Activa el registro. `path` queda en XTB_TRACE para los procesos hijos
+    y como destino por defecto de export().
+    """
+    global _enabled
+    _enabled = True
+    os.environ[TRACE_ENV] = str(path or os.environ.get(TRACE_ENV) or "trace.json")
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+    os.environ.pop(TRACE_ENV, None)
+
+
+def drain() -> list:
+    """
+    Devuelve los eventos registrados y los quita del buffer (un worker los
+    manda así al proceso principal dentro de su resultado).
+    """
+    global _events
+    with _lock:
+        events, _events = _events, []
+    return events
+
+
+def merge(events: list) -> None:
+    """
+    Agrega eventos registrados en otro proceso.
+    """
+    if _enabled and events:
+        with _lock:
+            _events.extend(events)
+
+
+def export(path: Path | None = None) -> Path | None:
+    """
+    Escribe los eventos acumulados en formato Chrome trace y vacía el buffer.
+    Sin `path` usa XTB_TRACE. Devuelve la ruta escrita (None si no hay nada).
+    """
+    if not _enabled:
+        return None
+    path = Path(path or os.environ.get(TRACE_ENV) or "trace.json")
+    events = drain()
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    return path
@@ -1,94 +1,146 @@
 # libs/xtb_io.py
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
+from functools import lru_cache
+import os
 import subprocess
 import re
 
-def run_xtb_opt(xyz: Path, outdir: Path, nprocs: int = 4) -> None:
+from .xtb_parser import parse_xtb_output, find_output
+from . import trace
+
+# Flags de cada etapa; forman parte de la huella del manifest
+OPT_FLAGS = ["--opt"]
+SP_FLAGS = ["--sp"]
+
+
+@lru_cache(maxsize=None)
+def xtb_version() -> str:
+    """
+    Versión del binario xtb en el PATH ("unknown" si no se puede ejecutar).
+    """
+    try:
+        out = subprocess.run(["xtb", "--version"], capture_output=True, text=True).stdout
+    except OSError:
+        return "unknown"
+    m = re.search(r"xtb version\s+(\S+)", out)
+    return m.group(1) if m else "unknown"
+
+
+def xtb_settings() -> dict:
+    """
+    Todo lo que determina el resultado de un cálculo, salvo la geometría.
+    """
+    return {"xtb_version": xtb_version(), "opt": OPT_FLAGS, "sp": SP_FLAGS}
+
+
+def xtb_env(threads: int) -> dict:
+    """
+    Entorno para un proceso xtb limitado a `threads` hilos OpenMP/BLAS.
+    """
+    env = os.environ.copy()
+    for var in ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"):
+        env[var] = str(threads)
+    # sin paralelismo anidado: cada job usa exactamente sus hilos
+    env["OMP_MAX_ACTIVE_LEVELS"] = "1"
+    return env
+
+
+def run_xtb_opt(xyz: Path, outdir: Path, nprocs: int = 4, env: dict | None = None) -> None:
     """
     Optimización geométrica con xTB.
     Guarda la salida en xtb_opt.out
     """
     outdir.mkdir(exist_ok=True)
-    cmd = ["xtb", str(xyz), "--opt", "--parallel", str(nprocs)]
+    cmd = ["xtb", str(xyz), *OPT_FLAGS, "--parallel", str(nprocs)]
     print(f"  -> Ejecutando: {' '.join(cmd)}  (cwd={outdir})")
     with open(outdir / "xtb_opt.out", "w", encoding="utf-8", errors="ignore") as f:
-        subprocess.run(cmd, cwd=outdir, stdout=f, stderr=f)
+        subprocess.run(cmd, cwd=outdir, stdout=f, stderr=f, env=env)
 
 
-def run_xtb_sp(xyzopt: Path, outdir: Path) -> None:
+def run_xtb_sp(xyzopt: Path, outdir: Path, nprocs: int | None = None, env: dict | None = None) -> None:
     """
     Single point sobre la geometría optimizada.
     Guarda la salida en xtb_sp.out
     """
-    cmd = ["xtb", str(xyzopt), "--sp"]
+    cmd = ["xtb", str(xyzopt), *SP_FLAGS]
+    if nprocs is not None:
+        cmd += ["--parallel", str(nprocs)]
     print(f"  -> Ejecutando: {' '.join(cmd)}  (cwd={outdir})")
     with open(outdir / "xtb_sp.out", "w", encoding="utf-8", errors="ignore") as f:
-        subprocess.run(cmd, cwd=outdir, stdout=f, stderr=f)
+        subprocess.run(cmd, cwd=outdir, stdout=f, stderr=f, env=env)
+
+
+def split_cores(total_cores: int | None = None, threads_per_job: int = 1):
+    """
+    Reparte el presupuesto de núcleos como jobs x hilos-por-job.
+    Devuelve (jobs, threads).
+    """
+    total = total_cores or os.cpu_count() or 1
+    threads = max(1, min(threads_per_job, total))
+    return max(1, total // threads), threads
+
+
+def run_xtb_structure(xyz: Path, outdir: Path, threads: int = 1) -> bool:
+    """
+    Optimización + single point de una estructura (el sp depende del opt).
+    Devuelve False si la optimización no produjo xtbopt.xyz.
+    """
+    env = xtb_env(threads)
+    xyz_opt = outdir / "xtbopt.xyz"
+    # que un xtbopt.xyz de una corrida anterior no pase por uno nuevo
+    xyz_opt.unlink(missing_ok=True)
+
+    with trace.span("xtb_opt", structure=outdir.name, threads=threads):
+        run_xtb_opt(xyz, outdir, nprocs=threads, env=env)
+
+    if not xyz_opt.exists():
+        print(f"  ⚠ No se encontró xtbopt.xyz en {outdir}, se omite.")
+        return False
+
+    with trace.span("xtb_sp", structure=outdir.name, threads=threads) as span:
+        run_xtb_sp(xyz_opt, outdir, nprocs=threads, env=env)
+        if trace.is_enabled():
+            with open(xyz_opt, "r", encoding="utf-8", errors="ignore") as f:
+                natoms = int(f.readline().split()[0])
+            span.set(natoms=natoms, scf_iterations=parse_xtb_output(outdir / "xtb_sp.out").scf_iterations)
+    return True
+
+
+def run_xtb_batch(tasks, total_cores: int | None = None, threads_per_job: int = 1):
+    """
+    Ejecuta varias estructuras a la vez sin pasar de `total_cores`.
+    `tasks` es una lista de (xyz, outdir). Va devolviendo (xyz, outdir, ok)
+    según terminan, no en el orden de entrada. Una estructura que falla (xtb
+    no está en el PATH, error de E/S...) se informa y sale con ok=False, sin
+    cortar el resto del lote.
+    """
+    jobs, threads = split_cores(total_cores, threads_per_job)
+    print(f"  Scheduler xtb: {jobs} jobs x {threads} hilos")
+
+    # Hilos y no procesos: cada job solo espera a su subproceso xtb
+    with ThreadPoolExecutor(max_workers=jobs) as pool:
+        futures = {
+            pool.submit(run_xtb_structure, xyz, outdir, threads): (xyz, outdir)
+            for xyz, outdir in tasks
+        }
+        for future in as_completed(futures):
+            xyz, outdir = futures[future]
+            try:
+                ok = future.result()
+            except Exception as e:
+                print(f"  ⚠ {outdir.name}: falló xtb ({type(e).__name__}: {e})")
+                ok = False
+            yield xyz, outdir, ok
 
 
 def extract_levels_from_output(filepath: Path):
     """
     Extrae HOMO, LUMO y GAP (eV) desde un output de xTB.
-    Usa:
-      - línea 'HOMO-LUMO GAP'
-      - tabla de MO para HOMO/LUMO si hace falta.
-    """
-    homo = None
-    lumo = None
-    gap = None
-    mos = []
-
-    mo_line = re.compile(
-        r"^\s*\d+\s+([0-9.]+)\s+(-?\d+\.\d+)\s+(-?\d+\.\d+)"
-    )
-
-    with open(filepath, "r", encoding="utf-8", errors="ignore") as f:
-        for line in f:
-            up = line.upper()
-
-            # GAP
-            if "HOMO-LUMO GAP" in up:
-                parts = line.split()
-                for i, p in enumerate(parts):
-                    if "EV" in p.upper() and i > 0:
-                        try:
-                            gap = float(parts[i-1])
-                        except ValueError:
-                            pass
-
-            # Tabla de MO
-            m = mo_line.match(line)
-            if m:
-                try:
-                    occ = float(m.group(1))
-                    e_ev = float(m.group(3))
-                    mos.append((occ, e_ev))
-                except ValueError:
-                    pass
-
-    if mos:
-        mos_sorted = sorted(mos, key=lambda x: x[1])
-        occupied = [e for occ, e in mos_sorted if occ > 1e-3]
-        virtual  = [e for occ, e in mos_sorted if occ < 1e-3]
-
-        homo_calc = max(occupied) if occupied else None
-        lumo_calc = None
-        if homo_calc is not None and virtual:
-            for e in virtual:
-                if e > homo_calc:
-                    lumo_calc = e
-                    break
-            if lumo_calc is None:
-                lumo_calc = min(virtual)
-
-        if homo is None:
-            homo = homo_calc
-        if lumo is None:
-            lumo = lumo_calc
-        if gap is None and homo is not None and lumo is not None:
-            gap = lumo - homo
-
-    return homo, lumo, gap
+    Ver parse_xtb_output para el registro completo (energía, ciclos SCF...).
+    """
+    levels = parse_xtb_output(filepath)
+    return levels.homo, levels.lumo, levels.gap
 
 
 def extract_levels_from_dir(outdir: Path):
@@ -96,12 +148,7 @@ def extract_levels_from_dir(outdir: Path):
     Busca xtb_sp.out / xtb_opt.out / xtbopt.log dentro de un directorio
     y llama a extract_levels_from_output.
     """
-    candidates = [
-        outdir / "xtb_sp.out",
-        outdir / "xtb_opt.out",
-        outdir / "xtbopt.log",
-    ]
-    filepath = next((c for c in candidates if c.exists()), None)
+    filepath = find_output(outdir)
     if filepath is None:
         print(f"  ⚠ No se encontró ningún output en {outdir}")
         return None, None, None
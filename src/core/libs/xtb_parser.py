@@ -0,0 +1,135 @@
+# libs/xtb_parser.py
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import NamedTuple
+import mmap
+import re
+
+# orden de preferencia de outputs dentro de una carpeta de resultados
+OUTPUT_CANDIDATES = ("xtb_sp.out", "xtb_opt.out", "xtbopt.log")
+
+_ORBITALS = b"* Orbital Energies and Occupations"
+_ORBITALS_END = b"HL-Gap"
+_GAP = re.compile(rb"HOMO-LUMO GAP\s+(-?\d+\.\d+)\s+eV")
+_TOTAL_ENERGY = re.compile(rb"TOTAL ENERGY\s+(-?\d+\.\d+)\s+Eh")
+_SCF_DONE = re.compile(rb"convergence criteria satisfied after\s+(\d+)\s+iterations")
+_SCF_FAILED = re.compile(rb"convergence criteria cannot be satisfied within\s+(\d+)\s+iterations")
+
+
+class XtbLevels(NamedTuple):
+    homo: float | None = None
+    lumo: float | None = None
+    gap: float | None = None
+    total_energy: float | None = None
+    scf_iterations: int | None = None
+    converged: bool | None = None
+
+
+def _last_match(buf, pattern: re.Pattern, marker: bytes):
+    # rfind del marcador literal (rápido) y regex solo sobre esa línea
+    pos = buf.rfind(marker)
+    if pos < 0:
+        return None
+    end = buf.find(b"\n", pos)
+    return pattern.search(buf[pos:end if end >= 0 else len(buf)])
+
+
+def _orbital_levels(buf):
+    """
+    HOMO y LUMO (eV) del último bloque de orbitales del output.
+    """
+    start = buf.rfind(_ORBITALS)
+    if start < 0:
+        return None, None
+    end = buf.find(_ORBITALS_END, start)
+    block = buf[start:end if end >= 0 else len(buf)].decode("ascii", errors="ignore")
+
+    homo = lumo = None
+    occupied, virtual = [], []
+    for line in block.splitlines():
+        parts = line.split()
+        if not parts or not parts[0].isdigit():
+            continue
+        try:
+            # xtb marca las filas frontera con (HOMO)/(LUMO)
+            if parts[-1] == "(HOMO)":
+                homo = float(parts[-2])
+            elif parts[-1] == "(LUMO)":
+                lumo = float(parts[-2])
+            elif len(parts) == 4:
+                (occupied if float(parts[1]) > 1e-3 else virtual).append(float(parts[3]))
+            elif len(parts) == 3:
+                virtual.append(float(parts[2]))
+        except ValueError:
+            continue
+
+    # sin marcadores (ocupaciones fraccionarias): se deduce de las ocupaciones
+    if homo is None and occupied:
+        homo = max(occupied)
+    if lumo is None and homo is not None:
+        above = [e for e in virtual if e > homo]
+        lumo = min(above) if above else (min(virtual) if virtual else None)
+    return homo, lumo
+
+
+def parse_xtb_output(filepath: Path) -> XtbLevels:
+    """
+    Lee un output de xTB saltando directamente a las secciones finales
+    (último bloque de orbitales, última línea 'HOMO-LUMO GAP', ...), sin
+    recorrer línea a línea los ciclos de optimización.
+    """
+    with open(filepath, "rb") as f:
+        if f.seek(0, 2) == 0:
+            return XtbLevels()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+            homo, lumo = _orbital_levels(buf)
+
+            m = _last_match(buf, _GAP, b"HOMO-LUMO GAP")
+            gap = float(m.group(1)) if m else None
+            if gap is None and homo is not None and lumo is not None:
+                gap = lumo - homo
+
+            m = _last_match(buf, _TOTAL_ENERGY, b"TOTAL ENERGY")
+            total_energy = float(m.group(1)) if m else None
+
+            scf_iterations = converged = None
+            m = _last_match(buf, _SCF_DONE, b"convergence criteria satisfied after")
+            if m:
+                scf_iterations, converged = int(m.group(1)), True
+            else:
+                m = _last_match(buf, _SCF_FAILED, b"convergence criteria cannot be satisfied")
+                if m:
+                    scf_iterations, converged = int(m.group(1)), False
+
+    return XtbLevels(homo, lumo, gap, total_energy, scf_iterations, converged)
+
+
+def find_output(outdir: Path) -> Path | None:
+    """
+    Primer output disponible de OUTPUT_CANDIDATES dentro de `outdir`.
+    """
+    return next((outdir / c for c in OUTPUT_CANDIDATES if (outdir / c).exists()), None)
+
+
+def _parse_dir(outdir: Path):
+    filepath = find_output(outdir)
+    return outdir.name, (parse_xtb_output(filepath) if filepath else None)
+
+
+def iter_results_tree(results_dir: Path, workers: int | None = None):
+    """
+    Parsea en paralelo todas las subcarpetas de `results_dir` y va
+    devolviendo (nombre_carpeta, XtbLevels | None) en orden alfabético;
+    None si la carpeta no tiene output.
+    """
+    # los almacenes columnares (*.store) también viven en results/
+    subdirs = sorted(d for d in results_dir.iterdir() if d.is_dir() and d.suffix != ".store")
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        yield from pool.map(_parse_dir, subdirs, chunksize=32)
+
+
+def parse_results_tree(results_dir: Path, workers: int | None = None) -> dict:
+    """
+    Como iter_results_tree, pero devuelve {nombre_carpeta: XtbLevels | None}.
+    """
+    return dict(iter_results_tree(results_dir, workers))
@@ -0,0 +1,205 @@
+import hashlib
+import os
+import sqlite3
+import time
+from pathlib import Path
+
+import numpy as np
+
+# The O(n_orbitals^2) Result properties worth keeping for later analysis, plus
+# the SCF orbital energies (Hartree) to compare their spectrum with
+MATRIX_PROPERTIES = ('hamiltonian-matrix', 'overlap-matrix', 'orbital-coefficients', 'density-matrix',
+                     'orbital-energies')
+
+
+class MatrixStore:
+    """
+    On-disk store of large per-structure arrays (Hamiltonian, overlap,
+    coefficients, density matrix...).
+
+    Each array is a plain .npy file, <directory>/<structure>/<property>.npy,
+    and an SQLite catalog records its shape, dtype and size. Readers get the
+    arrays back memory-mapped (read-only, zero-copy), so scanning hundreds of
+    large matrices only pages in the parts actually touched.
+
+    Structures are named by entry_name, so the same file stem in two folders
+    or zips, or the same file run with two methods, never share an entry;
+    describe() records where each one came from and the hash of the input it
+    was computed for.
+    """
+
+    def __init__(self, directory: Path):
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        # Several pool workers write to the same catalog
+        self.db = sqlite3.connect(self.directory / "catalog.sqlite", timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS matrices ("
+            " structure TEXT NOT NULL,"
+            " property TEXT NOT NULL,"
+            " shape TEXT NOT NULL,"
+            " dtype TEXT NOT NULL,"
+            " nbytes INTEGER NOT NULL,"
+            " created REAL NOT NULL,"
+            " PRIMARY KEY (structure, property))"
+        )
+        self.db.execute("CREATE INDEX IF NOT EXISTS matrices_property ON matrices (property)")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS sources ("
+            " structure TEXT PRIMARY KEY,"
+            " source TEXT NOT NULL,"
+            " method TEXT NOT NULL,"
+            " content TEXT)"
+        )
+        self.db.commit()
+
+    def path(self, structure: str, prop: str) -> Path:
+        return self.directory / structure / f"{prop}.npy"
+
+    def put(self, structure: str, arrays: dict) -> None:
+        """
+        Stores {property: array} for `structure`, replacing earlier arrays
+        of the same properties.
+        """
+        (self.directory / structure).mkdir(exist_ok=True)
+        rows = []
+        for prop, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            # Write under a temporary name so readers never map half a file
+            path = self.path(structure, prop)
+            tmp = path.with_name(f"{prop}.{os.getpid()}.tmp.npy")
+            np.save(tmp, array)
+            os.replace(tmp, path)
+            rows.append((structure, prop, ",".join(map(str, array.shape)), array.dtype.str,
+                         array.nbytes, time.time()))
+
+        self.db.executemany(
+            "INSERT OR REPLACE INTO matrices (structure, property, shape, dtype, nbytes, created)"
+            " VALUES (?, ?, ?, ?, ?, ?)", rows)
+        self.db.commit()
+
+    def get(self, structure: str, prop: str) -> np.memmap:
+        """
+        Read-only memory map of one stored array; KeyError if there is none.
+        """
+        path = self.path(structure, prop)
+        if not path.exists():
+            raise KeyError((structure, prop))
+        return np.load(path, mmap_mode="r")
+
+    def load(self, structure: str) -> dict:
+        """
+        {property: memory map} of every array stored for `structure`.
+        """
+        rows = self.db.execute("SELECT property FROM matrices WHERE structure = ?", (structure,))
+        return {prop: self.get(structure, prop) for (prop,) in rows.fetchall()}
+
+    def describe(self, structure: str, source: str, method: str, content: str | None = None) -> None:
+        """
+        Records the source (path or archive!member), method tag and input
+        hash (`content`, e.g. the ResultCache key) the arrays of `structure`
+        were computed from.
+        """
+        self.db.execute("INSERT OR REPLACE INTO sources (structure, source, method, content) VALUES (?, ?, ?, ?)",
+                        (structure, source, method, content))
+        self.db.commit()
+
+    def origin(self, structure: str) -> dict | None:
+        """
+        {source, method, content} recorded by describe(), or None.
+        """
+        row = self.db.execute("SELECT source, method, content FROM sources WHERE structure = ?",
+                              (structure,)).fetchone()
+        return None if row is None else dict(zip(("source", "method", "content"), row))
+
+    def has(self, structure: str, properties=MATRIX_PROPERTIES, content: str | None = None) -> bool:
+        """
+        True if every one of `properties` is stored for `structure` (and,
+        with `content`, they were computed for that input hash).
+        """
+        if content is not None and (self.origin(structure) or {}).get("content") != content:
+            return False
+        properties = tuple(properties)
+        count = self.db.execute(
+            f"SELECT COUNT(*) FROM matrices WHERE structure = ? AND property IN"
+            f" ({', '.join('?' * len(properties))})", (structure, *properties)).fetchone()[0]
+        return count == len(properties)
+
+    def entries(self, structure: str | None = None, prop: str | None = None) -> list:
+        """
+        Catalog rows (dicts with structure, property, shape, dtype, nbytes,
+        created) matching the given structure and/or property.
+        """
+        where, params = [], []
+        if structure is not None:
+            where.append("structure = ?")
+            params.append(structure)
+        if prop is not None:
+            where.append("property = ?")
+            params.append(prop)
+        sql = "SELECT structure, property, shape, dtype, nbytes, created FROM matrices"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        rows = self.db.execute(sql + " ORDER BY structure, property", params).fetchall()
+        return [
+            {"structure": s, "property": p, "shape": tuple(int(n) for n in shape.split(",") if n),
+             "dtype": np.dtype(dtype), "nbytes": nbytes, "created": created}
+            for s, p, shape, dtype, nbytes, created in rows
+        ]
+
+    def structures(self, prop: str | None = None) -> list:
+        """
+        Names of the stored structures (only those that have `prop`, if given).
+        """
+        return sorted({e["structure"] for e in self.entries(prop=prop)})
+
+    def delete(self, structure: str) -> None:
+        for entry in self.entries(structure):
+            self.path(structure, entry["property"]).unlink(missing_ok=True)
+        self.db.execute("DELETE FROM matrices WHERE structure = ?", (structure,))
+        self.db.execute("DELETE FROM sources WHERE structure = ?", (structure,))
+        self.db.commit()
+
+    def close(self) -> None:
+        self.db.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def source_id(source) -> str:
+    """
+    Identity of a structure file: its absolute path, or archive!member for
+    a ZipMember.
+    """
+    archive = getattr(source, "archive", None)
+    if archive is not None:
+        return f"{Path(archive).resolve()}!{source.member}"
+    return str(Path(source).resolve())
+
+
+def entry_name(source, method: str) -> str:
+    """
+    Store name for the arrays of `source` computed with `method`: the file
+    stem, readable, plus a short hash of the source identity and method.
+    """
+    digest = hashlib.sha256(f"{source_id(source)}|{method}".encode()).hexdigest()[:10]
+    return f"{source.stem}-{digest}"
+
+
+_open_stores: dict[Path, MatrixStore] = {}
+
+
+def open_matrix_store(directory: Path) -> MatrixStore:
+    """
+    Returns this process's MatrixStore for `directory`, opening it on first use.
+    """
+    directory = Path(directory)
+    if directory not in _open_stores:
+        _open_stores[directory] = MatrixStore(directory)
+    return _open_stores[directory]
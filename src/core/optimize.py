@@ -0,0 +1,130 @@
+from typing import NamedTuple
+
+import numpy as np
+
+# xtb's --opt levels: (energy change in Eh, gradient norm in Eh/Bohr)
+OPT_LEVELS = {
+    "crude": (5e-4, 1e-2),
+    "sloppy": (1e-4, 6e-3),
+    "loose": (5e-5, 4e-3),
+    "lax": (2e-5, 2e-3),
+    "normal": (5e-6, 1e-3),
+    "tight": (1e-6, 8e-4),
+    "vtight": (1e-7, 2e-4),
+    "extreme": (5e-8, 5e-5),
+}
+
+
+class OptimizationResult(NamedTuple):
+    positions: np.ndarray  # (natoms, 3) Bohr
+    result: object         # tblite Result at the final geometry
+    energy: float
+    gradient_norm: float
+    steps: int
+    converged: bool
+
+
+def _lbfgs_direction(gradient, history):
+    """
+    Two-loop recursion: approximates -H^-1 g from the stored (s, y) pairs.
+    """
+    q = gradient.copy()
+    alphas = []
+    for s, y, rho in reversed(history):
+        alpha = rho * np.dot(s, q)
+        q -= alpha * y
+        alphas.append(alpha)
+
+    if history:
+        s, y, _ = history[-1]
+        q *= np.dot(s, y) / np.dot(y, y)
+    else:
+        # No curvature yet: a conservative steepest-descent step
+        q *= 0.01
+
+    for (s, y, rho), alpha in zip(history, reversed(alphas)):
+        beta = rho * np.dot(y, q)
+        q += (alpha - beta) * s
+    return -q
+
+
+def optimize_geometry(calc, positions, level: str = "normal", max_steps: int | None = None,
+                      memory: int = 20, max_step: float = 0.5) -> OptimizationResult:
+    """
+    L-BFGS geometry optimization driven by an existing tblite Calculator.
+
+    Every step updates the calculator in place (`calc.update(positions=...)`)
+    and restarts the SCF from the previous wavefunction. Converged when both
+    the energy change and the gradient norm are below the thresholds of the
+    xtb optimization `level`. `max_step` caps any atom's displacement (Bohr).
+    Only steps that lower the energy are taken, so the returned geometry and
+    Result are never worse than the starting ones.
+    """
+    econv, gconv = OPT_LEVELS[level]
+    x = np.asarray(positions, dtype=float).copy()
+    natoms = len(x)
+    if max_steps is None:
+        max_steps = max(200, 3 * natoms)
+
+    def evaluate(coords, guess):
+        calc.update(positions=coords.reshape(natoms, 3))
+        res = calc.singlepoint(guess)
+        return res, res.get("energy"), res.get("gradient").ravel()
+
+    x = x.ravel()
+    res, energy, gradient = evaluate(x, None)
+    history = []
+    converged = False
+
+    def capped(direction):
+        longest = np.linalg.norm(direction.reshape(natoms, 3), axis=1).max()
+        return direction * (max_step / longest) if longest > max_step else direction
+
+    def line_search(direction):
+        # Backtracking on the energy (Armijo condition). Returns the accepted
+        # (x, result, energy, gradient), or None if no step lowered the energy
+        slope = np.dot(gradient, direction)
+        alpha = 1.0
+        for _ in range(6):
+            x_new = x + alpha * direction
+            res_new, energy_new, gradient_new = evaluate(x_new, res)
+            if energy_new <= energy + 1e-4 * alpha * slope:
+                return x_new, res_new, energy_new, gradient_new
+            alpha *= 0.5
+        return None
+
+    step = 0
+    for step in range(1, max_steps + 1):
+        direction = _lbfgs_direction(gradient, history)
+        if np.dot(gradient, direction) >= 0:
+            # Not a descent direction: drop the curvature information
+            history.clear()
+            direction = -0.01 * gradient
+
+        accepted = line_search(capped(direction))
+        if accepted is None and history:
+            # The L-BFGS step only went uphill: forget the curvature and
+            # retry along the gradient with a small step
+            history.clear()
+            accepted = line_search(capped(-0.01 * gradient))
+        if accepted is None:
+            # Not even a small steepest-descent step lowers the energy: the
+            # geometry is as converged as the SCF noise allows
+            converged = bool(np.linalg.norm(gradient) < gconv)
+            break
+        x_new, res, energy_new, gradient_new = accepted
+
+        s, y = x_new - x, gradient_new - gradient
+        sy = np.dot(s, y)
+        if sy > 1e-10:
+            history.append((s, y, 1.0 / sy))
+            del history[:-memory]
+
+        delta_e = abs(energy_new - energy)
+        x, energy, gradient = x_new, energy_new, gradient_new
+        if delta_e < econv and np.linalg.norm(gradient) < gconv:
+            converged = True
+            break
+
+    return OptimizationResult(x.reshape(natoms, 3), res, energy,
+                              float(np.linalg.norm(gradient)), step, converged)
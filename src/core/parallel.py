@@ -0,0 +1,120 @@
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+# Variables read by the OpenMP/BLAS runtimes linked into tblite
+THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+
+def default_workers() -> int:
+    """
+    Number of worker processes to use when none is requested.
+    """
+    return os.cpu_count() or 1
+
+
+def _init_worker(threads: int) -> None:
+    # Runs in the child before any task: pin the numerical thread pools so
+    # N workers x T threads never exceeds the cores we were given.
+    for var in THREAD_ENV_VARS:
+        os.environ[var] = str(threads)
+
+
+def make_executor(max_workers: int | None = None, threads_per_worker: int = 1) -> ProcessPoolExecutor:
+    """
+    Creates a process pool for tblite calculations.
+
+    Uses the 'spawn' start method so workers never inherit the Qt state of the
+    GUI process, and pins each worker to `threads_per_worker` OpenMP threads.
+    """
+    workers = max(1, max_workers or default_workers())
+    return ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        initializer=_init_worker,
+        initargs=(threads_per_worker,),
+    )
+
+
+def terminate_executor(pool: ProcessPoolExecutor) -> None:
+    """
+    Stops a pool right away: queued tasks are cancelled and workers still in
+    the middle of a calculation are killed instead of being waited for.
+    """
+    if hasattr(pool, "terminate_workers"):
+        # Python 3.14+
+        pool.terminate_workers()
+        return
+    # Private before 3.14 and may be missing or None: then the running
+    # tasks are left to finish after the queue is cancelled
+    processes = list((getattr(pool, "_processes", None) or {}).values())
+    pool.shutdown(wait=False, cancel_futures=True)
+    for process in processes:
+        process.terminate()
+
+
+def reset_peak_rss() -> bool:
+    """
+    Resets the peak resident memory of this process (Linux: writing 5 to
+    /proc/self/clear_refs resets VmHWM), so peak_rss() measures from here
+    on. Returns False where that isn't possible; peak_rss() then keeps
+    reporting the peak of the whole process lifetime.
+    """
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss() -> int | None:
+    """
+    Peak resident memory of this process in bytes (since the last
+    reset_peak_rss where supported), or None if the platform can't tell.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kB on Linux, bytes on macOS
+    return peak if sys.platform == "darwin" else peak * 1024
+
+
+def available_memory() -> int | None:
+    """
+    Memory (bytes) that new processes can use without swapping.
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def suggest_workers(peak_bytes: int | None, memory: int | None = None,
+                    fraction: float = 0.8) -> int:
+    """
+    Worker count that fits in `fraction` of `memory` (default: the memory
+    available now) when every worker peaks at `peak_bytes`, capped by the
+    number of cores.
+    """
+    memory = available_memory() if memory is None else memory
+    if not peak_bytes or not memory:
+        return default_workers()
+    return max(1, min(default_workers(), int(memory * fraction // peak_bytes)))
@@ -1,17 +1,394 @@
+from collections import OrderedDict
 from pathlib import Path
-import qcelemental as qcel
-import tblite.interface as tb
-import io
-import contextlib
-
-def process_file(file: Path):
-    molecule = qcel.models.Molecule.from_file(str(file))
-
-    xtb = tb.Calculator(method="GFN2-xTB", numbers=molecule.atomic_numbers, positions=molecule.geometry)
-
-    # Capture stdout so it doesnt show on the console
-    f = io.StringIO()
-    with contextlib.redirect_stdout(f):
-        result = xtb.singlepoint()
-        
-    return result
+import re
+import time
+
+import numpy as np
+
+from src.core.cache import open_cache
+from src.core.dos import mulliken_weights
+from src.core.matrices import MATRIX_PROPERTIES, entry_name, open_matrix_store, source_id
+from src.core.libs.ingest import ZipMember
+from src.core.libs import trace
+from src.core.optimize import optimize_geometry
+from src.core.parallel import peak_rss, reset_peak_rss
+from src.core.transport import compute_transport, orbital_atoms
+from src.core.xyz import read_structure
+
+METHOD = "GFN2-xTB"
+# Bump when the fields of the evaluate_file record change, so cached
+# records with the old layout are not served
+RECORD_VERSION = 4
+
+HARTREE_TO_EV = 27.211386245988
+AU_TO_DEBYE = 2.541746473
+
+# HOMO-LUMO gap limits (eV) for the verdict column
+CONDUCTIVE_GAP = 0.5
+SEMICONDUCTING_GAP = 3.0
+
+# Rows of tblite's SCF table: "  cycle  total energy  energy error  density error"
+_SCF_CYCLE = re.compile(r"^\s*\d+\s+-?\d+\.\d+")
+
+# Last converged result per structure family, reused as the next initial guess.
+# Lives per process: a Result can't be sent between pool workers. Families run
+# back to back (evaluate_family, warm_start_order), so only the current one's
+# result is kept: a whole Result, integrals included, can't be trimmed.
+_warm_results: OrderedDict = OrderedDict()
+WARM_START_SLOTS = 1
+
+# Result properties summarize_result reads
+SUMMARY_PROPERTIES = ('energy', 'gradient', 'orbital-energies', 'orbital-occupations',
+                      'dipole', 'charges')
+# Only kept by tblite when the calculator has "save-integrals" set
+INTEGRAL_PROPERTIES = ('hamiltonian-matrix', 'overlap-matrix')
+
+
+def new_calculator(numbers, positions, verbosity: int = 1, save_integrals: bool = False):
+    """
+    Returns (calculator, log). The library output goes to the `log` list
+    instead of the console; count_scf_cycles(log) reads the SCF table in it.
+    Verbosity 1 is the lowest level that still prints that table; 0 silences
+    the library completely. `save_integrals` keeps the Hamiltonian and
+    overlap matrices in the Result.
+    """
+    # Imported lazily: pool workers must set their thread limits before
+    # tblite's OpenMP runtime is loaded
+    import tblite.interface as tb
+
+    log = []
+    xtb = tb.Calculator(method=METHOD, numbers=numbers, positions=positions, logger=log.append)
+    xtb.set("verbosity", verbosity)
+    if save_integrals:
+        xtb.set("save-integrals", 1)
+    return xtb, log
+
+
+def count_scf_cycles(log: list) -> int:
+    return sum(1 for line in log if _SCF_CYCLE.match(line))
+
+
+def run_singlepoint(numbers, positions, guess=None, save_integrals: bool = False):
+    """
+    Returns (result, scf_iterations). `guess` is a previous tblite Result
+    whose wavefunction is used as the starting point of the SCF.
+    """
+    xtb, log = new_calculator(numbers, positions, save_integrals=save_integrals)
+    result = xtb.singlepoint(guess)
+
+    return result, count_scf_cycles(log)
+
+
+def run_optimization(numbers, positions, level: str = "normal", save_integrals: bool = False):
+    """
+    Optimizes the geometry in-process (see optimize_geometry).
+    Returns (OptimizationResult, scf_iterations over all steps).
+    """
+    xtb, log = new_calculator(numbers, positions, save_integrals=save_integrals)
+    opt = optimize_geometry(xtb, positions, level=level)
+
+    return opt, count_scf_cycles(log)
+
+
+def fetch_properties(result, properties) -> dict:
+    """
+    Copies the requested properties out of a tblite Result into plain
+    arrays, so the Result (and its O(n_orbitals^2) matrices) can be freed.
+    """
+    return {name: result.get(name) for name in properties}
+
+
+def frontier_levels(result):
+    """
+    (HOMO, LUMO, gap) in eV from the orbital energies and occupations of a
+    tblite Result (or a fetch_properties dict); the HOMO is the highest
+    orbital the electron count fills.
+    """
+    energies = result.get('orbital-energies') * HARTREE_TO_EV
+    occupations = result.get('orbital-occupations')
+    if occupations.ndim > 1:
+        # spin-polarized: both channels together
+        occupations = occupations.sum(axis=0)
+
+    electrons = int(round(occupations.sum()))
+    homo_index = (electrons + 1) // 2 - 1
+    if homo_index < 0 or homo_index + 1 >= len(energies):
+        return None, None, None
+
+    homo, lumo = float(energies[homo_index]), float(energies[homo_index + 1])
+    return homo, lumo, lumo - homo
+
+
+def classify_gap(gap: float | None) -> str:
+    if gap is None:
+        return "Unknown"
+    if gap < CONDUCTIVE_GAP:
+        return "Conductive"
+    if gap < SEMICONDUCTING_GAP:
+        return "Semiconducting"
+    return "Insulating"
+
+
+def summarize_result(res) -> dict:
+    """
+    Compact, picklable record of a tblite Result (or a dict with at least
+    SUMMARY_PROPERTIES): energies in Hartree, orbital levels in eV, dipole
+    moment in Debye, charges in e.
+    """
+    homo, lumo, gap = frontier_levels(res)
+    return {
+        'energy': float(res.get('energy')),
+        'gradient_norm': float(np.linalg.norm(res.get('gradient'))),
+        'homo': homo,
+        'lumo': lumo,
+        'gap': gap,
+        'dipole': float(np.linalg.norm(res.get('dipole')) * AU_TO_DEBYE),
+        'charges': res.get('charges'),
+        'verdict': classify_gap(gap),
+    }
+
+
+def _family_key(numbers) -> bytes:
+    return np.asarray(numbers, dtype=np.int64).tobytes()
+
+
+def warm_start_singlepoint(numbers, positions, save_integrals: bool = False, measure: bool = False):
+    """
+    Singlepoint that starts from the last result of the same family (same
+    atoms in the same order, i.e. only the geometry differs: a flake and its
+    optimized geometry, or the same flake from two dataset versions)
+    computed in this process, if there is one.
+
+    Returns (result, scf_iterations, guessed, iterations_saved). Savings are
+    only known with `measure`, which also runs this structure's own cold
+    start to compare against (None otherwise; 0 for cold starts).
+
+    Only identical compositions are chained: on the dataset flakes a guess
+    from another dopant or dopant count with the same atom and orbital
+    counts took more cycles than a fresh start (85 vs 67 over five 1 nm
+    pairs, 117 vs 96 over six 1.5 nm pairs), while a same-composition guess
+    cut 12 -> 8 and 25 -> 10.
+    """
+    key = _family_key(numbers)
+    previous = _warm_results.pop(key, None)
+    # Other families are done: free their results before this SCF
+    while len(_warm_results) >= WARM_START_SLOTS:
+        _warm_results.popitem(last=False)
+
+    result = None
+    if previous is not None:
+        try:
+            result, iterations = run_singlepoint(numbers, positions, guess=previous,
+                                                 save_integrals=save_integrals)
+        except Exception:
+            # Incompatible guess: fall back to a normal start
+            result = None
+
+    if result is None:
+        result, iterations = run_singlepoint(numbers, positions, save_integrals=save_integrals)
+        guessed, saved = False, 0
+    else:
+        guessed = True
+        saved = run_singlepoint(numbers, positions)[1] - iterations if measure else None
+
+    _warm_results[key] = result
+    return result, iterations, guessed, saved
+
+
+def clear_warm_starts() -> None:
+    """
+    Frees the results kept for warm starts in this process.
+    """
+    _warm_results.clear()
+
+
+def warm_start_families(files: list) -> list:
+    """
+    Positions of `files` grouped into warm-start families (see
+    warm_start_singlepoint), in order of first appearance. A family has to
+    run in one process, one structure after another, to reuse its results.
+    """
+    families = {}
+    for i, file in enumerate(files):
+        families.setdefault(_family_key(read_structure(file).numbers), []).append(i)
+    return list(families.values())
+
+
+def warm_start_order(files: list) -> list:
+    """
+    Sorts structures so the members of each warm-start family run back to back.
+    """
+    return [files[i] for family in warm_start_families(files) for i in family]
+
+
+def evaluate_family(files: list, **options) -> list:
+    """
+    evaluate_file over `files` in this process, in order, so that with
+    `warm_start` each structure can start from the previous one's result
+    (pool workers don't share them). Returns one (record, None) or
+    (None, exception) per file. The family's last result is freed at the
+    end, so an idle worker holds no Result.
+    """
+    outcomes = []
+    try:
+        for file in files:
+            try:
+                outcomes.append((evaluate_file(file, **options), None))
+            except Exception as e:
+                outcomes.append((None, e))
+    finally:
+        clear_warm_starts()
+    return outcomes
+
+
+def evaluate_file(file: Path | ZipMember, cache_dir: Path | None = None, warm_start: bool = False,
+                  optimize: str | None = None, matrix_dir: Path | None = None,
+                  transport: bool = False, dos: bool = False, measure_warm_start: bool = False,
+                  properties=SUMMARY_PROPERTIES) -> dict:
+    """
+    Runs the singlepoint for `file` and returns only plain, picklable values,
+    so it can be executed inside a worker process.
+
+    Only the Result `properties` (see the README for the names) are copied
+    out before the Result is released: the summary record always needs
+    SUMMARY_PROPERTIES, and any other property asked for is added to the
+    record under its own name (e.g. 'bond-orders'; INTEGRAL_PROPERTIES turn
+    on save-integrals).
+
+    With `cache_dir`, results are looked up in (and stored to) the persistent
+    ResultCache there; the 'cached' entry tells whether it was a hit.
+    With `warm_start`, the SCF starts from a related structure's wavefunction
+    (see warm_start_singlepoint): 'scf_guess' tells whether one was found,
+    and 'scf_saved' holds the iterations saved when `measure_warm_start`
+    pays for the cold start to compare with (None otherwise).
+    With `optimize` (an xtb level such as "normal"), the geometry is optimized
+    first and the record describes the optimized structure.
+    With `matrix_dir`, the MATRIX_PROPERTIES of the result are saved to the
+    MatrixStore there under matrices.entry_name (the file's stem plus a hash
+    of its path or archive member and of the method options), and a cached
+    record is only reused if that entry holds matrices of the same input.
+    With `transport`, the record also has the NEGF transmission around the
+    mid-gap of the exported Hamiltonian ('transmission' over
+    'transmission_energies', eV, centred on 'transmission_fermi') and the
+    Landauer conductance ('conductance', S), with leads on both ends of the
+    structure (see transport.compute_transport).
+    With `dos`, it has the orbital energies ('orbital_energies', eV) and
+    their Mulliken split over carbon / dopant / hydrogen ('pdos_weights',
+    see dos.mulliken_weights), the inputs of dos.compute_dos.
+
+    The record also has the wall time spent on the structure ('duration', in
+    seconds), the peak memory of the process while computing it ('peak_rss',
+    in bytes, see parallel.peak_rss) and, when tracing is enabled, the
+    worker's trace events ('trace').
+    """
+    start = time.perf_counter()
+    reset_peak_rss()
+    with trace.span("evaluate_file", file=file.name) as span:
+        result_data = _evaluate(file, span, cache_dir, warm_start, optimize, matrix_dir, transport, dos,
+                                measure_warm_start, properties)
+    result_data['duration'] = time.perf_counter() - start
+    result_data['peak_rss'] = peak_rss()
+    if trace.is_enabled():
+        result_data['trace'] = trace.drain()
+    return result_data
+
+
+def _evaluate(file, span, cache_dir, warm_start, optimize, matrix_dir, transport, dos,
+              measure_warm_start, properties) -> dict:
+    with trace.span("read_xyz"):
+        structure = read_structure(file)
+    numbers, positions = structure.numbers, structure.positions
+    span.set(natoms=len(numbers))
+    matrices = open_matrix_store(matrix_dir) if matrix_dir is not None else None
+    extra = [p for p in dict.fromkeys(properties) if p not in SUMMARY_PROPERTIES]
+    save_integrals = (matrices is not None or transport or dos
+                      or any(p in INTEGRAL_PROPERTIES for p in extra))
+
+    method = f"{METHOD}/r{RECORD_VERSION}"
+    if optimize is not None:
+        method += f"/opt-{optimize}"
+    if transport:
+        method += "/negf"
+    if dos:
+        method += "/dos"
+    entry = entry_name(file, method) if matrices is not None else None
+    if extra:
+        # Extra properties change the record, not the matrices
+        method += "/" + "+".join(extra)
+
+    cache = key = None
+    if cache_dir is not None:
+        cache = open_cache(cache_dir)
+        # XYZ input: neutral, lowest spin for the electron count
+        key = cache.key(numbers, positions, method=method,
+                        charge=0, uhf=int(numbers.sum()) % 2)
+        with trace.span("cache_lookup"):
+            cached = cache.get(key)
+        if cached is not None and (matrices is None or matrices.has(entry, content=key)):
+            cached['cached'] = True
+            span.set(cached=True)
+            return cached
+
+    opt = None
+    if optimize is not None:
+        with trace.span("optimize", level=optimize) as stage:
+            # Each optimization step already restarts from the previous one
+            (opt, iterations), guessed, saved = run_optimization(numbers, positions, optimize,
+                                                                 save_integrals=save_integrals), False, 0
+            stage.set(steps=opt.steps)
+        res = opt.result
+    elif warm_start:
+        with trace.span("scf", warm_start=True):
+            res, iterations, guessed, saved = warm_start_singlepoint(
+                numbers, positions, save_integrals=save_integrals, measure=measure_warm_start)
+    else:
+        with trace.span("scf"):
+            (res, iterations), guessed, saved = run_singlepoint(numbers, positions,
+                                                                save_integrals=save_integrals), False, 0
+    span.set(scf_iterations=iterations)
+    fetched = fetch_properties(res, (*SUMMARY_PROPERTIES, *extra))
+    result_data = summarize_result(fetched)
+    result_data.update((name, fetched[name]) for name in extra)
+    del fetched
+    if opt is not None:
+        result_data['positions'] = opt.positions
+        result_data['opt_steps'] = opt.steps
+        result_data['opt_converged'] = opt.converged
+    if transport or dos:
+        if opt is not None:
+            positions = opt.positions
+        # Only for the orbital -> atom map: building it runs no SCF
+        orbital_atom = orbital_atoms(new_calculator(numbers, positions, verbosity=0)[0])
+    if transport and result_data['gap'] is not None:
+        with trace.span("transport"):
+            negf = compute_transport(
+                numbers, positions, res.get('hamiltonian-matrix') * HARTREE_TO_EV,
+                res.get('overlap-matrix'), res.get('density-matrix'), orbital_atom)
+        result_data['conductance'] = negf.conductance
+        result_data['transmission'] = negf.transmission
+        result_data['transmission_energies'] = negf.energies
+        result_data['transmission_fermi'] = negf.fermi
+    if dos:
+        with trace.span("pdos_weights"):
+            result_data['orbital_energies'] = res.get('orbital-energies') * HARTREE_TO_EV
+            result_data['pdos_weights'] = mulliken_weights(
+                res.get('orbital-coefficients'), res.get('overlap-matrix'), orbital_atom, numbers)
+    if matrices is not None:
+        with trace.span("matrix_store"):
+            # One property at a time: never two O(n^2) copies alive at once
+            for prop in MATRIX_PROPERTIES:
+                matrices.put(entry, {prop: res.get(prop)})
+            matrices.describe(entry, source_id(file), method, key)
+    # Only the summary is kept: free the Result's matrices before the cache
+    # write and the trip back to the parent process
+    del res, opt
+
+    if cache is not None:
+        with trace.span("cache_store"):
+            cache.put(key, result_data)
+    result_data['cached'] = False
+    # Run-specific, so not stored in the cache
+    result_data['scf_iterations'] = iterations
+    result_data['scf_guess'] = guessed
+    result_data['scf_saved'] = saved
+    return result_data
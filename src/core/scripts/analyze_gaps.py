@@ -1,65 +1,188 @@
 # scripts/analyze_gaps.py
 import sys
+import hashlib
+import json
+import pickle
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
 import pandas as pd
+import matplotlib
+# backend sin ventana: los plots se renderizan en procesos sin display
+matplotlib.use("Agg")
 import matplotlib.pyplot as plt
 
-from libs.paths import RESULTS_DIR, PLOTS_DIR, STRUCT_CSV, LEVELS_CSV
+from src.core.libs.paths import RESULTS_DIR, PLOTS_DIR, LEVELS_STORE
+from src.core.libs.store import ResultsStore
 
+# cambiarlo obliga a redibujar todo (p.ej. si cambia el estilo de los plots)
+PLOT_VERSION = 1
+HASHES_FILE = PLOTS_DIR / ".plot_hashes.json"
+FACETS_DIR = PLOTS_DIR / "facets"
 
-def main():
-    if not STRUCT_CSV.exists() or not LEVELS_CSV.exists():
-        print("Faltan structures.csv o xtb_levels.csv. Ejecuta mapper y normalizer primero.")
-        return
-
-    df_structs = pd.read_csv(STRUCT_CSV)
-    df_levels  = pd.read_csv(LEVELS_CSV)
-
-    df = df_structs.merge(df_levels, on="id", how="inner")
-    out_csv = RESULTS_DIR / "xtb_gaps_parsed.csv"
-    df.to_csv(out_csv, index=False, encoding="utf-8")
-    print(f"Dataset completo guardado en {out_csv}")
 
-    # === Plot 1: Gap vs % dopaje (por dopante) ===
+# === Plot 1: Gap vs % dopaje (por dopante) ===
+def plot_gap_vs_percent(path: Path, groups: dict, title: str = "Gap electrónico vs % de dopaje (xTB)"):
     plt.figure(figsize=(8, 6))
-    for dopant, sub in df.groupby("dopant"):
-        if dopant == "pure":
-            continue
-        plt.scatter(sub["percent"], sub["GAP_eV"], label=dopant, alpha=0.8)
+    for dopant, (percent, gap) in groups.items():
+        plt.scatter(percent, gap, label=dopant, alpha=0.8)
     plt.xlabel("% dopaje")
     plt.ylabel("Gap (eV)")
-    plt.title("Gap electrónico vs % de dopaje (xTB)")
+    plt.title(title)
     plt.legend(title="Dopante")
     plt.tight_layout()
-    plt.savefig(PLOTS_DIR / "gap_vs_percent_por_dopante.png", dpi=300)
+    plt.savefig(path, dpi=300)
     plt.close()
 
-    # === Plot 2: Gap vs tamaño por dopante ===
+
+# === Plot 2: Gap vs tamaño por dopante ===
+def plot_gap_vs_size(path: Path, groups: dict):
     plt.figure(figsize=(8, 6))
-    for dopant, sub in df.groupby("dopant"):
-        sub_sorted = sub.sort_values("size_nm")
-        plt.plot(sub_sorted["size_nm"], sub_sorted["GAP_eV"],
-                 marker="o", linestyle="-", alpha=0.8, label=dopant)
+    for dopant, (size_nm, gap) in groups.items():
+        plt.plot(size_nm, gap, marker="o", linestyle="-", alpha=0.8, label=dopant)
     plt.xlabel("Tamaño del flake (nm)")
     plt.ylabel("Gap (eV)")
     plt.title("Gap electrónico vs tamaño del flake, por dopante")
     plt.legend(title="Dopante")
     plt.tight_layout()
-    plt.savefig(PLOTS_DIR / "gap_vs_size_por_dopante.png", dpi=300)
+    plt.savefig(path, dpi=300)
     plt.close()
 
-    # === Plot 3: solo grafeno puro ===
+
+# === Plot 3: solo grafeno puro / facetas (una serie por figura) ===
+def plot_series(path: Path, x, y, xlabel: str, title: str, figsize=(6, 4)):
+    plt.figure(figsize=figsize)
+    plt.plot(x, y, marker="o")
+    plt.xlabel(xlabel)
+    plt.ylabel("Gap (eV)")
+    plt.title(title)
+    plt.tight_layout()
+    plt.savefig(path, dpi=300)
+    plt.close()
+
+
+def _render(spec):
+    path, func, kwargs = spec
+    func(path, **kwargs)
+    return path
+
+
+def _spec_hash(func, kwargs) -> str:
+    return hashlib.sha256(pickle.dumps((PLOT_VERSION, func.__name__, kwargs))).hexdigest()
+
+
+def build_specs(df: pd.DataFrame, facets: bool = True) -> list:
+    """
+    Lista de figuras independientes: (ruta, función, datos).
+    Los datos son arrays simples, así que cada figura se puede dibujar en
+    otro proceso y su hash solo cambia si cambian sus propios datos.
+    """
+    doped = df[df["dopant"] != "pure"]
+    specs = [
+        (PLOTS_DIR / "gap_vs_percent_por_dopante.png", plot_gap_vs_percent, {
+            "groups": {str(d): (sub["percent"].to_numpy(), sub["GAP_eV"].to_numpy())
+                       for d, sub in doped.groupby("dopant", observed=True)},
+        }),
+        (PLOTS_DIR / "gap_vs_size_por_dopante.png", plot_gap_vs_size, {
+            "groups": {str(d): (sub["size_nm"].to_numpy(), sub["GAP_eV"].to_numpy())
+                       for d, sub in df.sort_values("size_nm").groupby("dopant", observed=True)},
+        }),
+    ]
+
     df_pure = df[df["dopant"] == "pure"].sort_values("size_nm")
     if not df_pure.empty:
-        plt.figure(figsize=(6, 4))
-        plt.plot(df_pure["size_nm"], df_pure["GAP_eV"], marker="o")
-        plt.xlabel("Tamaño del flake (nm)")
-        plt.ylabel("Gap (eV)")
-        plt.title("Grafeno puro: Gap vs tamaño (xTB)")
-        plt.tight_layout()
-        plt.savefig(PLOTS_DIR / "gap_vs_size_pure.png", dpi=300)
-        plt.close()
+        specs.append((PLOTS_DIR / "gap_vs_size_pure.png", plot_series, {
+            "x": df_pure["size_nm"].to_numpy(), "y": df_pure["GAP_eV"].to_numpy(),
+            "xlabel": "Tamaño del flake (nm)", "title": "Grafeno puro: Gap vs tamaño (xTB)",
+        }))
+
+    if facets:
+        # una figura por dopante y una por tamaño: escala a cientos de grupos
+        for dopant, sub in df.sort_values("size_nm").groupby("dopant", observed=True):
+            specs.append((FACETS_DIR / f"gap_vs_size_{dopant}.png", plot_series, {
+                "x": sub["size_nm"].to_numpy(), "y": sub["GAP_eV"].to_numpy(),
+                "xlabel": "Tamaño del flake (nm)", "title": f"{dopant}: Gap vs tamaño (xTB)",
+            }))
+        for size_nm, sub in doped.groupby("size_nm"):
+            specs.append((FACETS_DIR / f"gap_vs_percent_{size_nm:g}nm.png", plot_gap_vs_percent, {
+                "groups": {str(d): (grp["percent"].to_numpy(), grp["GAP_eV"].to_numpy())
+                           for d, grp in sub.groupby("dopant", observed=True)},
+                "title": f"{size_nm:g} nm: Gap vs % de dopaje (xTB)",
+            }))
+
+    return specs
+
+
+def prune_plots(keep: set, previous: dict) -> int:
+    """
+    Borra los PNG que ya no corresponden a ninguna figura de `keep` (rutas
+    relativas a PLOTS_DIR): las facetas que sobran y las figuras que tenían
+    hash en `previous`, p.ej. de un dopante o tamaño que ya no está en los
+    datos. Devuelve cuántos archivos se borraron.
+    """
+    stale = {PLOTS_DIR / key for key in previous if key not in keep}
+    if FACETS_DIR.exists():
+        stale.update(path for path in FACETS_DIR.glob("*.png")
+                     if str(path.relative_to(PLOTS_DIR)) not in keep)
+    removed = 0
+    for path in stale:
+        if path.exists():
+            path.unlink()
+            removed += 1
+    return removed
+
+
+def render_plots(specs: list, workers: int | None = None) -> int:
+    """
+    Dibuja en paralelo las figuras cuyo hash de datos cambió (o cuyo PNG no
+    existe) y borra las que ya no están en `specs` (ver prune_plots).
+    Devuelve cuántas se dibujaron.
+    """
+    hashes = {}
+    if HASHES_FILE.exists():
+        with open(HASHES_FILE, "r", encoding="utf-8") as f:
+            hashes = json.load(f)
+
+    pending = []
+    new_hashes = {}
+    for path, func, kwargs in specs:
+        key = str(path.relative_to(PLOTS_DIR))
+        new_hashes[key] = _spec_hash(func, kwargs)
+        if hashes.get(key) != new_hashes[key] or not path.exists():
+            pending.append((path, func, kwargs))
+
+    FACETS_DIR.mkdir(parents=True, exist_ok=True)
+    if len(pending) > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for _ in pool.map(_render, pending):
+                pass
+    elif pending:
+        _render(pending[0])
+
+    # el JSON solo guarda las figuras actuales
+    with open(HASHES_FILE, "w", encoding="utf-8") as f:
+        json.dump(new_hashes, f, indent=1)
+    removed = prune_plots(set(new_hashes), hashes)
+    if removed:
+        print(f"Plots obsoletos borrados: {removed}")
+    return len(pending)
+
+
+def main(workers: int | None = None, facets: bool = True):
+    if not ResultsStore.exists(LEVELS_STORE):
+        print("Falta xtb_levels.store. Ejecuta mapper y normalizer primero.")
+        return
+
+    # el almacén ya trae tamaño/dopante/porcentaje: no hace falta merge
+    store = ResultsStore(LEVELS_STORE)
+    df = store.to_frame(columns=["size_nm", "dopant", "dopant_count", "percent", "GAP_eV"])
+    out_csv = RESULTS_DIR / "xtb_gaps_parsed.csv"
+    store.export_csv(out_csv)
+    print(f"Dataset completo guardado en {out_csv}")
+
+    specs = build_specs(df, facets)
+    drawn = render_plots(specs, workers)
+    print(f"Plots: {drawn} dibujados, {len(specs) - drawn} sin cambios")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,378 @@
+# scripts/benchmark.py
+"""
+Benchmarks del pipeline: parseo de nombres, lectura de XYZ, singlepoints
+de tblite por tamaño de flake, costo de lanzar xtb (singlepoint y
+optimización), parseo de outputs grandes y analyze_gaps completo.
+
+Desde la raíz del repo:
+
+    python -m src.core.scripts.benchmark -o bench.json
+    python -m src.core.scripts.benchmark --baseline bench.json
+
+Con --baseline se marca como regresión todo benchmark cuya mediana sea más
+lenta que la de la línea base por encima de --threshold, y el proceso sale
+con código 1. Los benchmarks cuyas dependencias no están (tblite, xtb,
+pandas/matplotlib...) se marcan como omitidos en vez de fallar.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from src.core.libs.filename_parser import parse_structure_name
+from src.core.libs.ingest import list_zip_members
+
+REPO_ROOT = Path(__file__).resolve().parents[3]
+DEFAULT_DATASET = REPO_ROOT / "dataset"
+DEFAULT_THRESHOLD = 0.2
+
+BENCHMARKS = {}
+
+
+class Skip(Exception):
+    """Falta una dependencia o un insumo: el benchmark no aplica aquí."""
+
+
+def benchmark(name: str):
+    def register(func):
+        BENCHMARKS[name] = func
+        return func
+    return register
+
+
+def measure(func, repeat: int, setup=None) -> list:
+    """
+    Tiempos (s) de `repeat` llamadas a func(); `setup` corre fuera del cronómetro.
+    """
+    times = []
+    for _ in range(repeat):
+        arg = setup() if setup else None
+        start = time.perf_counter()
+        func(arg) if setup else func()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def dataset_files(dataset: Path) -> list:
+    if dataset.suffix.lower() == ".zip":
+        return list_zip_members(dataset)
+    files = sorted(dataset.glob("*.xyz"))
+    if not files:
+        raise Skip(f"no hay .xyz en {dataset}")
+    return files
+
+
+def _quiet():
+    # run_xtb_* imprimen cada comando
+    return contextlib.redirect_stdout(io.StringIO())
+
+
+# --- benchmarks --------------------------------------------------------------
+
+@benchmark("parse_structure_name")
+def bench_parse_names(ctx):
+    names = [f.name for f in ctx["files"]] * max(1, 10_000 // len(ctx["files"]))
+    times = measure(lambda: [parse_structure_name(n) for n in names], ctx["repeat"])
+    return {"params": {"names": len(names)}, "times": times}
+
+
+@benchmark("xyz_load")
+def bench_xyz_load(ctx):
+    from src.core.xyz import read_structures
+
+    files = ctx["files"]
+    times = measure(lambda: read_structures(files), ctx["repeat"])
+    return {"params": {"files": len(files)}, "times": times}
+
+
+@benchmark("tblite_singlepoint")
+def bench_singlepoint(ctx):
+    try:
+        import tblite.interface  # noqa: F401
+    except ImportError:
+        raise Skip("tblite no está instalado")
+    from src.core.process import run_singlepoint
+    from src.core.xyz import read_structure
+
+    # una estructura pura por tamaño (1 nm, 1.5 nm, 2 nm...): escalado del SCF
+    by_size = {}
+    for file in ctx["files"]:
+        size_nm, dopant, _, _ = parse_structure_name(file.name)
+        if size_nm is not None and (dopant == "pure" or size_nm not in by_size):
+            by_size[size_nm] = file
+
+    cases = {}
+    for size_nm, file in sorted(by_size.items()):
+        structure = read_structure(file)
+        iters = []
+
+        def run():
+            iters.append(run_singlepoint(structure.numbers, structure.positions)[1])
+
+        times = measure(run, ctx["repeat"])
+        cases[f"{size_nm:g}nm"] = {
+            "params": {"file": file.name, "natoms": len(structure.numbers), "scf_iterations": iters[-1]},
+            "times": times,
+        }
+    return {"cases": cases}
+
+
+@benchmark("xtb_spawn")
+def bench_xtb_spawn(ctx):
+    if shutil.which("xtb") is None:
+        raise Skip("xtb no está en el PATH")
+    import subprocess
+    from src.core.libs.xtb import run_xtb_opt, run_xtb_sp, xtb_env
+
+    env = xtb_env(1)
+    # costo fijo de arrancar el binario, sin cálculo
+    spawn = measure(lambda: subprocess.run(["xtb", "--version"], capture_output=True, env=env),
+                    ctx["repeat"])
+
+    smallest = min(ctx["files"], key=lambda f: parse_structure_name(f.name)[0] or float("inf"))
+    with tempfile.TemporaryDirectory() as tmp:
+        xyz = Path(tmp) / "input.xyz"
+        if isinstance(smallest, Path):
+            shutil.copy(smallest, xyz)
+        else:
+            from src.core.libs.ingest import read_zip_member
+            xyz.write_text(read_zip_member(smallest))
+        with _quiet():
+            sp = measure(lambda: run_xtb_sp(xyz, Path(tmp), nprocs=1, env=env), ctx["repeat"])
+            # cada repetición parte de la misma geometría de entrada
+            opt = measure(lambda: run_xtb_opt(xyz, Path(tmp) / "opt", nprocs=1, env=env), ctx["repeat"])
+
+    return {"cases": {
+        "version": {"params": {}, "times": spawn},
+        "singlepoint": {"params": {"file": smallest.name}, "times": sp},
+        "optimization": {"params": {"file": smallest.name}, "times": opt},
+    }}
+
+
+def _fake_xtb_output(path: Path, opt_cycles: int, norbitals: int) -> None:
+    """
+    Output sintético con la forma de una optimización larga de xtb:
+    muchos ciclos y al final el bloque de orbitales.
+    """
+    cycle = "".join(
+        f"{i:6d}    -42.{i:010d}  -0.1234567E-03   0.1234567E-01       0.00     0.00\n"
+        for i in range(1, 15)
+    )
+    nocc = norbitals // 2
+    with open(path, "w", encoding="utf-8") as f:
+        for n in range(opt_cycles):
+            f.write(f"\n........................................................................\n"
+                    f".............................. CYCLE {n + 1:4d} ..............................\n"
+                    f"........................................................................\n")
+            f.write(cycle)
+            f.write("   *** convergence criteria satisfied after 14 iterations ***\n")
+            f.write(f"          :: total energy           -42.{n:012d} Eh    ::\n")
+        f.write("\n         * Orbital Energies and Occupations\n\n")
+        f.write("         #    Occupation            Energy/Eh            Energy/eV\n")
+        for i in range(1, norbitals + 1):
+            e = -0.5 + i / norbitals
+            tag = " (HOMO)" if i == nocc else " (LUMO)" if i == nocc + 1 else ""
+            occ = f"{2.0:14.4f}" if i <= nocc else " " * 14
+            f.write(f"{i:10d}{occ}{e:21.7f}{e * 27.211386:21.4f}{tag}\n")
+        f.write("           -------------------------------------------------------------\n"
+                "                  HL-Gap            0.0100000 Eh            0.2721 eV\n")
+        f.write("          | TOTAL ENERGY              -42.123456789012 Eh   |\n"
+                "          | HOMO-LUMO GAP               0.272113860000 eV   |\n"
+                "   normal termination of xtb\n")
+
+
+@benchmark("extract_levels")
+def bench_extract_levels(ctx):
+    from src.core.libs.xtb import extract_levels_from_output
+
+    cases = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for cycles in (10, 1000):
+            path = Path(tmp) / f"xtb_opt_{cycles}.out"
+            _fake_xtb_output(path, cycles, norbitals=2000)
+            times = measure(lambda: extract_levels_from_output(path), ctx["repeat"])
+            cases[f"{cycles}_cycles"] = {
+                "params": {"bytes": path.stat().st_size}, "times": times,
+            }
+    return {"cases": cases}
+
+
+@benchmark("analyze_gaps")
+def bench_analyze_gaps(ctx):
+    try:
+        import pandas  # noqa: F401
+        import matplotlib  # noqa: F401
+        from src.core.scripts import analyze_gaps
+        from src.core.libs.store import ResultsStore, LEVELS_SCHEMA
+    except ImportError as e:
+        if (e.name or "").startswith("src"):
+            raise Skip("ejecutar desde la raíz del repo: python -m src.core.scripts.benchmark")
+        raise Skip(f"falta {e.name}")
+
+    rng = np.random.default_rng(0)
+    dopants = ["pure", "B", "N", "O", "P", "S"]
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        store_dir = tmp / "xtb_levels.store"
+        with ResultsStore.create(store_dir, LEVELS_SCHEMA) as store:
+            for i in range(2000):
+                size_nm = float(rng.choice([1.0, 1.5, 2.0, 2.5, 3.0]))
+                dopant = dopants[i % len(dopants)]
+                percent = 0.0 if dopant == "pure" else float(rng.choice([1.5, 3.0, 4.5, 6.0, 7.0]))
+                store.append({
+                    "id": f"{size_nm:g}nm-{dopant}-{i}", "size_nm": size_nm, "dopant": dopant,
+                    "dopant_count": int(percent), "percent": percent,
+                    "HOMO_eV": -5.0, "LUMO_eV": -3.0, "GAP_eV": float(rng.normal(2.0, 0.3)),
+                })
+
+        # redirigir las rutas del script al directorio temporal
+        plots = tmp / "plots"
+        patched = {
+            "LEVELS_STORE": store_dir, "RESULTS_DIR": tmp, "PLOTS_DIR": plots,
+            "HASHES_FILE": plots / ".plot_hashes.json", "FACETS_DIR": plots / "facets",
+        }
+        saved = {k: getattr(analyze_gaps, k) for k in patched}
+
+        def cold_setup():
+            shutil.rmtree(plots, ignore_errors=True)
+            plots.mkdir()
+
+        try:
+            for k, v in patched.items():
+                setattr(analyze_gaps, k, v)
+            with _quiet():
+                cold = measure(lambda _: analyze_gaps.main(), ctx["repeat"], setup=cold_setup)
+                # segunda pasada sin cambios: solo hashes, nada que redibujar
+                warm = measure(analyze_gaps.main, ctx["repeat"])
+        finally:
+            for k, v in saved.items():
+                setattr(analyze_gaps, k, v)
+
+    return {"cases": {
+        "cold": {"params": {"rows": 2000}, "times": cold},
+        "unchanged": {"params": {"rows": 2000}, "times": warm},
+    }}
+
+
+# --- ejecución y comparación -------------------------------------------------
+
+def summarize(times: list) -> dict:
+    return {
+        "times": times,
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+    }
+
+
+def flatten(name: str, outcome: dict) -> dict:
+    """
+    {nombre[/caso]: {"params", "times", "min", "median", "mean"}}
+    """
+    if "cases" not in outcome:
+        return {name: {"params": outcome.get("params", {}), **summarize(outcome["times"])}}
+    return {
+        f"{name}/{case}": {"params": data.get("params", {}), **summarize(data["times"])}
+        for case, data in outcome["cases"].items()
+    }
+
+
+def environment() -> dict:
+    info = {
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "numpy": np.__version__,
+    }
+    try:
+        from tblite.library import get_version
+        info["tblite"] = ".".join(map(str, get_version()))
+    except ImportError:
+        pass
+    if shutil.which("xtb"):
+        from src.core.libs.xtb import xtb_version
+        info["xtb"] = xtb_version()
+    return info
+
+
+def run(dataset: Path = DEFAULT_DATASET, repeat: int = 5, only: list | None = None) -> dict:
+    ctx = {"files": dataset_files(dataset), "repeat": repeat}
+    results, skipped = {}, {}
+    for name, func in BENCHMARKS.items():
+        if only and name not in only:
+            continue
+        print(f"- {name} ...", flush=True)
+        try:
+            outcome = func(ctx)
+        except Skip as e:
+            skipped[name] = str(e)
+            print(f"  omitido: {e}")
+            continue
+        for key, entry in flatten(name, outcome).items():
+            results[key] = entry
+            print(f"  {key}: mediana {entry['median'] * 1e3:.2f} ms")
+    return {"environment": environment(), "repeat": repeat,
+            "benchmarks": results, "skipped": skipped}
+
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Lista de (nombre, mediana_base, mediana_actual, cociente) para los
+    benchmarks que empeoraron más de `threshold` (0.2 = 20 %).
+    """
+    regressions = []
+    for name, entry in current["benchmarks"].items():
+        base = baseline.get("benchmarks", {}).get(name)
+        if base is None or base["median"] <= 0:
+            continue
+        ratio = entry["median"] / base["median"]
+        if ratio > 1 + threshold:
+            regressions.append((name, base["median"], entry["median"], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks del pipeline de gaps xTB")
+    parser.add_argument("-o", "--output", type=Path, help="JSON de salida")
+    parser.add_argument("--baseline", type=Path, help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help="fracción de empeoramiento tolerada (default 0.2)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--dataset", type=Path, default=DEFAULT_DATASET,
+                        help="carpeta con .xyz o zip del dataset")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS))
+    args = parser.parse_args(argv)
+
+    report = run(args.dataset, args.repeat, args.only)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"Resultados guardados en {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        for name, before, after, ratio in regressions:
+            print(f"REGRESIÓN {name}: {before * 1e3:.2f} ms -> {after * 1e3:.2f} ms (x{ratio:.2f})")
+        if regressions:
+            return 1
+        print("Sin regresiones respecto a la línea base.")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
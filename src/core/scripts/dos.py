@@ -0,0 +1,174 @@
+# scripts/dos.py
+"""
+DOS y PDOS (carbono / dopante / hidrógeno) de todas las estructuras del
+mapa (STRUCT_STORE, ver mapper): un singlepoint de tblite por estructura
+para los niveles y sus pesos de Mulliken, y después todas las curvas de
+una vez con dos.compute_dos.
+
+Los niveles se alinean al nivel de Fermi de cada estructura (mitad del
+gap), así las curvas de distintos dopantes se pueden comparar directamente.
+"""
+from concurrent.futures import as_completed
+from pathlib import Path
+
+import numpy as np
+
+from src.core.dos import GROUPS, WIDTH, compute_dos
+from src.core.libs.ingest import ZipMember
+from src.core.libs.paths import STRUCT_STORE, DOS_STORE, DOS_PLOTS_DIR, CACHE_DIR
+from src.core.libs.store import ResultsStore, DOS_SCHEMA
+from src.core.libs import trace
+
+
+def load_structures(**filters) -> list:
+    data = ResultsStore(STRUCT_STORE).query(**filters)
+    return [dict(zip(data, row)) for row in zip(*data.values())]
+
+
+def source(struct: dict) -> Path | ZipMember:
+    if struct["archive"]:
+        return ZipMember(Path(struct["archive"]), struct["path"])
+    return Path(struct["path"])
+
+
+def run_singlepoints(structs: list, workers: int | None = None, cache_dir: Path | None = CACHE_DIR):
+    """
+    Va devolviendo (índice, registro) según terminan; los que fallan se
+    informan y se saltan.
+    """
+    from src.core.parallel import make_executor
+    from src.core.process import evaluate_file
+
+    with make_executor(workers) as pool:
+        futures = {
+            pool.submit(evaluate_file, source(s), cache_dir=cache_dir, dos=True): i
+            for i, s in enumerate(structs)
+        }
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                yield i, future.result()
+            except Exception as e:
+                print(f"  ⚠ {structs[i]['id']}: {e}")
+
+
+def save(structs: list, records: list) -> None:
+    """
+    Crea DOS_STORE con la tabla de estructuras; las curvas las escribe
+    después compute_dos directamente ahí (grid/total/partial.npy).
+    """
+    with ResultsStore.create(DOS_STORE, DOS_SCHEMA) as store:
+        for s, r in zip(structs, records):
+            store.append({
+                "id": s["id"],
+                "size_nm": s["size_nm"],
+                "dopant": s["dopant"],
+                "dopant_count": s["dopant_count"],
+                "percent": s["percent"],
+                "HOMO_eV": r["homo"],
+                "LUMO_eV": r["lumo"],
+                "fermi_eV": (r["homo"] + r["lumo"]) / 2,
+            })
+
+
+def mean_curve(curves, rows: np.ndarray, columns: np.ndarray, chunk: int = 256) -> np.ndarray:
+    """
+    Media de curves[rows][..., columns] leyendo de a `chunk` filas, para no
+    cargar entero un array mapeado a memoria.
+    """
+    index = np.flatnonzero(rows)
+    acc = 0.0
+    for start in range(0, len(index), chunk):
+        acc = acc + np.asarray(curves[index[start:start + chunk]])[..., columns].sum(axis=0)
+    return acc / len(index)
+
+
+def plot_dos(result, dopants: np.ndarray, window=(-6.0, 6.0)) -> list:
+    """
+    Un plot con la DOS media de cada dopante y uno por dopante con su PDOS
+    (C / dopante / H). Devuelve las rutas guardadas.
+    """
+    import matplotlib
+    matplotlib.use("Agg")
+    import matplotlib.pyplot as plt
+
+    DOS_PLOTS_DIR.mkdir(parents=True, exist_ok=True)
+    shown = (result.grid >= window[0]) & (result.grid <= window[1])
+    grid = result.grid[shown]
+    paths = []
+
+    plt.figure(figsize=(8, 6))
+    for dopant in sorted(set(dopants)):
+        rows = dopants == dopant
+        plt.plot(grid, mean_curve(result.total, rows, shown), label=f"{dopant} ({rows.sum()})")
+    plt.axvline(0.0, color="gray", linestyle="--", linewidth=0.8)
+    plt.xlabel("E - E_F (eV)")
+    plt.ylabel("DOS (estados/eV)")
+    plt.title("DOS media por dopante (xTB)")
+    plt.legend(title="Dopante")
+    plt.tight_layout()
+    paths.append(DOS_PLOTS_DIR / "dos_por_dopante.png")
+    plt.savefig(paths[-1], dpi=300)
+    plt.close()
+
+    for dopant in sorted(set(dopants)):
+        rows = dopants == dopant
+        partial = mean_curve(result.partial, rows, shown)
+        plt.figure(figsize=(6, 4))
+        for channel, curve in zip(GROUPS, partial):
+            if curve.any():
+                plt.plot(grid, curve, label=channel)
+        plt.axvline(0.0, color="gray", linestyle="--", linewidth=0.8)
+        plt.xlabel("E - E_F (eV)")
+        plt.ylabel("PDOS (estados/eV)")
+        plt.title(f"{dopant}: PDOS media (xTB)")
+        plt.legend()
+        plt.tight_layout()
+        paths.append(DOS_PLOTS_DIR / f"pdos_{dopant}.png")
+        plt.savefig(paths[-1], dpi=300)
+        plt.close()
+    return paths
+
+
+def main(workers: int | None = None, width: float = WIDTH, kind: str = "gaussian",
+         cache_dir: Path | None = CACHE_DIR, plots: bool = True, **filters):
+    """
+    `filters` (dopant, size_nm, min_size, max_size, percent) limitan el
+    cálculo a una parte del mapa, como en normalizer.main.
+    """
+    if not ResultsStore.exists(STRUCT_STORE):
+        print(f"No se encontró {STRUCT_STORE}. Ejecuta primero el mapper (ingest)")
+        return
+
+    structs = load_structures(**filters)
+    print(f"DOS de {len(structs)} estructuras")
+    records = [None] * len(structs)
+    with trace.span("dos_singlepoints", structures=len(structs)):
+        for i, record in run_singlepoints(structs, workers, cache_dir):
+            records[i] = record
+
+    # sin gap no hay nivel de Fermi al que alinear
+    done = [i for i, r in enumerate(records) if r is not None and r["gap"] is not None]
+    if not done:
+        print("⚠ No se calculó ninguna estructura.")
+        return
+    structs = [structs[i] for i in done]
+    records = [records[i] for i in done]
+
+    with trace.span("dos_broaden", structures=len(done)):
+        levels = [r["orbital_energies"] - (r["homo"] + r["lumo"]) / 2 for r in records]
+        weights = [r["pdos_weights"] for r in records]
+        # la tabla primero: crear el almacén borra lo que hubiera
+        save(structs, records)
+        # las curvas se escriben por partes en DOS_STORE (arrays .npy mapeados)
+        result = compute_dos(levels, weights, width=width, kind=kind, directory=DOS_STORE)
+    print(f"📄 DOS guardada en {DOS_STORE} ({len(done)} estructuras x {len(result.grid)} puntos)")
+
+    if plots:
+        with trace.span("dos_plots"):
+            paths = plot_dos(result, np.array([s["dopant"] for s in structs]))
+        print(f"Plots de DOS en {DOS_PLOTS_DIR} ({len(paths)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,43 +1,46 @@
 # scripts/map_dataset.py
 import sys
 from pathlib import Path
-import csv
 
-from libs.paths import DATASET_DIR, RESULTS_DIR
-from libs.filename_parser import parse_structure_name
+from src.core.libs.paths import DATASET_DIR, STRUCT_CSV, STRUCT_STORE, CATALOG_DB
+from src.core.libs.catalog import Catalog
+from src.core.libs.store import ResultsStore, STRUCT_SCHEMA
 
 
-def main():
-    csv_path = RESULTS_DIR / "structures.csv"
+def main(zip_path: Path | None = None, **filters):
+    """
+    Mapea DATASET_DIR o, si se pasa `zip_path`, las estructuras del zip
+    directamente (columna "archive" = zip, "path" = nombre dentro del zip).
 
-    xyz_files = sorted(DATASET_DIR.glob("*.xyz"))
-    if not xyz_files:
-        print(f"⚠ No se encontraron .xyz en {DATASET_DIR}")
+    Los metadatos salen del catálogo (CATALOG_DB), que solo relee lo nuevo o
+    modificado. `filters` (dopant, size_nm, min_size, max_size, percent,
+    element) limitan el mapa a un subconjunto, p.ej. main(dopant="N", min_size=1.5).
+    """
+    source = zip_path if zip_path is not None else DATASET_DIR
+    with Catalog(CATALOG_DB) as catalog:
+        added, updated, removed = catalog.sync(source)
+        print(f"Catálogo: {added} nuevas, {updated} modificadas, {removed} borradas")
+        entries = catalog.query(source, **filters)
+
+    if not entries:
+        print(f"⚠ No se encontraron .xyz en {source}" + (f" con {filters}" if filters else ""))
         return
 
-    rows = []
-    for xyz in xyz_files:
-        size_nm, dopant, dopant_count, percent = parse_structure_name(xyz.name)
-        rows.append({
-            "id": xyz.stem,
-            "filename": xyz.name,
-            "path": str(xyz),
-            "size_nm": size_nm,
-            "dopant": dopant,
-            "dopant_count": dopant_count,
-            "percent": percent,
-        })
-
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        writer = csv.DictWriter(
-            f,
-            fieldnames=["id", "filename", "path", "size_nm",
-                        "dopant", "dopant_count", "percent"]
-        )
-        writer.writeheader()
-        writer.writerows(rows)
-
-    print(f"📄 Mapa de estructuras guardado en {csv_path}")
+    with ResultsStore.create(STRUCT_STORE, STRUCT_SCHEMA) as store:
+        for entry in entries:
+            store.append({
+                "id": entry.stem,
+                "filename": entry["name"],
+                "archive": entry["archive"],
+                "path": entry["path"],
+                "size_nm": entry["size_nm"],
+                "dopant": entry["dopant"],
+                "dopant_count": entry["dopant_count"],
+                "percent": entry["percent"],
+            })
+        store.export_csv(STRUCT_CSV)
+
+    print(f"📄 Mapa de estructuras guardado en {STRUCT_STORE} (copia en {STRUCT_CSV})")
 
 
 if __name__ == "__main__":
@@ -1,58 +1,116 @@
 # scripts/normalize_xtb.py
 import sys
-import csv
 from pathlib import Path
 
-from libs.paths import RESULTS_DIR, STRUCT_CSV, LEVELS_CSV
-from libs.xtb import run_xtb_opt, run_xtb_sp, extract_levels_from_dir
+from src.core.libs.paths import RESULTS_DIR, STRUCT_STORE, LEVELS_CSV, LEVELS_STORE, MANIFEST_JSON
+from src.core.libs.xtb import run_xtb_batch, extract_levels_from_dir, xtb_settings
+from src.core.libs.manifest import Manifest, file_hash
+from src.core.libs.ingest import ZipMember, iter_zip_xyz, member_fingerprint
+from src.core.libs.store import ResultsStore, LEVELS_SCHEMA
+from src.core.libs import trace
 
 
-def main():
-    if not STRUCT_CSV.exists():
-        print(f"No se encontró {STRUCT_CSV}. Ejecuta primero map_dataset.py")
-        return
+def materialize_from_zip(archive: str, structs: list) -> None:
+    """
+    xtb necesita la entrada en disco: cada .xyz del zip se escribe una sola
+    vez, directamente en su carpeta de resultados (sin tmp ni dataset/).
+    """
+    wanted = {Path(s["path"]).name: RESULTS_DIR / s["id"] for s in structs}
+    for name, text in iter_zip_xyz(Path(archive)):
+        outdir = wanted.get(name)
+        if outdir is None:
+            continue
+        outdir.mkdir(parents=True, exist_ok=True)
+        (outdir / name).write_text(text, encoding="utf-8")
 
-    rows = []
-    with open(STRUCT_CSV, "r", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        struct = list(reader)
 
-    for s in struct:
-        struct_id = s["id"]
-        xyz_path = Path(s["path"])
-        outdir = RESULTS_DIR / struct_id
-
-        print(f"\nProcesando {xyz_path.name}")
-        # 1. Optimizar
-        run_xtb_opt(xyz_path, outdir)
-
-        # 2. Single point con geometría optimizada
-        xyz_opt = outdir / "xtbopt.xyz"
-        if not xyz_opt.exists():
-            print(f"  ⚠ No se encontró xtbopt.xyz en {outdir}, se omite.")
-            continue
+def main(total_cores: int | None = None, threads_per_job: int = 1, incremental: bool = False,
+         **filters):
+    """
+    Con `incremental=True` solo se recalculan las estructuras nuevas o cuyo
+    .xyz cambió; el resto se toma del manifest de results/.
+    `filters` (dopant, size_nm, min_size, max_size, percent) corren solo esa
+    parte del mapa de estructuras.
+    """
+    if not ResultsStore.exists(STRUCT_STORE):
+        print(f"No se encontró {STRUCT_STORE}. Ejecuta primero map_dataset.py")
+        return
 
-        run_xtb_sp(xyz_opt, outdir)
+    with trace.span("load_structures"):
+        data = ResultsStore(STRUCT_STORE).query(**filters)
+    struct = [dict(zip(data, row)) for row in zip(*data.values())]
+    by_id = {s["id"]: s for s in struct}
 
-        # 3. Extraer niveles
-        homo, lumo, gap = extract_levels_from_dir(outdir)
-        print(f"  HOMO={homo}, LUMO={lumo}, GAP={gap}")
+    # cada estructura se guarda en cuanto se tienen sus niveles
+    store = ResultsStore.create(LEVELS_STORE, LEVELS_SCHEMA)
 
-        rows.append({
+    def save_levels(struct_id, homo, lumo, gap):
+        s = by_id[struct_id]
+        store.append({
             "id": struct_id,
+            "size_nm": s["size_nm"],
+            "dopant": s["dopant"],
+            "dopant_count": s["dopant_count"],
+            "percent": s["percent"],
             "HOMO_eV": homo,
             "LUMO_eV": lumo,
             "GAP_eV": gap,
         })
 
-    if rows:
-        with open(LEVELS_CSV, "w", newline="", encoding="utf-8") as f:
-            writer = csv.DictWriter(
-                f, fieldnames=["id", "HOMO_eV", "LUMO_eV", "GAP_eV"]
-            )
-            writer.writeheader()
-            writer.writerows(rows)
-        print(f"\nNiveles electrónicos guardados en {LEVELS_CSV}")
+    manifest = Manifest(MANIFEST_JSON, xtb_settings())
+    hashes = {}
+    cached = 0
+    tasks = []
+    to_extract = {}
+    for s in struct:
+        outdir = RESULTS_DIR / s["id"]
+        if s.get("archive"):
+            member = ZipMember(Path(s["archive"]), s["path"])
+            xyz_path = outdir / member.name
+            hashes[s["id"]] = member_fingerprint(member)
+        else:
+            xyz_path = Path(s["path"])
+            hashes[s["id"]] = file_hash(xyz_path)
+
+        if incremental and manifest.is_valid(s["id"], hashes[s["id"]], outdir):
+            save_levels(s["id"], *manifest.levels(s["id"]))
+            cached += 1
+        else:
+            tasks.append((xyz_path, outdir))
+            if s.get("archive"):
+                to_extract.setdefault(s["archive"], []).append(s)
+
+    for archive, structs in to_extract.items():
+        with trace.span("unzip", archive=Path(archive).name, structures=len(structs)):
+            materialize_from_zip(archive, structs)
+
+    print(f"\nProcesando {len(tasks)} estructuras ({cached} ya calculadas)")
+
+    # 1. Optimizar + 2. Single point, varias estructuras a la vez
+    failed = []
+    with trace.span("xtb_batch", structures=len(tasks), cached=cached):
+        for xyz_path, outdir, ok in run_xtb_batch(tasks, total_cores, threads_per_job):
+            if not ok:
+                # sin registro en el manifest: se reintenta en la próxima corrida
+                failed.append(outdir.name)
+                continue
+
+            # 3. Extraer niveles
+            with trace.span("parse_output", structure=outdir.name):
+                homo, lumo, gap = extract_levels_from_dir(outdir)
+            print(f"  {xyz_path.name}: HOMO={homo}, LUMO={lumo}, GAP={gap}")
+            # se registra en cuanto termina, para poder retomar tras un crash
+            with trace.span("save_levels", structure=outdir.name):
+                save_levels(outdir.name, homo, lumo, gap)
+                manifest.record(outdir.name, hashes[outdir.name], homo, lumo, gap)
+
+    store.close()
+    if failed:
+        print(f"\n⚠ {len(failed)} estructuras fallaron: {', '.join(sorted(failed))}")
+    if len(store):
+        with trace.span("export_csv", rows=len(store)):
+            store.export_csv(LEVELS_CSV)
+        print(f"\nNiveles electrónicos guardados en {LEVELS_STORE} (copia en {LEVELS_CSV})")
     else:
         print("⚠ No se generó ningún resultado.")
 
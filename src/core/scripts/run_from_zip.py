@@ -1,55 +1,37 @@
-import zipfile
 import shutil
-from pathlib import Path
 
-from libs.paths import ROOT, DATASET_DIR, RESULTS_DIR, PLOTS_DIR, TMP_ROOT, DATASET_ZIP
-from scripts.mapper import main as run_mapper
-from scripts.normalizer import main as run_normalizer
-from scripts.analyze_gaps import main as run_analyze
+from src.core.libs.paths import RESULTS_DIR, PLOTS_DIR, DATASET_ZIP
+from src.core.scripts.mapper import main as run_mapper
+from src.core.scripts.normalizer import main as run_normalizer
+from src.core.scripts.analyze_gaps import main as run_analyze
+from src.core.libs import trace
 
 
-def clean_dirs():
-    DATASET_DIR.mkdir(exist_ok=True)
+def clean_dirs(incremental: bool = False):
     RESULTS_DIR.mkdir(exist_ok=True)
     PLOTS_DIR.mkdir(exist_ok=True)
 
-    for f in DATASET_DIR.glob("*.xyz"):
-        f.unlink()
-
-    for item in RESULTS_DIR.iterdir():
-        if item.is_dir():
-            shutil.rmtree(item)
-        elif item.suffix.lower() in {".csv", ".txt"}:
-            item.unlink()
-
-    for img in PLOTS_DIR.glob("*"):
-        if img.is_file():
-            img.unlink()
-
-
-def extract_zip_to_tmp(DATASET_ZIP: Path) -> Path:
-    tmp_dir = TMP_ROOT / DATASET_ZIP.stem
-    if tmp_dir.exists():
-        shutil.rmtree(tmp_dir)
-    tmp_dir.mkdir(parents=True, exist_ok=True)
-
-    with zipfile.ZipFile(DATASET_ZIP, "r") as zf:
-        zf.extractall(tmp_dir)
-
-    return tmp_dir
-
-
-def copy_xyz_from_tmp_to_dataset(tmp_dir: Path):
-    count = 0
-    for xyz in tmp_dir.rglob("*.xyz"):
-        shutil.copy2(xyz, DATASET_DIR / xyz.name)
-        count += 1
-    print(f"Copiados {count} archivos .xyz a {DATASET_DIR}")
-    if count == 0:
-        print("No se encontraron .xyz en el zip. ¿Estructura correcta?")
-
-
-def process_zip():
+    # en modo incremental se conservan los resultados, el manifest y los
+    # plots (analyze_gaps solo redibuja los que cambiaron)
+    if not incremental:
+        for item in RESULTS_DIR.iterdir():
+            if item.is_dir():
+                shutil.rmtree(item)
+            elif item.suffix.lower() in {".csv", ".txt"}:
+                item.unlink()
+
+        for item in PLOTS_DIR.iterdir():
+            if item.is_dir():
+                shutil.rmtree(item)
+            else:
+                item.unlink()
+
+
+def process_zip(incremental: bool = False, **filters):
+    """
+    `filters` (dopant, size_nm, min_size, max_size, percent, element) corren
+    solo un subconjunto del zip; ver mapper.main.
+    """
     if not DATASET_ZIP.exists():
         print(f"El archivo zip no existe: {DATASET_ZIP}")
         return
@@ -57,15 +39,20 @@ def process_zip():
     print("=== Pipeline desde ZIP ===")
     print(f"Zip de entrada: {DATASET_ZIP}")
 
-    clean_dirs()
-
-    tmp_dir = extract_zip_to_tmp(DATASET_ZIP)
-    print(f"Descomprimido en: {tmp_dir}")
-
-    copy_xyz_from_tmp_to_dataset(tmp_dir)
+    with trace.span("process_zip", incremental=incremental):
+        with trace.span("clean_dirs"):
+            clean_dirs(incremental)
 
-    run_mapper()
-    run_normalizer()
-    run_analyze()
+        # las estructuras se leen del zip sin descomprimirlo en disco
+        with trace.span("mapper"):
+            run_mapper(DATASET_ZIP, **filters)
+        with trace.span("normalizer"):
+            run_normalizer(incremental=incremental)
+        with trace.span("analyze_gaps"):
+            run_analyze()
 
     print("\nPipeline completado.")
+    # XTB_TRACE=<archivo> -> trace de Chrome con todas las etapas
+    path = trace.export()
+    if path:
+        print(f"Trace guardado en {path}")
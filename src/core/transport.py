@@ -0,0 +1,197 @@
+from typing import NamedTuple
+
+import numpy as np
+
+from src.core.xyz import BOHR_PER_ANGSTROM
+
+# Conductance quantum 2e^2/h, in Siemens
+G0 = 7.748091729e-5
+BOLTZMANN_EV = 8.617333262e-5
+
+# Energy grid around the Fermi level (eV) and number of points
+ENERGY_WINDOW = 2.0
+ENERGY_POINTS = 201
+# Wide-band coupling strength of each lead (eV)
+LEAD_COUPLING = 1.0
+# Atoms within this distance (Angstrom) of either end of the flake touch a lead
+CONTACT_DEPTH = 1.5
+# Upper bound for the batched (energies, contacts, orbitals) arrays of one chunk
+SOLVE_MEMORY = 256 * 1024**2
+
+
+class TransportResult(NamedTuple):
+    energies: np.ndarray      # (npoints,) eV, absolute
+    transmission: np.ndarray  # (npoints,) T(E)
+    fermi: float              # eV
+    conductance: float        # Landauer conductance at the Fermi level, S
+    left: np.ndarray          # atom indices coupled to each lead
+    right: np.ndarray
+
+
+def orbital_atoms(calculator) -> np.ndarray:
+    """
+    Atom index of every orbital of a tblite Calculator (orbital -> shell ->
+    atom), i.e. the row/column owner in H and S.
+    """
+    return calculator.get('shell-map')[calculator.get('orbital-map')]
+
+
+def contact_atoms(numbers, positions, depth: float = CONTACT_DEPTH, axis=None):
+    """
+    Heavy atoms (no hydrogens) at the two ends of the structure along `axis`
+    (default: its longest principal direction), within `depth` Angstrom of
+    each end. Returns (left, right) index arrays, never overlapping.
+    """
+    numbers = np.asarray(numbers)
+    positions = np.asarray(positions, dtype=float)
+    heavy = np.flatnonzero(numbers > 1)
+    if len(heavy) < 2:
+        heavy = np.arange(len(numbers))
+
+    centered = positions[heavy] - positions[heavy].mean(axis=0)
+    if axis is None:
+        axis = np.linalg.svd(centered, full_matrices=False)[2][0]
+    projection = centered @ (np.asarray(axis, dtype=float) / np.linalg.norm(axis))
+
+    depth = depth * BOHR_PER_ANGSTROM
+    low, high = projection.min(), projection.max()
+    if high - low < 2 * depth:
+        # Too short for two slabs: one atom per end
+        return heavy[[projection.argmin()]], heavy[[projection.argmax()]]
+    return heavy[projection <= low + depth], heavy[projection >= high - depth]
+
+
+def energy_grid(fermi: float, window: float = ENERGY_WINDOW, points: int = ENERGY_POINTS) -> np.ndarray:
+    return np.linspace(fermi - window, fermi + window, points)
+
+
+def generalized_eigh(H, S):
+    """
+    (eps, vectors) of H c = eps S c through the Cholesky factor of S; the
+    vectors are S-orthonormal, one per column.
+    """
+    factor_inv = np.linalg.inv(np.linalg.cholesky(S))
+    eps, vectors = np.linalg.eigh(factor_inv @ H @ factor_inv.T)
+    return eps, factor_inv.T @ vectors
+
+
+def electron_count(density, overlap) -> float:
+    """
+    Tr(P S) of a (possibly memory-mapped) density matrix; spin channels of a
+    (2, n, n) density are added up.
+    """
+    density = np.asarray(density)
+    if density.ndim == 3:
+        density = density.sum(axis=0)
+    return float(np.einsum('ij,ij->', density, overlap))
+
+
+def fermi_level(levels: list, electrons: float) -> float:
+    """
+    Mid-gap of the spectrum the transmission is computed on: `levels` holds
+    the eigenvalues of each spin channel of H (one channel: doubly occupied
+    levels, the HOMO holding the odd electron; two: singly occupied).
+    """
+    electrons = int(round(electrons))
+    if len(levels) == 1:
+        eps, occupied = np.sort(levels[0]), (electrons + 1) // 2
+    else:
+        eps, occupied = np.sort(np.concatenate(levels)), electrons
+    if not 0 < occupied < len(eps):
+        raise ValueError(f"{occupied} occupied levels out of {len(eps)}: no Fermi level")
+    return float(0.5 * (eps[occupied - 1] + eps[occupied]))
+
+
+def transmission(H, S, left, right, energies, coupling: float = LEAD_COUPLING,
+                 memory: int = SOLVE_MEMORY, spectrum=None) -> np.ndarray:
+    """
+    T(E) = Tr[Gamma_L G Gamma_R G^+] with G(E) = (E S - H + i (Gamma_L + Gamma_R) / 2)^-1.
+
+    Wide-band leads: Gamma = coupling * S restricted to the contact orbitals
+    `left` / `right`, independent of E. H (eV) and S are dense (n, n).
+
+    Only the contact block of G enters T, so instead of one n x n solve per
+    energy, (H, S) is diagonalized once (or `spectrum`, generalized_eigh of
+    the same H and S, is reused) and the leads are added as a rank-k update
+    (k = contact orbitals): with Q(E) = Y^T (E - eps)^-1 Y, Y the contact
+    rows of the eigenvectors, G_cc = Q (1 + i/2 M Q)^-1. Q and the k x k
+    solves are batched over chunks of energies sized to stay under `memory`
+    bytes.
+    """
+    H = np.asarray(H, dtype=float)
+    S = np.asarray(S, dtype=float)
+    left, right = np.asarray(left), np.asarray(right)
+    energies = np.asarray(energies, dtype=float)
+    eps, vectors = generalized_eigh(H, S) if spectrum is None else spectrum
+
+    contacts = np.concatenate([left, right])
+    kl, k = len(left), len(left) + len(right)
+    y = vectors[contacts]                               # (k, n)
+    gamma = np.zeros((k, k))
+    gamma[:kl, :kl] = coupling * S[np.ix_(left, left)]
+    gamma[kl:, kl:] = coupling * S[np.ix_(right, right)]
+    unit = np.eye(k)
+
+    chunk = max(1, int(memory // (16 * k * len(eps))))
+    result = np.empty(len(energies))
+    for start in range(0, len(energies), chunk):
+        detuning = energies[start:start + chunk, None] - eps
+        # Keep grid points that land exactly on a level finite
+        detuning[np.abs(detuning) < 1e-12] = 1e-12
+        q = (y / detuning[:, None, :]) @ y.T            # (chunk, k, k)
+        # G_cc = Q (1 + i/2 Gamma Q)^-1, via the transposed system
+        g = np.swapaxes(np.linalg.solve(
+            np.swapaxes(unit + 0.5j * gamma @ q, 1, 2), np.swapaxes(q, 1, 2)), 1, 2)
+        g_lr = g[:, :kl, kl:]
+        result[start:start + chunk] = np.einsum(
+            'eab,eab->e', gamma[:kl, :kl] @ g_lr @ gamma[kl:, kl:], g_lr.conj()).real
+    return result
+
+
+def landauer_conductance(energies, transmission_values, fermi: float,
+                         temperature: float = 0.0) -> float:
+    """
+    G = G0 * integral of T(E) (-df/dE) dE, in Siemens; at zero temperature
+    simply G0 * T(E_F) (interpolated on the grid).
+    """
+    energies = np.asarray(energies)
+    if temperature <= 0:
+        return float(G0 * np.interp(fermi, energies, transmission_values))
+    kt = BOLTZMANN_EV * temperature
+    x = np.clip((energies - fermi) / kt, -60, 60)
+    thermal = 1.0 / (4 * kt * np.cosh(x / 2) ** 2)
+    return float(G0 * np.trapezoid(transmission_values * thermal, energies))
+
+
+def compute_transport(numbers, positions, H, S, density, orbital_atom, energies=None,
+                      coupling: float = LEAD_COUPLING, depth: float = CONTACT_DEPTH,
+                      temperature: float = 0.0) -> TransportResult:
+    """
+    Transmission over `energies` (default energy_grid around the Fermi
+    level) and Landauer conductance with leads on both ends of the
+    structure. H and energies are in eV. A spin-polarized H (2, n, n) gives
+    the average of both channels.
+
+    The Fermi level is the mid-gap of (H, S) itself, with the electron count
+    Tr(P S) of `density`: the orbital energies tblite reports are not the
+    spectrum of its exported Hamiltonian (they sit ~0.8 eV higher), and a
+    Fermi level taken from them would land among H's unoccupied levels.
+    """
+    left, right = contact_atoms(numbers, positions, depth)
+    left_orbitals = np.flatnonzero(np.isin(orbital_atom, left))
+    right_orbitals = np.flatnonzero(np.isin(orbital_atom, right))
+
+    H = np.asarray(H)
+    S = np.asarray(S, dtype=float)
+    channels = H if H.ndim == 3 else H[None]
+    spectra = [generalized_eigh(h, S) for h in channels]
+    fermi = fermi_level([eps for eps, _ in spectra], electron_count(density, S))
+    energies = energy_grid(fermi) if energies is None else np.asarray(energies, dtype=float)
+
+    values = np.mean([
+        transmission(h, S, left_orbitals, right_orbitals, energies, coupling, spectrum=spectrum)
+        for h, spectrum in zip(channels, spectra)
+    ], axis=0)
+    return TransportResult(energies, values, fermi,
+                           landauer_conductance(energies, values, fermi, temperature),
+                           left, right)
@@ -0,0 +1,131 @@
+from pathlib import Path
+from typing import Iterable, List, NamedTuple
+
+import numpy as np
+
+from src.core.libs.ingest import ZipMember, read_zip_member
+
+# qcelemental's CODATA 2014 value, so both readers give identical geometries
+BOHR_PER_ANGSTROM = 1.0 / 0.52917721067
+
+# Elements covered by GFN2-xTB (Z = 1..86)
+SYMBOLS = (
+    "H", "He",
+    "Li", "Be", "B", "C", "N", "O", "F", "Ne",
+    "Na", "Mg", "Al", "Si", "P", "S", "Cl", "Ar",
+    "K", "Ca", "Sc", "Ti", "V", "Cr", "Mn", "Fe", "Co", "Ni", "Cu", "Zn",
+    "Ga", "Ge", "As", "Se", "Br", "Kr",
+    "Rb", "Sr", "Y", "Zr", "Nb", "Mo", "Tc", "Ru", "Rh", "Pd", "Ag", "Cd",
+    "In", "Sn", "Sb", "Te", "I", "Xe",
+    "Cs", "Ba", "La", "Ce", "Pr", "Nd", "Pm", "Sm", "Eu", "Gd", "Tb", "Dy",
+    "Ho", "Er", "Tm", "Yb", "Lu", "Hf", "Ta", "W", "Re", "Os", "Ir", "Pt",
+    "Au", "Hg", "Tl", "Pb", "Bi", "Po", "At", "Rn",
+)
+_Z = {symbol.upper(): z for z, symbol in enumerate(SYMBOLS, start=1)}
+
+
+class Structure(NamedTuple):
+    name: str
+    numbers: np.ndarray    # (natoms,) atomic numbers
+    positions: np.ndarray  # (natoms, 3) Bohr
+
+
+def symbols_to_numbers(symbols) -> np.ndarray:
+    """
+    Maps element symbols (or numeric labels) to atomic numbers.
+    Only the distinct symbols are looked up; the rest is a vectorized gather.
+    """
+    unique, inverse = np.unique(np.asarray(symbols), return_inverse=True)
+    table = np.empty(len(unique), dtype=np.int64)
+    for i, symbol in enumerate(unique):
+        symbol = str(symbol)
+        if symbol.isdigit():
+            table[i] = int(symbol)
+        else:
+            # Labels like "C1" or "c" still name carbon
+            table[i] = _Z[symbol.rstrip("0123456789").upper()]
+    return table[inverse]
+
+
+def parse_xyz(text: str, name: str = "") -> List[Structure]:
+    """
+    Parses a (multi-frame) XYZ string. Raises ValueError on malformed input.
+    """
+    lines = text.splitlines()
+    frames = []
+    i = 0
+    while i < len(lines):
+        if not lines[i].strip():
+            i += 1
+            continue
+
+        natoms = int(lines[i])
+        block = lines[i + 2:i + 2 + natoms]
+        if len(block) != natoms:
+            raise ValueError(f"{name}: expected {natoms} atoms, found {len(block)}")
+
+        # Only the first four columns are used, extra ones (charges...) are ignored
+        table = np.array([line.split()[:4] for line in block])
+        if table.shape != (natoms, 4):
+            raise ValueError(f"{name}: malformed atom line")
+
+        frame_name = name if not frames else f"{name}#{len(frames)}"
+        frames.append(Structure(
+            frame_name,
+            symbols_to_numbers(table[:, 0]),
+            table[:, 1:].astype(float) * BOHR_PER_ANGSTROM,
+        ))
+        i += 2 + natoms
+
+    return frames
+
+
+def _read_with_qcelemental(file: Path) -> Structure:
+    import qcelemental as qcel
+
+    molecule = qcel.models.Molecule.from_file(str(file))
+    return Structure(file.stem, np.asarray(molecule.atomic_numbers), np.asarray(molecule.geometry))
+
+
+def read_structures(sources: Iterable[Path | ZipMember]) -> List[Structure]:
+    """
+    Reads many structures at once: every frame of every source, in order.
+    Files that are not XYZ (or don't parse as such) go through qcelemental.
+    """
+    structures = []
+    for source in sources:
+        if isinstance(source, ZipMember):
+            structures.extend(parse_xyz(read_zip_member(source), source.stem))
+            continue
+
+        source = Path(source)
+        if source.suffix.lower() == ".xyz":
+            try:
+                structures.extend(parse_xyz(source.read_text(errors="ignore"), source.stem))
+                continue
+            except (ValueError, KeyError):
+                pass
+        structures.append(_read_with_qcelemental(source))
+
+    return structures
+
+
+def read_structure(source: Path | ZipMember) -> Structure:
+    """
+    Reads a single structure (the first frame for multi-frame files);
+    ValueError if the file holds none.
+    """
+    structures = read_structures([source])
+    if not structures:
+        raise ValueError(f"No structure in {source}")
+    return structures[0]
+
+
+def format_xyz(numbers, positions, comment: str = "") -> str:
+    """
+    XYZ text for a structure with `positions` in Bohr (written in Angstrom).
+    """
+    lines = [str(len(numbers)), comment]
+    for z, (x, y, w) in zip(numbers, np.asarray(positions) / BOHR_PER_ANGSTROM):
+        lines.append(f"{SYMBOLS[z - 1]:2s}  {x:16.8f} {y:16.8f} {w:16.8f}")
+    return "\n".join(lines) + "\n"
@@ -2,7 +2,6 @@ from PySide6.QtWidgets import QApplication, QStackedLayout
 from .main_window import MainWindow
 import os
 import sys
-import tblite.interface as tb
 
 
 class MainApp(QApplication):
@@ -10,8 +9,6 @@ class MainApp(QApplication):
         super().__init__(args)
 
     def config(self):
-        print("Using tblite version:", tb.library.get_version())
-
         # first set styles from styles.qss
         with open(os.path.join(os.path.dirname(__file__), "styles.qss"), "r") as f:
             self.setStyleSheet(f.read())
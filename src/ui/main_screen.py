@@ -1,10 +1,13 @@
-from PySide6.QtWidgets import QWidget, QVBoxLayout, QLabel, QLabel, QPushButton, QFileDialog, QHBoxLayout
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QLabel, QLabel, QPushButton, QFileDialog, QHBoxLayout, QCheckBox,
+                               QComboBox, QDoubleSpinBox, QSpinBox)
 from PySide6.QtSvgWidgets import QSvgWidget
 from PySide6.QtCore import Qt
 from PySide6.QtCore import Signal
 import os
 import pathlib
 
+from src.core.parallel import default_workers
+
 
 class MainScreen(QWidget):
     PROCESS_SIGNAL: Signal = Signal(pathlib.Path)
@@ -47,8 +50,47 @@ class MainScreen(QWidget):
 
         layout.addWidget(select_zip_button)
 
+        # optional in-process geometry optimization before the evaluation
+        self.optimize_checkbox = QCheckBox("Optimize geometries (GFN2-xTB, normal level)")
+        layout.addWidget(self.optimize_checkbox, alignment=Qt.AlignmentFlag.AlignCenter)
+
+        # optional subset of the archive, looked up in the dataset catalog
+        filters_layout = QHBoxLayout()
+        filters_layout.addWidget(QLabel("Dopant:"))
+        self.dopant_combo = QComboBox()
+        self.dopant_combo.addItems(["Any", "pure", "B", "N", "O", "P", "S"])
+        filters_layout.addWidget(self.dopant_combo)
+        filters_layout.addWidget(QLabel("Min size (nm):"))
+        self.min_size_spin = QDoubleSpinBox()
+        self.min_size_spin.setRange(0.0, 100.0)
+        self.min_size_spin.setSingleStep(0.5)
+        filters_layout.addWidget(self.min_size_spin)
+        filters_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addLayout(filters_layout)
+
+        # worker processes for the batch (fewer if the structures are large)
+        workers_layout = QHBoxLayout()
+        workers_layout.addWidget(QLabel("Workers:"))
+        self.workers_spin = QSpinBox()
+        self.workers_spin.setRange(1, default_workers())
+        self.workers_spin.setValue(default_workers())
+        workers_layout.addWidget(self.workers_spin)
+        workers_layout.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        layout.addLayout(workers_layout)
+
         self.setLayout(layout)
 
+    def filters(self) -> dict:
+        """
+        Catalog query arguments for the selected subset (empty = everything).
+        """
+        filters = {}
+        if self.dopant_combo.currentText() != "Any":
+            filters["dopant"] = self.dopant_combo.currentText()
+        if self.min_size_spin.value() > 0:
+            filters["min_size"] = self.min_size_spin.value()
+        return filters
+
     def select_zip_files(self):
         file_dialog = QFileDialog(self)
         file_dialog.setNameFilter("Zip Files (*.zip)")
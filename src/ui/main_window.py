@@ -13,7 +13,7 @@ class MainWindow(QMainWindow):
 
         self.widget_layout = QStackedLayout()
         self.main_screen = MainScreen()
-        self.process_screen = ProcessScreen()
+        self.process_screen = ProcessScreen(max_workers=self.main_screen.workers_spin.value())
         self.widget_layout.addWidget(self.main_screen)
         self.widget_layout.addWidget(self.process_screen)
         
@@ -25,6 +25,20 @@ class MainWindow(QMainWindow):
 
         # Connect signals
         self.main_screen.PROCESS_SIGNAL.connect(self.on_process_signal)
+        self.process_screen.BACK_SIGNAL.connect(self.on_back_signal)
+
+    @Slot()
+    def on_back_signal(self):
+        # leaving the screen cancels whatever batch is still running
+        self.process_screen.on_exit()
+        self.widget_layout.setCurrentIndex(0)
+
+    def closeEvent(self, event):
+        self.process_screen.on_exit()
+        # cancelled batches stop quickly; don't destroy their threads mid-run
+        for worker in list(self.process_screen.retired_workers):
+            worker.wait()
+        super().closeEvent(event)
 
     @Slot(pathlib.Path)
     def on_process_signal(self, zip_path: pathlib.Path):
@@ -33,4 +47,6 @@ class MainWindow(QMainWindow):
         print(f"Received zip file to process: {zip_path}")
 
         self.widget_layout.setCurrentIndex(1)
-        self.process_screen.process_zip_file(zip_path)
\ No newline at end of file
+        optimize = "normal" if self.main_screen.optimize_checkbox.isChecked() else None
+        self.process_screen.process_zip_file(zip_path, optimize=optimize, filters=self.main_screen.filters(),
+                                             max_workers=self.main_screen.workers_spin.value())
\ No newline at end of file
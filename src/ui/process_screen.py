@@ -1,50 +1,274 @@
-from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
+from PySide6.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, QLineEdit, QPushButton,
                                QTableView, QHeaderView, QAbstractItemView)
-from PySide6.QtGui import QStandardItemModel, QStandardItem, QColor
 from PySide6.QtCore import Qt, QThread, Signal, Slot
+from concurrent.futures import FIRST_COMPLETED, wait
 from typing import List
 from pathlib import Path
+import threading
+import time
+from zipfile import BadZipFile
 
-from src.core.process import process_file
-from src.core.helpers import unzip_and_getfilepaths
+from src.core.process import evaluate_family, evaluate_file, warm_start_families, warm_start_order
+from src.core.parallel import make_executor, default_workers, terminate_executor
+from src.core.parallel import available_memory, suggest_workers
+from src.core.libs.catalog import Catalog
+from src.core.libs.ingest import ZipMember
+from src.core.libs import trace
+from src.core.libs.paths import CACHE_DIR, CATALOG_DB
+from .results_model import Column, ColumnTableModel
+
+# Seconds between batched updates sent to the GUI thread
+BATCH_INTERVAL = 0.1
 
 
 class ProcessWorker(QThread):
-    progress = Signal(int, dict)  # index, result_data
-    error = Signal(int, str)  # index, error_message
-    started = Signal(int)  # index
+    # Updates are coalesced and sent at most every BATCH_INTERVAL seconds,
+    # so the GUI thread handles a few signals per second, not one per structure
+    started = Signal(list)  # [index]
+    progress = Signal(list)  # [(index, result_data)]
+    error = Signal(list)  # [(index, error_message)]
+    cancelled = Signal(list)  # [index] never completed because of cancel()
 
-    def __init__(self, files: List[Path]):
+    def __init__(self, files: List[ZipMember], max_workers: int | None = None,
+                 cache_dir: Path | None = None, warm_start: bool = False, optimize: str | None = None,
+                 indices: List[int] | None = None, transport: bool = False):
         super().__init__()
         self.files = files
+        # Positions of `files` to run (e.g. only the failed ones); default all
+        self.indices = list(range(len(files))) if indices is None else list(indices)
+        # None -> one process per core, 1 -> run serially on this thread
+        self.max_workers = max_workers
+        # keyword arguments for evaluate_file
+        self.options = {'cache_dir': cache_dir, 'warm_start': warm_start, 'optimize': optimize,
+                        'transport': transport}
+        self.pending_started = []
+        self.pending_results = []
+        self.pending_errors = []
+        self.last_flush = 0.0
+        # Set from the GUI thread, checked between structures
+        self.cancel_event = threading.Event()
+        self.resume_event = threading.Event()
+        self.resume_event.set()
+
+    def pause(self):
+        """
+        Stops starting new structures; the ones already running finish.
+        """
+        self.resume_event.clear()
+
+    def resume(self):
+        self.resume_event.set()
+
+    def cancel(self):
+        """
+        Stops the batch: nothing new starts and running calculations are
+        killed. Results already delivered are kept.
+        """
+        self.cancel_event.set()
+        # A paused worker must wake up to notice
+        self.resume_event.set()
+
+    def is_paused(self) -> bool:
+        return not self.resume_event.is_set()
+
+    def is_cancelled(self) -> bool:
+        return self.cancel_event.is_set()
 
     def run(self):
-        for i, file_path in enumerate(self.files):
-            self.started.emit(i)
+        with trace.span("process_batch", structures=len(self.indices), workers=self.max_workers):
+            if self.max_workers == 1:
+                unfinished = self.run_serial()
+            else:
+                unfinished = self.run_parallel()
+        self.flush()
+        if unfinished:
+            self.cancelled.emit(unfinished)
+        # XTB_TRACE=<file> -> Chrome trace of the whole batch
+        trace.export()
+
+    def flush(self):
+        if self.pending_started:
+            self.started.emit(self.pending_started)
+            self.pending_started = []
+        if self.pending_results:
+            self.progress.emit(self.pending_results)
+            self.pending_results = []
+        if self.pending_errors:
+            self.error.emit(self.pending_errors)
+            self.pending_errors = []
+        self.last_flush = time.monotonic()
+
+    def flush_if_due(self):
+        if time.monotonic() - self.last_flush >= BATCH_INTERVAL:
+            self.flush()
+
+    def time_to_flush(self) -> float:
+        return max(0.0, BATCH_INTERVAL - (time.monotonic() - self.last_flush))
+
+    def add_result(self, index: int, result_data: dict):
+        # Worker timings travel inside the record; collect them here
+        trace.merge(result_data.pop('trace', None))
+        self.pending_results.append((index, result_data))
+
+    def wait_while_paused(self):
+        while not self.resume_event.wait(BATCH_INTERVAL):
+            self.flush_if_due()
+
+    def run_serial(self) -> List[int]:
+        """
+        Returns the indices left undone by a cancel.
+        """
+        for n, i in enumerate(self.indices):
+            self.wait_while_paused()
+            if self.is_cancelled():
+                return self.indices[n:]
+            self.pending_started.append(i)
+            self.flush_if_due()
             try:
-                res = process_file(file_path)
-                energy = res.get('energy')
-                grad_norm = res.get('gradient')
-                verdict = "Stable" if energy < -10.0 else "Unstable"
-                result_data = {
-                    'energy': energy,
-                    'gradient': grad_norm,
-                    'verdict': verdict
-                }
-                self.progress.emit(i, result_data)
+                self.add_result(i, evaluate_file(self.files[i], **self.options))
             except Exception as e:
-                self.error.emit(i, str(e))
+                self.pending_errors.append((i, str(e)))
+            self.flush_if_due()
+        return []
+
+    def tasks(self) -> List[List[int]]:
+        """
+        The indices to run, one list per pool task: with warm starts each
+        family goes to a single worker, which keeps the results to reuse.
+        """
+        if not self.options['warm_start']:
+            return [[i] for i in self.indices]
+        families = warm_start_families([self.files[i] for i in self.indices])
+        return [[self.indices[j] for j in family] for family in families]
+
+    def run_parallel(self) -> List[int]:
+        """
+        Returns the indices left undone by a cancel.
+        """
+        pending = list(reversed(self.tasks()))
+
+        # Keep only as many jobs in flight as there are workers, so
+        # "Running..." reflects what is actually being computed (a whole
+        # family at once with warm starts).
+        slots = max(1, self.max_workers or default_workers())
+        running = {}
+
+        pool = make_executor(slots)
+        try:
+            while (pending or running) and not self.is_cancelled():
+                # While paused nothing new is submitted
+                while pending and len(running) < slots and not self.is_paused():
+                    task = pending.pop()
+                    files = [self.files[i] for i in task]
+                    running[pool.submit(evaluate_family, files, **self.options)] = task
+                    self.pending_started.extend(task)
+
+                if not running:
+                    self.wait_while_paused()
+                    continue
+
+                # Wake up for the next flush even if nothing finishes
+                done, _ = wait(running, timeout=self.time_to_flush(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = running.pop(future)
+                    try:
+                        outcomes = future.result()
+                    except Exception as e:
+                        outcomes = [(None, e)] * len(task)
+                    for i, (result_data, error) in zip(task, outcomes):
+                        if error is None:
+                            self.add_result(i, result_data)
+                        else:
+                            self.pending_errors.append((i, str(error)))
+                self.flush_if_due()
+        finally:
+            if self.is_cancelled():
+                # Don't let a cancelled batch keep the cores busy
+                terminate_executor(pool)
+            else:
+                pool.shutdown()
+
+        if not self.is_cancelled():
+            return []
+        unfinished = sorted(i for task in running.values() for i in task)
+        return unfinished + [i for task in reversed(pending) for i in task]
+
+
+class CatalogLoader(QThread):
+    """
+    Syncs a zip into the dataset catalog and lists the structures to run,
+    off the GUI thread: the first sync of a large archive decompresses every
+    member.
+    """
+    loaded = Signal(list)  # [ZipMember], in run order
+    failed = Signal(str)  # error message
+
+    def __init__(self, zip_path: Path, filters: dict | None = None, warm_start: bool = False):
+        super().__init__()
+        self.zip_path = zip_path
+        self.filters = filters or {}
+        self.warm_start = warm_start
+
+    def run(self):
+        # Structures are read from the archive by the workers, nothing is extracted.
+        # The catalog only decompresses members it has not seen before.
+        try:
+            with Catalog(CATALOG_DB) as catalog:
+                catalog.sync_zip(self.zip_path)
+                files = [entry.source for entry in catalog.query(self.zip_path, **self.filters)]
+            if self.warm_start:
+                files = warm_start_order(files)
+        except (BadZipFile, OSError) as e:
+            # Not a zip, unreadable or gone: nothing to run
+            print(f"Error reading {self.zip_path}: {e}")
+            self.failed.emit(str(e))
+            return
+        self.loaded.emit(files)
 
 
 class ProcessScreen(QWidget):
-    def __init__(self):
+    BACK_SIGNAL: Signal = Signal()
+
+    def __init__(self, max_workers: int | None = None, cache_dir: Path | None = CACHE_DIR,
+                 warm_start: bool = False, transport: bool = True):
         super().__init__()
-        self.extract_dir: Path | None = None
-        self.files: List[Path] = []
+        self.zip_path: Path | None = None
+        self.files: List[ZipMember] = []
+        self.worker: ProcessWorker | None = None
+        self.loader: CatalogLoader | None = None
+        # Cancelled workers (and abandoned loaders) whose thread is still winding down
+        self.retired_workers: List[QThread] = []
+        self.optimize: str | None = None
+        self.max_workers = max_workers
+        self.cache_dir = cache_dir
+        self.warm_start = warm_start
+        # NEGF conductance of every structure (the "Conductance" column)
+        self.transport = transport
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.scf_guessed = 0
+        # Largest per-structure peak memory seen (bytes), for the worker hint
+        self.max_peak_rss = 0
+        self.free_memory = None
         
         # Models for the tables
-        self.files_model = QStandardItemModel()
-        self.results_model = QStandardItemModel()
+        self.files_model = ColumnTableModel([
+            Column("Filename", "name", "str"),
+            Column("Status", "status", "str", colors={"Done": "green", "Error": "red", "Cancelled": "gray"}),
+        ])
+        self.results_model = ColumnTableModel([
+            Column("Molecule", "molecule", "str"),
+            Column("Energy (Ha)", "energy", fmt="{:.6f}".format),
+            Column("Gradient Norm", "gradient_norm", fmt="{:.2e}".format),
+            Column("HOMO (eV)", "homo", fmt=self.format_level),
+            Column("LUMO (eV)", "lumo", fmt=self.format_level),
+            Column("Gap (eV)", "gap", fmt=self.format_level),
+            Column("Dipole (D)", "dipole", fmt="{:.3f}".format),
+            Column("Verdict", "verdict", "str"),
+            Column("Conductance (S)", "conductance", fmt="{:.3e}".format),
+            Column("Time (s)", "duration", fmt="{:.2f}".format),
+            Column("Peak (MB)", "peak_rss", fmt=lambda v: f"{v / 2**20:.0f}"),
+        ])
         
         self.init_ui()
 
@@ -68,7 +292,8 @@ class ProcessScreen(QWidget):
         self.files_table.setModel(self.files_model)
         self.files_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
         self.files_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        self.files_model.setHorizontalHeaderLabels(["Filename", "Status"])
+        # Fixed row heights: the view doesn't have to measure every row
+        self.files_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         left_layout.addWidget(self.files_table)
 
         # --- RIGHT SIDE: CSV/Results ---
@@ -77,13 +302,19 @@ class ProcessScreen(QWidget):
         lbl_results.setAlignment(Qt.AlignmentFlag.AlignCenter)
         right_layout.addWidget(lbl_results)
 
+        self.filter_edit = QLineEdit()
+        self.filter_edit.setPlaceholderText("Filter molecules...")
+        self.filter_edit.textChanged.connect(lambda text: self.results_model.set_filter("molecule", text))
+        right_layout.addWidget(self.filter_edit)
+
         self.results_table = QTableView()
         self.results_table.setModel(self.results_model)
         self.results_table.setAlternatingRowColors(True)
+        self.results_table.setSortingEnabled(True)
+        # Start unsorted (storage order) instead of sorting by the first column
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
         self.results_table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Stretch)
-        
-        # Columns for the scientific data
-        self.results_model.setHorizontalHeaderLabels(["Molecule", "Energy (Ha)", "Gradient Norm", "Verdict"])
+        self.results_table.verticalHeader().setSectionResizeMode(QHeaderView.ResizeMode.Fixed)
         right_layout.addWidget(self.results_table)
 
         # Add panels to content layout (1:2 ratio)
@@ -91,67 +322,232 @@ class ProcessScreen(QWidget):
         content_layout.addLayout(right_layout, 2)
 
         main_layout.addLayout(content_layout)
+
+        # --- Batch controls ---
+        controls_layout = QHBoxLayout()
+        self.back_button = QPushButton("Back")
+        self.back_button.clicked.connect(self.BACK_SIGNAL.emit)
+        controls_layout.addWidget(self.back_button)
+        controls_layout.addStretch()
+
+        self.pause_button = QPushButton("Pause")
+        self.pause_button.clicked.connect(self.toggle_pause)
+        controls_layout.addWidget(self.pause_button)
+
+        self.cancel_button = QPushButton("Cancel")
+        self.cancel_button.setObjectName("DangerButton")
+        self.cancel_button.clicked.connect(self.cancel_batch)
+        controls_layout.addWidget(self.cancel_button)
+
+        self.retry_button = QPushButton("Retry failed")
+        self.retry_button.clicked.connect(self.retry_failed)
+        controls_layout.addWidget(self.retry_button)
+
+        self.stats_label = QLabel()
+        self.stats_label.setAlignment(Qt.AlignmentFlag.AlignRight)
+        controls_layout.addWidget(self.stats_label)
+        main_layout.addLayout(controls_layout)
+        self.update_stats_label()
+        self.update_controls()
+
         self.setLayout(main_layout)
 
+    def update_stats_label(self):
+        stats = []
+        if self.cache_dir is None:
+            stats.append("Cache: disabled")
+        else:
+            stats.append(f"Cache: {self.cache_hits} hits / {self.cache_misses} misses")
+        if self.warm_start:
+            stats.append(f"Warm start: {self.scf_guessed} structures from a related result")
+        if self.max_peak_rss:
+            stats.append(f"Peak memory: {self.max_peak_rss / 2**20:.0f} MB/structure, "
+                         f"fits {suggest_workers(self.max_peak_rss, self.free_memory)} workers")
+        self.stats_label.setText("   |   ".join(stats))
+
+    def is_running(self) -> bool:
+        return self.worker is not None and self.worker.isRunning()
+
+    def update_controls(self):
+        running = self.is_running()
+        self.pause_button.setEnabled(running and not self.worker.is_cancelled())
+        self.pause_button.setText("Resume" if running and self.worker.is_paused() else "Pause")
+        self.cancel_button.setEnabled(running and not self.worker.is_cancelled())
+        self.retry_button.setEnabled(not running and bool(self.failed_indices()))
+
+    def failed_indices(self) -> List[int]:
+        return [i for i in range(len(self.files)) if self.files_model.value(i, "status") == "Error"]
+
+    def toggle_pause(self):
+        if not self.is_running():
+            return
+        if self.worker.is_paused():
+            self.worker.resume()
+        else:
+            self.worker.pause()
+        self.update_controls()
+
+    def cancel_batch(self):
+        if self.is_running():
+            self.worker.cancel()
+        self.update_controls()
+
+    def stop_worker(self):
+        """
+        Cancels the current batch and detaches it from this screen, so
+        late updates can't land on the rows of a newer batch.
+        """
+        if self.loader is not None:
+            # A sync can't be interrupted: let it finish unheard
+            loader, self.loader = self.loader, None
+            loader.loaded.disconnect()
+            loader.failed.disconnect()
+            self.retire(loader)
+        if self.worker is None:
+            return
+        worker, self.worker = self.worker, None
+        for signal in (worker.started, worker.progress, worker.error, worker.cancelled):
+            signal.disconnect()
+        if worker.isRunning():
+            worker.cancel()
+            self.retire(worker)
+
+    def retire(self, thread: QThread):
+        # Keep a reference until the thread really ends
+        if thread.isRunning():
+            self.retired_workers.append(thread)
+            thread.finished.connect(lambda: self.retired_workers.remove(thread))
+
+    def start_worker(self, indices: List[int] | None = None):
+        # Measured before the workers take their share
+        self.free_memory = available_memory()
+        self.worker = ProcessWorker(self.files, self.max_workers, self.cache_dir, self.warm_start,
+                                    self.optimize, indices, self.transport)
+        self.worker.started.connect(self.on_started)
+        self.worker.progress.connect(self.on_progress)
+        self.worker.error.connect(self.on_error)
+        self.worker.cancelled.connect(self.on_cancelled)
+        self.worker.finished.connect(self.update_controls)
+        self.worker.start()
+        self.update_controls()
+
+    def retry_failed(self):
+        """
+        Requeues only the structures that ended in error.
+        """
+        failed = self.failed_indices()
+        if failed and not self.is_running():
+            self.files_model.set_values(failed, "status", "Pending")
+            self.start_worker(failed)
+
     def clear_data(self):
-        if self.extract_dir and self.extract_dir.exists():
-            for file in self.extract_dir.iterdir():
-                if file.is_file(): file.unlink()
-            self.extract_dir.rmdir()
-        
-        self.extract_dir = None
+        self.stop_worker()
+        self.zip_path = None
         self.files = []
-        self.files_model.removeRows(0, self.files_model.rowCount())
-        self.results_model.removeRows(0, self.results_model.rowCount())
+        self.files_model.clear()
+        self.results_model.clear()
+        self.filter_edit.clear()
+        self.results_table.horizontalHeader().setSortIndicator(-1, Qt.SortOrder.AscendingOrder)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.scf_guessed = 0
+        self.max_peak_rss = 0
+        self.update_stats_label()
+        self.update_controls()
 
-    def process_zip_file(self, zip_path: Path):
+    def process_zip_file(self, zip_path: Path, optimize: str | None = None, filters: dict | None = None,
+                         max_workers: int | None = None):
+        """
+        `filters` selects a subset through the dataset catalog, e.g.
+        {"dopant": "N", "min_size": 1.5} (see Catalog.query).
+        `max_workers` replaces the screen's worker count when given.
+        """
         self.clear_data()
-        
-        # Extraction
-        self.extract_dir = zip_path.parent / (zip_path.stem + "_extracted")
-        self.files = unzip_and_getfilepaths(zip_path, self.extract_dir)
+        if max_workers is not None:
+            self.max_workers = max_workers
+        self.zip_path = zip_path
+        self.optimize = optimize
+
+        # The batch starts once the loader has the list (on_loaded)
+        self.stats_label.setText(f"Reading {Path(zip_path).name}...")
+        self.loader = CatalogLoader(zip_path, filters, self.warm_start)
+        self.loader.loaded.connect(self.on_loaded)
+        self.loader.failed.connect(self.on_load_failed)
+        self.loader.start()
+
+    def finish_loading(self) -> bool:
+        """
+        Releases the loader whose signal is being handled; False if it is not
+        the current one (its zip was replaced in the meantime).
+        """
+        if self.loader is None or self.sender() is not self.loader:
+            return False
+        # Its thread may still be returning from run()
+        self.retire(self.loader)
+        self.loader = None
+        return True
 
+    @Slot(list)
+    def on_loaded(self, files: list):
+        if not self.finish_loading():
+            return
+        self.files = files
         # Populate Left Table first
-        for file_path in self.files:
-            name_item = QStandardItem(file_path.name)
-            status_item = QStandardItem("Pending")
-            self.files_model.appendRow([name_item, status_item])
+        self.files_model.append_rows([{"name": f.name, "status": "Pending"} for f in self.files])
+        self.update_stats_label()
 
         # Start worker thread
-        self.worker = ProcessWorker(self.files)
-        self.worker.started.connect(self.on_started)
-        self.worker.progress.connect(self.on_progress)
-        self.worker.error.connect(self.on_error)
-        self.worker.start()
+        self.start_worker()
+
+    @Slot(str)
+    def on_load_failed(self, message: str):
+        if not self.finish_loading():
+            return
+        self.stats_label.setText(f"Could not read {Path(self.zip_path).name}: {message}")
 
-    @Slot(int)
-    def on_started(self, index: int):
-        self.files_model.item(index, 1).setText("Running...")
-        self.files_table.scrollTo(self.files_model.index(index, 0))
-        self.files_table.update()
+    @Slot(list)
+    def on_started(self, indices: list):
+        self.files_model.set_values(indices, "status", "Running...")
+        self.files_table.scrollTo(self.files_model.index(indices[-1], 0))
 
-    @Slot(int, dict)
-    def on_progress(self, index: int, result_data: dict):
+    @Slot(list)
+    def on_progress(self, results: list):
         # Update status
-        self.files_model.item(index, 1).setText("Done")
-        self.files_model.item(index, 1).setForeground(QColor("green"))
-
-        # Populate Right Table (Results)
-        file_path = self.files[index]
-        row_items = [
-            QStandardItem(file_path.stem),
-            QStandardItem(f"{result_data['energy']}"),
-            QStandardItem(f"{result_data['gradient']}"),
-            QStandardItem(result_data['verdict'])
-        ]
-        self.results_model.appendRow(row_items)
-        self.results_table.scrollToBottom()
-
-    @Slot(int, str)
-    def on_error(self, index: int, error_message: str):
-        self.files_model.item(index, 1).setText("Error")
-        self.files_model.item(index, 1).setForeground(QColor("red"))
-        print(f"Error processing {self.files[index].name}: {error_message}")
+        self.files_model.set_values([i for i, _ in results], "status", "Done")
+
+        for _, result_data in results:
+            if self.cache_dir is not None:
+                if result_data.get('cached'):
+                    self.cache_hits += 1
+                else:
+                    self.cache_misses += 1
+            if not result_data.get('cached'):
+                self.scf_guessed += bool(result_data.get('scf_guess'))
+                self.max_peak_rss = max(self.max_peak_rss, result_data.get('peak_rss') or 0)
+        self.update_stats_label()
+
+        # Populate Right Table (Results); only the displayed scalars are kept
+        self.results_model.append_rows([
+            {'molecule': self.files[i].stem, **{c.key: result_data.get(c.key) for c in self.results_model.columns[1:]}}
+            for i, result_data in results
+        ])
+        if self.results_model.view is None:
+            self.results_table.scrollToBottom()
+
+    @staticmethod
+    def format_level(value: float | None) -> str:
+        return "-" if value is None else f"{value:.4f}"
+
+    @Slot(list)
+    def on_error(self, errors: list):
+        self.files_model.set_values([i for i, _ in errors], "status", "Error")
+        for index, error_message in errors:
+            print(f"Error processing {self.files[index].name}: {error_message}")
+
+    @Slot(list)
+    def on_cancelled(self, indices: list):
+        # Completed rows keep their results; the rest can be started again later
+        self.files_model.set_values(indices, "status", "Cancelled")
 
     def on_exit(self):
         self.clear_data()
\ No newline at end of file
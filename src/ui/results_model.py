@@ -0,0 +1,190 @@
+from typing import Callable, List, NamedTuple
+
+import numpy as np
+from PySide6.QtCore import QAbstractTableModel, QModelIndex, Qt
+from PySide6.QtGui import QColor
+
+
+class Column(NamedTuple):
+    header: str
+    key: str
+    kind: str = "float"              # "float" (None -> NaN), "int" or "str"
+    fmt: Callable | None = None      # value -> display text
+    colors: dict | None = None       # value -> foreground QColor
+
+
+_DTYPES = {"float": np.float64, "int": np.int64}
+
+
+class ColumnTableModel(QAbstractTableModel):
+    """
+    Table model that stores each column as one array instead of one item per
+    cell, so hundreds of thousands of rows stay cheap.
+
+    Rows are only ever appended (in batches) or updated in place. Sorting and
+    filtering work on a view: an array of storage rows in display order, so
+    they never move the data itself.
+    """
+
+    def __init__(self, columns: List[Column], parent=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.clear()
+
+    # --- storage ---------------------------------------------------------
+
+    def clear(self):
+        self.beginResetModel()
+        self.size = 0
+        self.data_columns = {
+            c.key: [] if c.kind == "str" else np.empty(1024, dtype=_DTYPES[c.kind])
+            for c in self.columns
+        }
+        self.view = None        # None -> storage order, every row
+        self.sort_key = None
+        self.sort_order = Qt.SortOrder.AscendingOrder
+        self.filter_key = None
+        self.filter_text = ""
+        self.endResetModel()
+
+    def _reserve(self, size: int):
+        for c in self.columns:
+            array = self.data_columns[c.key]
+            if c.kind != "str" and len(array) < size:
+                grown = np.empty(max(size, 2 * len(array)), dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.data_columns[c.key] = grown
+
+    def _store(self, key: str, row: int, value):
+        column = self.data_columns[key]
+        if isinstance(column, list):
+            column[row] = "" if value is None else str(value)
+        else:
+            column[row] = np.nan if value is None and column.dtype.kind == "f" else value
+
+    def append_rows(self, records: List[dict]):
+        """
+        Appends one row per record ({column key: value}, missing keys -> None).
+        """
+        if not records:
+            return
+        start, end = self.size, self.size + len(records)
+        self._reserve(end)
+        for c in self.columns:
+            if c.kind == "str":
+                self.data_columns[c.key].extend(
+                    "" if r.get(c.key) is None else str(r.get(c.key)) for r in records
+                )
+            else:
+                values = [r.get(c.key) for r in records]
+                if c.kind == "float":
+                    values = [np.nan if v is None else v for v in values]
+                self.data_columns[c.key][start:end] = values
+
+        if self.view is None:
+            self.beginInsertRows(QModelIndex(), start, end - 1)
+            self.size = end
+            self.endInsertRows()
+        else:
+            # Sorted or filtered: new rows can land anywhere, rebuild the view
+            self.size = end
+            self._refresh_view()
+
+    def set_values(self, rows, key: str, value):
+        """
+        Sets column `key` of the given storage rows to `value`.
+        """
+        rows = list(rows)
+        if not rows:
+            return
+        for row in rows:
+            self._store(key, row, value)
+        col = next(i for i, c in enumerate(self.columns) if c.key == key)
+        if self.view is None:
+            top, bottom = min(rows), max(rows)
+        else:
+            # One signal for the whole column is cheaper than locating each row
+            top, bottom = 0, len(self.view) - 1
+        self.dataChanged.emit(self.index(top, col), self.index(bottom, col))
+
+    def value(self, row: int, key: str):
+        """
+        Raw value of storage row `row` (not the display row).
+        """
+        return self.data_columns[key][row]
+
+    def storage_row(self, display_row: int) -> int:
+        return display_row if self.view is None else int(self.view[display_row])
+
+    # --- sort / filter ---------------------------------------------------
+
+    def _column_values(self, key: str):
+        column = self.data_columns[key]
+        if isinstance(column, list):
+            return np.array(column, dtype=object)
+        return column[:self.size]
+
+    def _refresh_view(self):
+        self.beginResetModel()
+        rows = np.arange(self.size)
+        if self.filter_key is not None and self.filter_text:
+            needle = self.filter_text.lower()
+            names = self.data_columns[self.filter_key]
+            rows = np.fromiter((i for i in range(self.size) if needle in names[i].lower()), dtype=np.int64)
+        if self.sort_key is not None:
+            values = self._column_values(self.sort_key)[rows]
+            # Stable, and NaN (missing values) always last
+            order = np.argsort(values, kind="stable")
+            if self.sort_order == Qt.SortOrder.DescendingOrder:
+                if values.dtype.kind == "f":
+                    missing = np.isnan(values[order])
+                    order = np.concatenate([order[~missing][::-1], order[missing]])
+                else:
+                    order = order[::-1]
+            rows = rows[order]
+        self.view = None if self.sort_key is None and not self.filter_text else rows
+        self.endResetModel()
+
+    def sort(self, column: int, order: Qt.SortOrder = Qt.SortOrder.AscendingOrder):
+        # Qt passes -1 for "unsorted": back to storage order
+        self.sort_key = self.columns[column].key if column >= 0 else None
+        self.sort_order = order
+        self._refresh_view()
+
+    def set_filter(self, key: str, text: str):
+        """
+        Shows only the rows whose str column `key` contains `text` (any case).
+        """
+        self.filter_key = key
+        self.filter_text = text
+        self._refresh_view()
+
+    # --- QAbstractTableModel ---------------------------------------------
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return self.size if self.view is None else len(self.view)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.columns)
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.columns[section].header
+        return None
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if not index.isValid():
+            return None
+        column = self.columns[index.column()]
+        value = self.data_columns[column.key][self.storage_row(index.row())]
+
+        if role == Qt.ItemDataRole.DisplayRole:
+            if column.kind == "float" and np.isnan(value):
+                return "-"
+            return column.fmt(value) if column.fmt else str(value)
+        if role == Qt.ItemDataRole.ForegroundRole and column.colors:
+            color = column.colors.get(value)
+            return QColor(color) if color else None
+        return None
@@ -0,0 +1,19 @@
+import numpy as np
+
+from src.core.dos import compute_dos
+
+
+def test_memory_mapped_output_matches(tmp_path):
+    rng = np.random.default_rng(0)
+    levels = [rng.uniform(-10, 5, n) for n in (40, 55, 32, 60, 47)]
+    weights = [rng.dirichlet(np.ones(3), len(e)).T for e in levels]
+
+    in_memory = compute_dos(levels, weights)
+    # A tiny chunk budget: one structure per chunk
+    mapped = compute_dos(levels, weights, memory=1, directory=tmp_path)
+
+    assert isinstance(mapped.partial, np.memmap)
+    np.testing.assert_allclose(mapped.partial, in_memory.partial, atol=1e-12)
+    np.testing.assert_allclose(mapped.total, in_memory.partial.sum(axis=1), atol=1e-12)
+    np.testing.assert_array_equal(np.load(tmp_path / "grid.npy"), in_memory.grid)
+    np.testing.assert_allclose(np.load(tmp_path / "total.npy"), in_memory.total, atol=1e-12)
@@ -0,0 +1,25 @@
+import numpy as np
+
+from src.core.libs.ingest import ZipMember
+from src.core.matrices import MatrixStore, entry_name
+
+
+def test_entries_keyed_by_source_and_method(tmp_path):
+    a, b = tmp_path / "a" / "1nm.xyz", tmp_path / "b" / "1nm.xyz"
+    member = ZipMember(tmp_path / "set.zip", "x/1nm.xyz")
+    names = {entry_name(a, "m"), entry_name(b, "m"), entry_name(member, "m"), entry_name(a, "m/opt-normal")}
+    assert len(names) == 4
+    assert all(name.startswith("1nm-") for name in names)
+    assert entry_name(a, "m") == entry_name(tmp_path / "a" / ".." / "a" / "1nm.xyz", "m")
+
+
+def test_has_checks_content(tmp_path):
+    with MatrixStore(tmp_path / "store") as store:
+        store.put("s", {"overlap-matrix": np.eye(2)})
+        store.describe("s", "/x/s.xyz", "m", "abc")
+        assert store.has("s", ("overlap-matrix",))
+        assert store.has("s", ("overlap-matrix",), content="abc")
+        assert not store.has("s", ("overlap-matrix",), content="def")
+        assert store.origin("s") == {"source": "/x/s.xyz", "method": "m", "content": "abc"}
+        store.delete("s")
+        assert store.origin("s") is None
@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from src.core.transport import compute_transport, electron_count, fermi_level, generalized_eigh
+
+DATASET = Path(__file__).resolve().parent.parent / "dataset"
+
+
+def _chain(n=40, seed=0):
+    # Disordered tight-binding chain (eV) with a nearest-neighbour overlap
+    rng = np.random.default_rng(seed)
+    H = np.diag(rng.normal(-5.0, 1.0, n)) + np.diag(np.full(n - 1, -2.5), 1) + np.diag(np.full(n - 1, -2.5), -1)
+    S = np.eye(n) + np.diag(np.full(n - 1, 0.1), 1) + np.diag(np.full(n - 1, 0.1), -1)
+    positions = np.column_stack([1.4 * np.arange(n), np.zeros(n), np.zeros(n)]) * 1.8897
+    return H, S, positions
+
+
+@pytest.mark.parametrize("electrons", [30, 31])
+def test_fermi_level_inside_gap_of_h(electrons):
+    H, S, positions = _chain()
+    eps, vectors = generalized_eigh(H, S)
+    occupied = (electrons + 1) // 2
+    occupation = np.zeros(len(eps))
+    occupation[:electrons // 2] = 2.0
+    occupation[electrons // 2:occupied] += electrons % 2
+    density = (vectors * occupation) @ vectors.T
+    assert electron_count(density, S) == pytest.approx(electrons)
+
+    # Every "atom" holds one orbital
+    negf = compute_transport(np.full(len(H), 6), positions, H, S, density, np.arange(len(H)))
+    assert eps[occupied - 1] < negf.fermi < eps[occupied]
+    assert negf.energies[0] < negf.fermi < negf.energies[-1]
+
+
+def test_fermi_level_spin_channels():
+    levels = [np.array([-3.0, -1.0, 1.0]), np.array([-2.0, 0.0, 2.0])]
+    # 3 electrons fill -3, -2, -1 in one spin channel or the other
+    assert fermi_level(levels, 3) == pytest.approx(-0.5)
+    with pytest.raises(ValueError):
+        fermi_level(levels, 0)
+
+
+def test_fermi_level_between_homo_lumo_of_exported_hamiltonian():
+    pytest.importorskip("tblite")
+    from src.core.process import HARTREE_TO_EV, new_calculator, run_singlepoint
+    from src.core.transport import orbital_atoms
+    from src.core.xyz import read_structure
+
+    structure = read_structure(DATASET / "1nm-2Bdoped-3percent.xyz")
+    result, _ = run_singlepoint(structure.numbers, structure.positions, save_integrals=True)
+    H = result.get('hamiltonian-matrix') * HARTREE_TO_EV
+    S = result.get('overlap-matrix')
+    density = result.get('density-matrix')
+    orbital_atom = orbital_atoms(new_calculator(structure.numbers, structure.positions, verbosity=0)[0])
+
+    negf = compute_transport(structure.numbers, structure.positions, H, S, density, orbital_atom)
+    eps = generalized_eigh(H, S)[0]
+    occupied = (int(round(electron_count(density, S))) + 1) // 2
+    assert eps[occupied - 1] < negf.fermi < eps[occupied]